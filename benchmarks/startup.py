@@ -0,0 +1,75 @@
+"""
+Startup budget for short lived mdcmp processes.
+
+Imports the modules used by CLI invocations and conversions in a fresh interpreter with
+`python -X importtime`, reports the cumulative import time of each, and fails when the best of
+several runs exceeds the budget or when a heavy dependency is imported eagerly.
+
+Byte code should be compiled first (python -m compileall src), otherwise compile time is measured.
+
+Usage:
+    python benchmarks/startup.py [--budget-ms 40] [--runs 5]
+"""
+import argparse
+import subprocess
+import sys
+
+# Modules a short lived process imports
+MODULES = ("mdcmp.cli", "mdcmp.grid", "mdcmp.converter", "mdcmp.composer")
+# Dependencies that must only load on the code paths that need them
+LAZY_DEPENDENCIES = ("mingus", "midiutil", "hashlib", "tempfile", "numpy", "gzip", "lzma")
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of module in microseconds, in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def eager_dependencies(module: str) -> list[str]:
+    """Lazy dependencies that are loaded by importing module"""
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in sys.modules if m.split('.')[0] in {LAZY_DEPENDENCIES!r}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--budget-ms", type=float, default=40.0, help="Budget per module in milliseconds"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs per module, best is kept")
+    args = parser.parse_args()
+
+    failed = False
+    budget_us = args.budget_ms * 1000
+    for module in MODULES:
+        best_us = min(import_time_us(module) for _ in range(args.runs))
+        eager = eager_dependencies(module)
+        status = "ok"
+        if best_us > budget_us or eager:
+            status = "FAIL"
+            failed = True
+        print(f"{module:<20} {best_us / 1000:8.2f} ms  (budget {budget_us / 1000:.2f} ms)  {status}")
+        if eager:
+            print(f"    eagerly imported: {', '.join(sorted(eager))}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Export notes to NumPy arrays for analysis and machine learning, without writing MIDI.
+
+Two layouts are supported:
+- piano_roll(): a (time steps x 128 pitches) array of velocities.
+- event_array(): a structured array with one row per note, see EVENT_DTYPE.
+
+The source can be a Grid, an MDC file or already parsed tracks (see Converter.parse_tracks()).
+The columns of the parsed tracks are handed to NumPy as buffers, so the conversion is vectorized.
+With `path`, the result is written straight into a memory-mapped .npy file, which can be opened
+again without loading it with load().
+
+NumPy is an optional dependency: pip install 'mdcmp[numpy]'
+
+Example:
+    roll = piano_roll(grid, step=0.25)
+    events = event_array("data/mdc/misc/test.mdc", path="test.npy")
+"""
+from typing import TYPE_CHECKING
+
+from .converter import Converter
+from .events import NOTE
+from .grid import Grid
+from .tracks import KIND_CODES, ParsedTrack
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Fields of event_array() rows. Times and durations are in beats.
+EVENT_DTYPE: list[tuple[str, str]] = [
+    ("time", "<f8"),
+    ("duration", "<f8"),
+    ("pitch", "u1"),
+    ("velocity", "u1"),
+    ("track", "<u2"),
+    ("channel", "u1"),
+]
+# The default piano roll step in beats (a sixteenth note)
+DEFAULT_STEP = 0.25
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for array export: pip install 'mdcmp[numpy]'")
+    return numpy
+
+
+def _load_tracks(source: "Grid | str | list[ParsedTrack]") -> list[ParsedTrack]:
+    """The parsed tracks of a Grid (without velocity jitter), an MDC file or parsed tracks"""
+    if isinstance(source, Grid):
+        return Converter().parse_data_tracks(source.to_data(velocity_jitter=0))
+    if isinstance(source, str):
+        return Converter().parse_tracks(source)
+    return source
+
+
+def _note_columns(tracks: list[ParsedTrack], drums: bool = True) -> dict[str, "np.ndarray"]:
+    """
+    The note columns of all tracks concatenated, plus their track and channel columns.
+
+    Silent notes (velocity 0, e.g. rests) are left out.
+    """
+    numpy = _numpy()
+    columns: dict[str, list] = {
+        "time": [], "duration": [], "pitch": [], "velocity": [], "track": [], "channel": []
+    }
+    for number, track in enumerate(tracks):
+        if not len(track) or (track.is_drum and not drums):
+            continue
+        notes = (numpy.asarray(track.kinds) == KIND_CODES[NOTE]) & (numpy.asarray(track.data2) > 0)
+        count = int(notes.sum())
+        columns["time"].append(numpy.asarray(track.times)[notes])
+        columns["duration"].append(numpy.asarray(track.durations)[notes])
+        columns["pitch"].append(numpy.asarray(track.data1)[notes])
+        columns["velocity"].append(numpy.asarray(track.data2)[notes])
+        columns["track"].append(numpy.full(count, number))
+        columns["channel"].append(numpy.full(count, track.channel))
+    dtypes = dict(EVENT_DTYPE)
+    return {
+        name: numpy.concatenate(values).astype(dtypes[name], copy=False)
+        if values else numpy.zeros(0, dtype=dtypes[name])
+        for name, values in columns.items()
+    }
+
+
+def _allocate(shape: tuple[int, ...], dtype, path: str | None) -> "np.ndarray":
+    """A zeroed array, memory-mapped to a new .npy file when path is set"""
+    numpy = _numpy()
+    if path is None:
+        return numpy.zeros(shape, dtype=dtype)
+    # A new .npy memory map is zero filled
+    return numpy.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def event_array(
+    source: "Grid | str | list[ParsedTrack]",
+    path: str | None = None,
+    drums: bool = True,
+) -> "np.ndarray":
+    """
+    The notes of a source as a structured array (see EVENT_DTYPE), sorted by time.
+
+    The track field is the index of the track (MDC track line) the note belongs to. Notes at the
+    same time keep their track order.
+
+    Args:
+        source (Grid | str | list[ParsedTrack]): A Grid, an MDC file or parsed tracks.
+        path (str | None): Write the array to this .npy file and return it memory-mapped.
+        drums (bool): Include drum tracks.
+    """
+    numpy = _numpy()
+    columns = _note_columns(_load_tracks(source), drums)
+    order = numpy.argsort(columns["time"], kind="stable")
+    events = _allocate((len(order),), EVENT_DTYPE, path)
+    for name, values in columns.items():
+        events[name] = values[order]
+    if path is not None:
+        events.flush()
+    return events
+
+
+def piano_roll(
+    source: "Grid | str | list[ParsedTrack]",
+    step: float = DEFAULT_STEP,
+    length: float | None = None,
+    path: str | None = None,
+    drums: bool = True,
+) -> "np.ndarray":
+    """
+    The notes of a source as a piano roll: a uint8 array of (time steps, 128 pitches) velocities.
+
+    Note starts and ends are rounded to the nearest step, every note lasts at least one step.
+    Where notes overlap on a pitch, the loudest velocity is kept.
+
+    Args:
+        source (Grid | str | list[ParsedTrack]): A Grid, an MDC file or parsed tracks.
+        step (float): The length of one time step in beats.
+        length (float | None): The length of the roll in beats. Notes past it are cut. None
+                               for the end of the last note or track.
+        path (str | None): Write the array to this .npy file and return it memory-mapped.
+        drums (bool): Include drum tracks.
+    """
+    if step <= 0:
+        raise ValueError("step must be > 0")
+    numpy = _numpy()
+    tracks = _load_tracks(source)
+    columns = _note_columns(tracks, drums)
+    starts = numpy.rint(columns["time"] / step).astype(numpy.int64)
+    ends = numpy.rint((columns["time"] + columns["duration"]) / step).astype(numpy.int64)
+    ends = numpy.maximum(ends, starts + 1)
+    if length is None:
+        length = max([track.length for track in tracks], default=0.0)
+        steps = max(int(numpy.ceil(length / step)), int(ends.max(initial=0)))
+    else:
+        steps = int(numpy.ceil(length / step))
+    roll = _allocate((steps, 128), numpy.uint8, path)
+    # One (step, pitch) cell per sounding step of every note
+    lengths = ends - starts
+    rows = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+    rows += numpy.arange(int(lengths.sum()))
+    pitches = numpy.repeat(columns["pitch"], lengths)
+    velocities = numpy.repeat(columns["velocity"], lengths)
+    inside = rows < steps
+    numpy.maximum.at(roll, (rows[inside], pitches[inside]), velocities[inside])
+    if path is not None:
+        roll.flush()
+    return roll
+
+
+def load(path: str, mmap: bool = True) -> "np.ndarray":
+    """Open an array written by event_array() or piano_roll(), read-only memory-mapped by default"""
+    return _numpy().load(path, mmap_mode="r" if mmap else None)
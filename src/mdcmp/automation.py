@@ -0,0 +1,205 @@
+"""
+Track automation lanes.
+
+A lane holds the breakpoints of one controller (volume, pan, ...) of one track. Each point is
+either a step (jump to the value) or a linear ramp from the previous point. Lanes are written to
+MDC data as automation lines and sampled by the Converter, which only emits an event when the
+sampled value changes.
+
+See: docs/MDC_FORMAT_SPEC.md for the automation line format.
+"""
+import heapq
+from typing import Iterator, NamedTuple
+
+from .constants import EVENT_MAP
+from .events import Event, CONTROL, PITCHWHEEL
+from .exceptions import MdcAutomationError
+
+STEP = "s"
+LINEAR = "l"
+CURVES = (STEP, LINEAR)
+# Automated controllers and their MIDI value range
+AUTOMATION_RANGES = {
+    "volume": (0, 127),
+    "pitchwheel": (-8192, 8191),
+    "modwheel": (0, 127),
+    "expression": (0, 127),
+    "sustain": (0, 127),
+    "pan": (0, 127),
+}
+# The default sampling resolution of ramps, in beats (a thirtysecond note)
+DEFAULT_RESOLUTION = 0.125
+
+
+class AutomationPoint(NamedTuple):
+    time: float
+    value: int
+    curve: str = STEP
+
+
+def validate_point(controller: str, point: AutomationPoint):
+    """Raise MdcAutomationError if the controller, value or curve of a point is invalid"""
+    if controller not in AUTOMATION_RANGES:
+        raise MdcAutomationError(f"Unknown automation controller: {controller}")
+    low, high = AUTOMATION_RANGES[controller]
+    if point.value < low or point.value > high:
+        raise MdcAutomationError(
+            f"{controller} value is out of range ({low}-{high}): {point.value}"
+        )
+    if point.curve not in CURVES:
+        raise MdcAutomationError(f"Unknown automation curve: {point.curve}")
+    if point.time < 0:
+        raise MdcAutomationError(f"Automation time must be >= 0: {point.time}")
+
+
+def value_at(points: list[AutomationPoint], time: float) -> int | None:
+    """The value of a lane at time, or None before its first point"""
+    value: int | None = None
+    previous: AutomationPoint | None = None
+    for point in points:
+        if point.time > time:
+            if point.curve == LINEAR and previous is not None:
+                return _interpolate(previous, point, time)
+            break
+        value = point.value
+        previous = point
+    return value
+
+
+def _interpolate(start: AutomationPoint, end: AutomationPoint, time: float) -> int:
+    span = end.time - start.time
+    if span <= 0:
+        return end.value
+    return round(start.value + (end.value - start.value) * (time - start.time) / span)
+
+
+def _iter_samples(
+    points: list[AutomationPoint], resolution: float
+) -> Iterator[tuple[float, int]]:
+    """Every point of a lane plus the ramp samples in between, in time order"""
+    previous: AutomationPoint | None = None
+    for point in points:
+        if point.curve == LINEAR and previous is not None:
+            step: int = 1
+            time: float = previous.time + resolution
+            while time < point.time:
+                yield time, _interpolate(previous, point, time)
+                step += 1
+                time = previous.time + step * resolution
+        yield point.time, point.value
+        previous = point
+
+
+def sample_lane(
+    points: list[AutomationPoint],
+    resolution: float = DEFAULT_RESOLUTION,
+    start: float = 0.0,
+    end: float | None = None,
+) -> Iterator[tuple[float, int]]:
+    """
+    Sample a lane into (time, value) pairs, only where the value changes.
+
+    Ramps are sampled every resolution beats. With a window [start, end), the value in effect at
+    start is emitted first, so a slice of a song starts in the right state.
+
+    Args:
+        points (list[AutomationPoint]): The lane, sorted by time.
+        resolution (float): The ramp sampling interval in beats.
+        start (float): The start of the window in beats.
+        end (float | None): The end of the window in beats. None for no end.
+    """
+    if resolution <= 0:
+        raise ValueError("resolution must be > 0")
+    last: int | None = None
+    if start > 0:
+        last = value_at(points, start)
+        if last is not None:
+            yield start, last
+    for time, value in _iter_samples(points, resolution):
+        if end is not None and time >= end:
+            break
+        if time < start or (time == start and last is not None) or value == last:
+            continue
+        yield time, value
+        last = value
+
+
+def format_lane(controller: str, points: list[AutomationPoint]) -> str:
+    """Format a lane as the patterns of an automation line"""
+    return "; ".join(
+        f"{controller},{point.time},{point.value},{point.curve}" for point in points
+    )
+
+
+def parse_lanes(patterns: list[str]) -> dict[str, list[AutomationPoint]]:
+    """
+    Parse the patterns of an automation line into lanes (controller -> sorted points).
+
+    Points are always validated, automation lines are small compared to track lines.
+
+    Args:
+        patterns (list[str]): The data section of an automation line in list format.
+    """
+    lanes: dict[str, list[AutomationPoint]] = {}
+    for pattern in patterns:
+        # Forgive extra spacing
+        if not pattern.strip():
+            continue
+        try:
+            controller, time, value, curve = pattern.strip().split(",")
+            point = AutomationPoint(float(time), int(value), curve)
+        except ValueError as err:
+            raise MdcAutomationError(f"Failed to parse automation pattern: {pattern}  err={err}")
+        validate_point(controller, point)
+        lanes.setdefault(controller, []).append(point)
+    for points in lanes.values():
+        points.sort(key=lambda point: point.time)
+    return lanes
+
+
+def _iter_lane_events(
+    controller: str,
+    points: list[AutomationPoint],
+    track: int,
+    channel: int,
+    resolution: float,
+    start: float,
+    end: float | None,
+    shift: float,
+) -> Iterator[Event]:
+    number: int | None = EVENT_MAP[controller]
+    for time, value in sample_lane(points, resolution, start, end):
+        if number is None:
+            yield Event(time + shift, track, channel, PITCHWHEEL, 0, value)
+        else:
+            yield Event(time + shift, track, channel, CONTROL, number, value)
+
+
+def lane_events(
+    lanes: dict[str, list[AutomationPoint]],
+    track: int,
+    channel: int,
+    resolution: float = DEFAULT_RESOLUTION,
+    start: float = 0.0,
+    end: float | None = None,
+    shift: float = 0.0,
+) -> Iterator[Event]:
+    """
+    The change-only events of all lanes of a track, in time order.
+
+    Args:
+        lanes (dict[str, list[AutomationPoint]]): Controller -> sorted points.
+        track (int): The MIDI track number to assign to the events.
+        channel (int): The MIDI channel.
+        resolution (float): The ramp sampling interval in beats.
+        start (float): The start of the window in beats, see sample_lane().
+        end (float | None): The end of the window in beats.
+        shift (float): Added to every event time.
+    """
+    return heapq.merge(
+        *(
+            _iter_lane_events(controller, points, track, channel, resolution, start, end, shift)
+            for controller, points in lanes.items()
+        ),
+        key=lambda event: event.time,
+    )
@@ -0,0 +1,341 @@
+"""
+Bank index: precomputed statistics of every entry of a Composer bank.
+
+The analysis pass parses each MDC file of a bank directory once, in parallel, and stores its
+statistics (note density, pitch range, drum/instrument mix, ...) as columns in one index file in
+the bank directory (.mdcbank, JSON). Later updates only analyze files that were added or changed
+since, and drop removed files. Queries are answered from the columns without opening any MDC
+file.
+
+Drum tracks also get a rhythm fingerprint (see fingerprint.py), so similar beats can be found with
+nearest() and similar().
+
+Example:
+    index = BankIndex.for_dir("data/mdc", workers=8)
+    keys = index.query(drums=True, bars=(4, 8), density=(8.0, None))
+    for distance, key, track in index.similar("drums.funk1", count=5):
+        ...
+"""
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from .composer import find_bank
+from .converter import Converter
+from .events import NOTE
+from .fingerprint import FingerprintTable, fingerprint_tracks
+from .index import BEATS_PER_MEASURE
+from .tracks import KIND_CODES, ParsedTrack
+
+BANK_INDEX_NAME = ".mdcbank"
+BANK_INDEX_VERSION = 2
+# Statistics columns of each entry:
+#   tracks, drum_tracks: Track line counts.
+#   bars, length: The length of the longest track in bars (rounded up) and beats.
+#   notes: Sounding notes (velocity > 0).
+#   density: Notes per bar.
+#   pitch_min, pitch_max, pitch_range: Of the instrument notes. None without instrument notes.
+#   velocity_mean: Of all notes. 0 without notes.
+#   drum_ratio: The share of notes that are drum notes, 0 to 1.
+STATS = (
+    "tracks",
+    "drum_tracks",
+    "bars",
+    "length",
+    "notes",
+    "density",
+    "pitch_min",
+    "pitch_max",
+    "pitch_range",
+    "velocity_mean",
+    "drum_ratio",
+)
+# Columns identifying the file of each entry
+_FILE_COLUMNS = ("key", "path", "size", "mtime_ns")
+# The [track number, fingerprint as hex] of each drum track of an entry
+FINGERPRINTS = "fingerprints"
+_COLUMNS = _FILE_COLUMNS + STATS + (FINGERPRINTS,)
+# An entry of the index: a value per column
+Row = dict[str, Any]
+
+
+def analyze_tracks(tracks: list[ParsedTrack]) -> Row:
+    """Compute the statistics (see STATS) of the parsed tracks of a bank entry"""
+    note_code: int = KIND_CODES[NOTE]
+    notes: int = 0
+    drum_notes: int = 0
+    velocity_total: int = 0
+    pitch_min: int | None = None
+    pitch_max: int | None = None
+    for track in tracks:
+        for kind, pitch, velocity in zip(track.kinds, track.data1, track.data2):
+            if kind != note_code or not velocity:
+                continue
+            notes += 1
+            velocity_total += velocity
+            if track.is_drum:
+                drum_notes += 1
+                continue
+            if pitch_min is None or pitch < pitch_min:
+                pitch_min = pitch
+            if pitch_max is None or pitch > pitch_max:
+                pitch_max = pitch
+    length: float = max([track.length for track in tracks], default=0.0)
+    bars: int = math.ceil(length / BEATS_PER_MEASURE)
+    return {
+        "tracks": len(tracks),
+        "drum_tracks": len([track for track in tracks if track.is_drum]),
+        "bars": bars,
+        "length": length,
+        "notes": notes,
+        "density": notes / bars if bars else 0.0,
+        "pitch_min": pitch_min,
+        "pitch_max": pitch_max,
+        "pitch_range": pitch_max - pitch_min if pitch_min is not None else None,
+        "velocity_mean": velocity_total / notes if notes else 0.0,
+        "drum_ratio": drum_notes / notes if notes else 0.0,
+    }
+
+
+def _analyze_job(job: tuple[str, str, bool]) -> tuple[str, Row, str]:
+    """Analyze one bank entry. Returns (key, row, error)"""
+    key, path, trusted = job
+    try:
+        stat = os.stat(path)
+        tracks = Converter(trusted=trusted).parse_tracks(path)
+    except Exception as err:
+        return key, {}, f"{type(err).__name__}: {err}"
+    row: Row = {"key": key, "path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    row.update(analyze_tracks(tracks))
+    row[FINGERPRINTS] = [
+        [number, f"{fingerprint:x}"] for number, fingerprint in fingerprint_tracks(tracks)
+    ]
+    return key, row, ""
+
+
+class BankIndex:
+    def __init__(self, path_dir: str, columns: dict[str, list] | None = None):
+        """
+        Use for_dir() or load() instead.
+
+        Args:
+            path_dir (str): The bank directory.
+            columns (dict[str, list] | None): Column name -> one value per entry, sorted by key.
+        """
+        self.path_dir: str = path_dir
+        self.columns: dict[str, list] = columns or {name: [] for name in _COLUMNS}
+        # The fingerprints of all drum tracks, built on first use
+        self._fingerprints: FingerprintTable | None = None
+        # Entries that failed to analyze in the last update: key -> error
+        self.errors: dict[str, str] = {}
+        # Seconds spent in the last update
+        self.seconds: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.columns["key"])
+
+    def keys(self) -> list[str]:
+        return list(self.columns["key"])
+
+    def row(self, key: str) -> Row:
+        """The statistics and file of a bank entry"""
+        position = self.columns["key"].index(key)
+        return {name: values[position] for name, values in self.columns.items()}
+
+    def rows(self) -> dict[str, Row]:
+        return {
+            key: {name: values[position] for name, values in self.columns.items()}
+            for position, key in enumerate(self.columns["key"])
+        }
+
+    @staticmethod
+    def index_path(path_dir: str) -> str:
+        return os.path.join(path_dir, BANK_INDEX_NAME)
+
+    def update(
+        self,
+        bank: dict[str, str] | None = None,
+        workers: int | None = None,
+        trusted: bool = True,
+    ) -> int:
+        """
+        Analyze the entries that are new or changed since the last update, in parallel.
+
+        Entries that are no longer in the bank are dropped.
+
+        Args:
+            bank (dict[str, str] | None): Bank keys and their MDC files. None walks path_dir
+                                          like Composer.load_mdc_bank().
+            workers (int | None): The number of processes. None uses all cores, 1 runs
+                                  in-process.
+            trusted (bool): Skip the per beat range checks of files generated by Grid.
+        Return:
+            int: The number of entries analyzed.
+        """
+        start = time.perf_counter()
+        if bank is None:
+            bank = find_bank(self.path_dir)
+        rows = self.rows()
+        jobs: list[tuple[str, str, bool]] = []
+        for key, path in sorted(bank.items()):
+            row = rows.get(key)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if (
+                row is not None
+                and stat is not None
+                and row["path"] == path
+                and row["size"] == stat.st_size
+                and row["mtime_ns"] == stat.st_mtime_ns
+            ):
+                continue
+            jobs.append((key, path, trusted))
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) < 2:
+            results = list(map(_analyze_job, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                results = list(pool.map(_analyze_job, jobs, chunksize=chunksize))
+        self.errors = {}
+        for key, row, error in results:
+            if error:
+                self.errors[key] = error
+                rows.pop(key, None)
+            else:
+                rows[key] = row
+        keys = sorted(key for key in rows if key in bank)
+        self.columns = {name: [rows[key][name] for key in keys] for name in _COLUMNS}
+        self._fingerprints = None
+        self.seconds = time.perf_counter() - start
+        return len(jobs)
+
+    def query(
+        self, drums: bool | None = None, **ranges: tuple[float | None, float | None]
+    ) -> list[str]:
+        """
+        The keys of the entries matching all conditions, sorted.
+
+        Args:
+            drums (bool | None): True for entries with drum tracks, False for entries without.
+            ranges: STATS column -> (low, high), inclusive. None for an open end. Entries
+                    without a value (e.g. pitch_min of a drum loop) do not match.
+        Example:
+            index.query(drums=False, pitch_range=(12, None), velocity_mean=(40, 80))
+        """
+        for name in ranges:
+            if name not in STATS:
+                raise KeyError(f"Unknown statistic: {name}")
+        matches: list[str] = []
+        drum_tracks = self.columns["drum_tracks"]
+        for position, key in enumerate(self.columns["key"]):
+            if drums is not None and bool(drum_tracks[position]) != drums:
+                continue
+            for name, (low, high) in ranges.items():
+                value = self.columns[name][position]
+                if (
+                    value is None
+                    or (low is not None and value < low)
+                    or (high is not None and value > high)
+                ):
+                    break
+            else:
+                matches.append(key)
+        return matches
+
+    def fingerprint_table(self) -> FingerprintTable:
+        """The fingerprints of all drum tracks of the bank, see fingerprint.py"""
+        if self._fingerprints is None:
+            fingerprints: list[int] = []
+            refs: list[tuple[str, int]] = []
+            for key, tracks in zip(self.columns["key"], self.columns[FINGERPRINTS]):
+                for number, fingerprint in tracks:
+                    fingerprints.append(int(fingerprint, 16))
+                    refs.append((key, number))
+            self._fingerprints = FingerprintTable(fingerprints, refs)
+        return self._fingerprints
+
+    def fingerprint(self, key: str, track: int | None = None) -> int:
+        """The stored fingerprint of a drum track of an entry. None for its first drum track."""
+        for number, fingerprint in self.row(key)[FINGERPRINTS]:
+            if track is None or number == track:
+                return int(fingerprint, 16)
+        raise KeyError(f"No drum track fingerprint: {key} track={track}")
+
+    def nearest(
+        self,
+        fingerprint: int,
+        count: int = 10,
+        max_distance: int | None = None,
+        exclude: str | None = None,
+    ) -> list[tuple[int, str, int]]:
+        """
+        The drum tracks with the most similar rhythm, closest first. See
+        FingerprintTable.nearest().
+
+        Args:
+            fingerprint (int): See fingerprint.track_fingerprint().
+            count (int): The number of results.
+            max_distance (int | None): Leave out tracks with more differing onsets.
+            exclude (str | None): Leave out the tracks of this entry.
+        Return:
+            list[tuple[int, str, int]]: (distance, key, track number) of each result.
+        """
+        return self.fingerprint_table().nearest(fingerprint, count, max_distance, exclude)
+
+    def similar(
+        self, key: str, track: int | None = None, count: int = 10
+    ) -> list[tuple[int, str, int]]:
+        """The drum tracks of other entries most similar to a track of key, see nearest()"""
+        return self.nearest(self.fingerprint(key, track), count, exclude=key)
+
+    def to_dict(self) -> dict:
+        return {"index_version": BANK_INDEX_VERSION, "columns": self.columns}
+
+    def save(self, path: str | None = None):
+        """Write the index atomically, to the bank directory by default"""
+        path = path or self.index_path(self.path_dir)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as index_fd:
+            json.dump(self.to_dict(), index_fd, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path_dir: str, path: str | None = None) -> "BankIndex":
+        with open(path or cls.index_path(path_dir)) as index_fd:
+            data = json.load(index_fd)
+        if data.get("index_version") != BANK_INDEX_VERSION:
+            raise ValueError(f"Unknown bank index version: {data.get('index_version')}")
+        return cls(path_dir, data["columns"])
+
+    @classmethod
+    def for_dir(
+        cls,
+        path_dir: str,
+        workers: int | None = None,
+        trusted: bool = True,
+        save: bool = True,
+    ) -> "BankIndex":
+        """
+        Load the index of a bank directory and bring it up to date.
+
+        Args:
+            path_dir (str): The bank directory.
+            workers (int | None): See update().
+            trusted (bool): See update().
+            save (bool): Write the index back if any entry changed.
+        """
+        try:
+            index = cls.load(path_dir)
+        except (OSError, ValueError, KeyError, TypeError):
+            index = cls(path_dir)
+        previous = index.keys()
+        analyzed = index.update(workers=workers, trusted=trusted)
+        if save and (analyzed or index.keys() != previous):
+            index.save()
+        return index
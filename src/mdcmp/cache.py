@@ -0,0 +1,160 @@
+"""
+Content addressed on-disk cache of rendered MIDI data.
+
+Entries are keyed by a hash of the MDC input bytes and the conversion parameters (tempo, MDC
+format version, automation resolution, render format version, mdcmp version). Writes go to a
+temporary file that is atomically renamed into place, so several processes on one machine can
+share a cache directory. Reads refresh the entry's modification time, which is used for least
+recently used eviction once the cache grows past max_bytes.
+
+The total size is tracked per instance as entries are written, and the directory is only scanned
+to evict, and every RESCAN_INTERVAL writes to pick up the entries of other processes.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from . import VERSION
+from .automation import DEFAULT_RESOLUTION
+from .constants import RENDER_FORMAT_VERSION
+
+CACHE_SUFFIX = ".mid"
+# Writes between scans of the cache directory for its total size
+RESCAN_INTERVAL = 256
+
+
+class RenderCache:
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path (str): The cache directory. Created if missing.
+            max_bytes (int): Evict the least recently used entries past this total size.
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0")
+        self.path: Path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        # The total bytes of all entries as of the last scan plus the writes since, None until
+        # the first scan
+        self._size: int | None = None
+        self._puts: int = 0
+
+    @staticmethod
+    def make_key(
+        data: bytes,
+        tempo: int,
+        mdc_format_version: int,
+        automation_resolution: float = DEFAULT_RESOLUTION,
+    ) -> str:
+        """Hash the input bytes and conversion parameters into a cache key"""
+        digest = hashlib.sha256()
+        digest.update(
+            f"{VERSION}|{RENDER_FORMAT_VERSION}|{mdc_format_version}|{tempo}|"
+            f"{automation_resolution}|".encode()
+        )
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.path.joinpath(key[:2], f"{key}{CACHE_SUFFIX}")
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached MIDI bytes for key or None on a miss"""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, "rb") as entry_fd:
+                data = entry_fd.read()
+        except FileNotFoundError:
+            # Missing, or evicted by another process
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # Mark as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another process since the read, the data is still valid
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store MIDI bytes under key, then evict old entries if over max_bytes"""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced: int = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_fd:
+                tmp_fd.write(data)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._puts += 1
+        if self._size is None or self._puts % RESCAN_INTERVAL == 0:
+            self.size()
+        else:
+            self._size += len(data) - replaced
+        if self._size is not None and self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry"""
+        entries = []
+        for entry in self.path.glob(f"*/*{CACHE_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+
+    def size(self) -> int:
+        """Total bytes of all entries"""
+        self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes"""
+        entries = self._entries()
+        total: int = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, entry in sorted(entries):
+                try:
+                    entry.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._size = total
+
+    def clear(self):
+        """Remove every entry"""
+        for _, _, entry in self._entries():
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counts of this instance and the current cache size"""
+        entries = self._entries()
+        self._size = sum(size for _, size, _ in entries)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": self._size,
+        }
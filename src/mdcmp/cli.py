@@ -1,28 +1,275 @@
 """
-TODO
+Command line interface.
+
+Usage:
+    mdcmp generate -p data/progressions -o out/ -n 100 -s 42
+    mdcmp import -o bank/ -g s loops/
+    mdcmp analyze data/mdc -w density=4:8 -w bars=4:
+    mdcmp analyze data/mdc --like drums.funk1 -n 5
+    mdcmp verify -n 500 --golden golden.json
+    mdcmp verify --baseline
 """
-# import argparse
-# import random
+import argparse
+
+
+def _generate(args: argparse.Namespace):
+    from .generator import generate
+
+    result = generate(
+        args.progressions,
+        args.out,
+        args.count,
+        seed=args.seed,
+        template=args.template,
+        style=args.style,
+        tempo=args.bpm,
+        repeats=args.repeats,
+        workers=args.workers,
+        save_mdc=args.mdc,
+    )
+    print(
+        f"Generated {result.count} songs in {result.seconds:.2f}s "
+        f"({result.songs_per_second:.2f} songs/sec)"
+    )
+
+
+def _import(args: argparse.Namespace):
+    from .grid import Granularity
+    from .smf import import_files
+
+    result = import_files(
+        args.paths,
+        args.out,
+        granularity=Granularity(args.granularity),
+        workers=args.workers,
+        compression=args.compress,
+    )
+    for source, error in result.errors.items():
+        print(f"Failed to import {source}: {error}")
+    print(
+        f"Imported {len(result.paths)} files in {result.seconds:.2f}s "
+        f"({result.files_per_second:.2f} files/sec, {len(result.errors)} failed)"
+    )
+
+
+def _parse_range(where: str) -> tuple[str, tuple[float | None, float | None]]:
+    """Parse NAME=LOW:HIGH, either end may be empty"""
+    name, _, bounds = where.partition("=")
+    low, _, high = bounds.partition(":")
+    try:
+        return name, (float(low) if low else None, float(high) if high else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid range, expected NAME=LOW:HIGH: {where}")
+
+
+def _analyze(args: argparse.Namespace):
+    from .bank import BankIndex
 
+    index = BankIndex.load(args.path) if args.no_update else BankIndex.for_dir(
+        args.path, workers=args.workers
+    )
+    for key, error in index.errors.items():
+        print(f"Failed to analyze {key}: {error}")
+    print(f"Indexed {len(index)} entries in {index.seconds:.2f}s ({len(index.errors)} failed)")
+    if args.where or args.drums is not None:
+        for key in index.query(drums=args.drums, **dict(args.where)):
+            print(key)
+    if args.like:
+        for distance, key, track in index.similar(args.like, count=args.count):
+            print(f"{distance:4d} {key} track={track}")
+
+
+def _verify(args: argparse.Namespace):
+    import os
+
+    from .verify import (
+        BASELINE_GOLDEN,
+        load_baseline_golden,
+        load_golden,
+        save_baseline_golden,
+        save_golden,
+        verify,
+        verify_baseline,
+    )
+
+    if args.baseline_src:
+        seeds = range(args.seed, args.seed + args.count)
+        # Default to the package data of this source tree
+        path = args.baseline or os.path.join(os.path.dirname(__file__), BASELINE_GOLDEN)
+        save_baseline_golden(path, args.baseline_src, seeds)
+        print(f"Wrote {args.count} baseline digests to {path}")
+        return
+    golden = None
+    if args.golden and os.path.exists(args.golden) and not args.update_golden:
+        golden = load_golden(args.golden)
+    result = verify(
+        range(args.seed, args.seed + args.count),
+        paths=args.path or None,
+        golden=golden,
+        workers=args.workers,
+    )
+    if args.baseline is not None:
+        result.mismatches.extend(
+            verify_baseline(load_baseline_golden(args.baseline or None), workers=args.workers)
+        )
+    for mismatch in result.mismatches:
+        print(f"seed {mismatch.seed} {mismatch.path}: {mismatch.detail}")
+    print(
+        f"Verified {args.count} grids in {result.seconds:.2f}s "
+        f"({len(result.mismatches)} mismatches)"
+    )
+    if args.golden and golden is None:
+        save_golden(args.golden, result.digests)
+        print(f"Wrote {len(result.digests)} reference digests to {args.golden}")
+    if not result.ok:
+        raise SystemExit(1)
 
-def cli():
-    """
+
+def cli(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(
         prog="mdcmp", description="Generate MIDI songs from the CLI", epilog=""
     )
-    parser.add_argument(
-        "-d",
-        "--duration",
-        type=int,
-        help="The time in seconds of the generated song",
-        required=True,
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="Generate songs from chord progression files"
+    )
+    generate_parser.add_argument(
+        "-p",
+        "--progressions",
+        type=str,
+        help="Directory of progression files",
+        default="data/progressions",
+    )
+    generate_parser.add_argument(
+        "-o", "--out", type=str, help="Output directory of MIDI files", required=True
+    )
+    generate_parser.add_argument(
+        "-n", "--count", type=int, help="Number of songs to generate", default=1
+    )
+    generate_parser.add_argument(
+        "-s", "--seed", type=int, help="Base seed, song N uses seed+N", default=0
+    )
+    generate_parser.add_argument(
+        "-t", "--template", type=str, help="Song template", default="basic"
     )
-    parser.add_argument(
-        "-b", "--bpm", type=int, help="Tempo, beats per minute", required=True
+    generate_parser.add_argument(
+        "--style", type=str, help="Progression style (file name), default: random"
     )
-    parser.add_argument(
-        "-o", "--out", type=str, help="Output path of MIDI file", required=True
+    generate_parser.add_argument(
+        "-b", "--bpm", type=int, help="Tempo, beats per minute, default: random"
     )
-    args = parser.parse_args()
-    run(args)
-    """
+    generate_parser.add_argument(
+        "-r", "--repeats", type=int, help="Times each progression is played", default=4
+    )
+    generate_parser.add_argument(
+        "-j", "--workers", type=int, help="Worker processes, default: all cores"
+    )
+    generate_parser.add_argument(
+        "--mdc", action="store_true", help="Also write the MDC file of each song"
+    )
+    generate_parser.set_defaults(func=_generate)
+
+    import_parser = subparsers.add_parser(
+        "import", help="Import MIDI files into MDC files"
+    )
+    import_parser.add_argument(
+        "paths", type=str, nargs="+", help="MIDI files or directories of MIDI files"
+    )
+    import_parser.add_argument(
+        "-o", "--out", type=str, help="Output directory of MDC files", required=True
+    )
+    import_parser.add_argument(
+        "-g",
+        "--granularity",
+        type=str,
+        help="Grid granularity to quantize to: h, q, e, s or t",
+        choices=["h", "q", "e", "s", "t"],
+        default="s",
+    )
+    import_parser.add_argument(
+        "-j", "--workers", type=int, help="Worker processes, default: all cores"
+    )
+    import_parser.add_argument(
+        "--compress", choices=["gz", "xz"], help="Write compressed .mdc.gz or .mdc.xz files"
+    )
+    import_parser.set_defaults(func=_import)
+
+    analyze_parser = subparsers.add_parser(
+        "analyze", help="Index the statistics of a bank directory and query them"
+    )
+    analyze_parser.add_argument("path", type=str, help="Bank directory of MDC files")
+    analyze_parser.add_argument(
+        "-w",
+        "--where",
+        type=_parse_range,
+        action="append",
+        default=[],
+        help="Print the keys with a statistic in a range: NAME=LOW:HIGH (e.g. density=4:8)",
+    )
+    analyze_parser.add_argument(
+        "--drums",
+        action=argparse.BooleanOptionalAction,
+        help="Only entries with (--drums) or without (--no-drums) drum tracks",
+    )
+    analyze_parser.add_argument(
+        "--like", type=str, help="Print the drum loops with the most similar rhythm to this key"
+    )
+    analyze_parser.add_argument(
+        "-n", "--count", type=int, default=10, help="Results of --like, default: 10"
+    )
+    analyze_parser.add_argument(
+        "--no-update", action="store_true", help="Query the existing index without updating it"
+    )
+    analyze_parser.add_argument(
+        "-j", "--workers", type=int, help="Worker processes, default: all cores"
+    )
+    analyze_parser.set_defaults(func=_analyze)
+
+    verify_parser = subparsers.add_parser(
+        "verify", help="Check that the fast render paths match the reference render"
+    )
+    verify_parser.add_argument(
+        "-n", "--count", type=int, help="Number of random grids", default=100
+    )
+    verify_parser.add_argument(
+        "-s", "--seed", type=int, help="Base seed, grid N uses seed+N", default=0
+    )
+    verify_parser.add_argument(
+        "-p",
+        "--path",
+        type=str,
+        action="append",
+        default=[],
+        help="Render path to check (repeatable), default: all",
+    )
+    verify_parser.add_argument(
+        "--golden",
+        type=str,
+        help="JSON file of reference digests. Checked if it exists, written otherwise",
+    )
+    verify_parser.add_argument(
+        "--update-golden", action="store_true", help="Rewrite the golden file"
+    )
+    verify_parser.add_argument(
+        "--baseline",
+        type=str,
+        nargs="?",
+        const="",
+        help=(
+            "Also check the reference render against this baseline golden file, default: the "
+            "file of the package"
+        ),
+    )
+    verify_parser.add_argument(
+        "--baseline-src",
+        type=str,
+        help="Write the baseline golden file (-n/-s seeds) with the converter of this src dir",
+    )
+    verify_parser.add_argument(
+        "-j", "--workers", type=int, help="Worker processes, default: all cores"
+    )
+    verify_parser.set_defaults(func=_verify)
+
+    args = parser.parse_args(argv)
+    args.func(args)
@@ -1,26 +1,168 @@
 from pathlib import Path
-from midiutil import MIDIFile
-from .converter import Converter
+from typing import TYPE_CHECKING, NamedTuple
+from .converter import Converter, new_midifile
 from .constants import FORMAT_VERSION
+from .events import NOTE
+from .tracks import ParsedTrack
+from .util import MDC_SUFFIXES, strip_mdc_suffix
 # from .grid import Grid
 
+if TYPE_CHECKING:
+    from midiutil import MIDIFile
+    from .cache import RenderCache
+    from .sharedbank import SharedBank
+
+
+def find_bank(path_dir: str) -> dict[str, str]:
+    """
+    Find the MDC files of a bank directory (recursively) and their reference keys.
+
+    The key is the last directory and the file name without suffix. Compressed files (.mdc.gz,
+    .mdc.xz) are found too, a plain file wins over a compressed file of the same key.
+    Example: data/mdc/misc/test.mdc converts to
+        {"misc.test": "data/mdc/misc/test.mdc"}
+    """
+    bank: dict[str, str] = {}
+    for suffix in MDC_SUFFIXES:
+        for path in sorted(Path(path_dir).rglob(f"*{suffix}")):
+            key = f"{path.parts[-2]}.{strip_mdc_suffix(path.parts[-1])}"
+            bank.setdefault(key, str(path.joinpath()))
+    return bank
+
+
+class Loop:
+    """A parsed bank entry. The tracks are shared by every placement of the loop."""
+
+    def __init__(self, key: str, tracks: list[ParsedTrack]):
+        self.key: str = key
+        self.tracks: list[ParsedTrack] = tracks
+        # Length in beats
+        self.length: float = max([track.length for track in tracks], default=0.0)
+
+
+class Section:
+    def __init__(
+        self,
+        name: str,
+        keys: list[str],
+        loops: int = 1,
+        tempo: int | None = None,
+        fade_in: float = 0.0,
+        fade_out: float = 0.0,
+    ):
+        """
+        A section of a composition (e.g. intro, verse, chorus).
+
+        Args:
+            name (str): The name of the section.
+            keys (list[str]): Bank keys of the loops to layer in this section.
+            loops (int): How many times the longest loop is repeated.
+            tempo (int | None): Change the tempo at the start of the section. None keeps the
+                                current tempo.
+            fade_in (float): Beats to fade the velocity in from 0 at the start of the section.
+            fade_out (float): Beats to fade the velocity out to 0 at the end of the section.
+                              Notes at a gain of 0 are dropped, faded velocities are at least 1.
+        """
+        if loops < 1:
+            raise ValueError("loops must be >= 1")
+        if fade_in < 0 or fade_out < 0:
+            raise ValueError("fade_in and fade_out must be >= 0")
+        self.name: str = name
+        self.keys: list[str] = keys
+        self.loops: int = loops
+        self.tempo: int | None = tempo
+        self.fade_in: float = fade_in
+        self.fade_out: float = fade_out
+
+    def gain(self, time: float, length: float) -> float:
+        """The fade multiplier at a time (in beats) relative to the start of the section"""
+        gain: float = 1.0
+        if self.fade_in and time < self.fade_in:
+            gain = min(gain, time / self.fade_in)
+        if self.fade_out and time > length - self.fade_out:
+            gain = min(gain, max(length - time, 0.0) / self.fade_out)
+        return gain
+
+
+class Placement(NamedTuple):
+    """A loop track placed in a section, emitted by Composer.write()"""
+
+    track: ParsedTrack
+    midi_track: int
+    # The length of the loop, the track is repeated every loop_length beats
+    loop_length: float
+    # The start and the length of the section, in beats
+    offset: float
+    length: float
+    section: Section
+
+
+class Composition:
+    """
+    An ordered list of sections. Example:
+
+        composition = Composition()
+        composition.add_section("intro", ["drums.beat1"], loops=2, fade_in=8)
+        composition.add_section("verse", ["drums.beat1", "lofi.keys1"], loops=8)
+        composition.add_section("outro", ["lofi.keys1"], loops=2, tempo=90, fade_out=16)
+        composer.arrange(composition)
+        composer.save("song.mid")  # the events are emitted here
+    """
+
+    def __init__(self):
+        self.sections: list[Section] = []
+
+    def add_section(
+        self,
+        name: str,
+        keys: list[str],
+        loops: int = 1,
+        tempo: int | None = None,
+        fade_in: float = 0.0,
+        fade_out: float = 0.0,
+    ) -> Section:
+        """Append a section. See Section for the arguments."""
+        section = Section(
+            name, keys, loops=loops, tempo=tempo, fade_in=fade_in, fade_out=fade_out
+        )
+        self.sections.append(section)
+        return section
+
 
 class Composer:
     def __init__(
         self,
         tempo: int,
         mdc_format_version: int = FORMAT_VERSION,
-        midifile_obj: MIDIFile | None = None,
+        midifile_obj: "MIDIFile | None" = None,
+        trusted: bool = True,
+        cache: "RenderCache | None" = None,
     ):
-        self.midi = (
-            midifile_obj
-            if midifile_obj
-            else MIDIFile(numTracks=128, deinterleave=False)
-        )
+        """
+        Args:
+            tempo (int): The tempo in BPM (beats per minute).
+            mdc_format_version (int): The MDC format version of the bank files.
+            midifile_obj (midiutil.MIDIFile): A class that encapsulates a MIDI file object.
+            trusted (bool): Skip the per beat range checks of bank files generated by Grid. See
+                            Converter.
+            cache (RenderCache | None): An optional cache of rendered bank entries, see
+                                        render_mdc().
+        """
+        self.midi = midifile_obj if midifile_obj else new_midifile()
         self.converter = Converter(
-            tempo=tempo, midifile_obj=self.midi, mdc_format_version=mdc_format_version
+            tempo=tempo,
+            midifile_obj=self.midi,
+            mdc_format_version=mdc_format_version,
+            trusted=trusted,
+            cache=cache,
         )
         self.bank: dict[str, str] = {}
+        # Parsed bank entries, filled on first use
+        self.loops: dict[str, Loop] = {}
+        # The time offset (in beats) where the next arrangement starts
+        self._arrangement_offset: float = 0.0
+        # Arranged loop tracks that are not written to the MIDI tracks yet
+        self.placements: list[Placement] = []
 
     def load_mdc_bank(self, path_dir: str):
         """
@@ -30,9 +172,8 @@ class Composer:
         Example: data/mdc/misc/test.mdc converts to
             {"misc.mdc": "data/mdc/misc/test.mdc"}
         """
-        for path in Path(path_dir).rglob("*.mdc"):
-            key = f"{path.parts[-2]}.{path.parts[-1].removesuffix('.mdc')}"
-            self.bank[key] = str(path.joinpath())
+        for key, path in find_bank(path_dir).items():
+            self.bank[key] = path
             print(key, ':', self.bank[key])
 
     def convert_mdc(self, key: str):
@@ -41,7 +182,102 @@ class Composer:
             raise KeyError(f"Key not found in self.bank: {key}")
         self.converter.convert(value)
 
-    def save(self, path: str):
-        self.converter.save(path)
+    def render_mdc(self, key: str) -> bytes:
+        """Render a bank entry to standalone MIDI file bytes, using the cache if set"""
+        value: str = self.bank.get(key, '')
+        if not value:
+            raise KeyError(f"Key not found in self.bank: {key}")
+        return self.converter.render(value)
+
+    def load_loop(self, key: str) -> Loop:
+        """Parse a bank entry once and cache the events"""
+        loop = self.loops.get(key)
+        if loop:
+            return loop
+        value: str = self.bank.get(key, '')
+        if not value:
+            raise KeyError(f"Key not found in self.bank: {key}")
+        loop = Loop(key, self.converter.parse_tracks(value))
+        self.loops[key] = loop
+        return loop
+
+    def use_shared_bank(self, shared: "SharedBank"):
+        """
+        Use the parsed loops of a shared memory bank instead of parsing bank files.
+
+        The loop tracks are read-only views of the shared segment, see sharedbank.SharedBank.
+        """
+        for key in shared.keys():
+            self.loops[key] = Loop(key, shared.tracks(key))
+
+    def arrange(self, composition: Composition):
+        """
+        Arrange a composition after anything arranged before.
+
+        Each bank entry is parsed once. Sections only reference the parsed tracks with their
+        offsets, the events are emitted by write() (or save()) with their time offset, track and
+        fade applied. Each (key, track of the loop) pair gets its own MIDI track for the whole
+        composition. Shorter loops are repeated to fill their section, and a loop that does not
+        fit a whole number of times ends with the part that fits.
+        """
+        track_map: dict[tuple[str, int], int] = {}
+        offset: float = self._arrangement_offset
+        for section in composition.sections:
+            loops = [self.load_loop(key) for key in section.keys]
+            loop_length: float = max([loop.length for loop in loops], default=0.0)
+            length: float = loop_length * section.loops
+            if section.tempo:
+                self.converter.add_tempo(offset, section.tempo)
+            for loop in loops:
+                if loop.length <= 0:
+                    continue
+                for n, parsed in enumerate(loop.tracks):
+                    if (loop.key, n) not in track_map:
+                        track_map[(loop.key, n)] = self.converter.track
+                        self.converter.track += 1
+                    self.placements.append(
+                        Placement(
+                            parsed, track_map[(loop.key, n)], loop.length, offset, length, section
+                        )
+                    )
+            offset += length
+        self._arrangement_offset = offset
 
+    def _emit(self, placement: Placement):
+        """Write the events of a placement to the MIDI tracks"""
+        section = placement.section
+        length = placement.length
+        fade: bool = bool(section.fade_in or section.fade_out)
+        repeats = int(length // placement.loop_length)
+        if length - repeats * placement.loop_length > 0:
+            # The part of the loop that fits
+            repeats += 1
+        for repeat in range(repeats):
+            start: float = repeat * placement.loop_length
+            partial: bool = start + placement.loop_length > length
+            for event in placement.track.events(placement.midi_track):
+                time = start + event.time
+                if partial and time >= length:
+                    continue
+                if event.kind == NOTE:
+                    if fade:
+                        gain = section.gain(time, length)
+                        # A velocity 0 note on is a note off, silent notes are dropped
+                        if gain <= 0:
+                            continue
+                        event = event._replace(
+                            data2=max(int(event.data2 * gain), 1) if event.data2 else 0
+                        )
+                    if partial and time + event.duration > length:
+                        event = event._replace(duration=length - time)
+                self.converter.add_event(event._replace(time=placement.offset + time))
 
+    def write(self):
+        """Emit the events of everything arranged so far to the MIDI tracks (self.midi)"""
+        for placement in self.placements:
+            self._emit(placement)
+        self.placements = []
+
+    def save(self, path: str):
+        self.write()
+        self.converter.save(path)
@@ -6,27 +6,42 @@ Constants go here.
 KNOWN_MDC_FORMAT_VERSIONS = (1,)
 # The latest format version and default for this build:
 FORMAT_VERSION = 1
+# Optional header provenance written by Grid: "version|grid|checksum"
+MDC_PROVENANCE_GRID = "grid"
+# Track type of automation lines, see automation.py
+AUTOMATION_TRACK_TYPE = "automation"
+# The version of the MIDI output of a conversion, part of RenderCache keys. Bump it with every
+# change of the rendered bytes (and list the change in verify.BASELINE_DELTAS):
+#   1: The baseline converter.
+#   2: Controller events are only sent when their value changes.
+#   3: Integer tick timeline, a dotted eighth note lasts 0.75 beats.
+RENDER_FORMAT_VERSION = 3
 ################################################################################
-# Note mappings for translating note names to MIDI timings
-NOTE_TIME_MAP = {
-    "W": 8,
-    "w.": 6,
-    "w": 4,
-    "h.": 3,
-    "h": 2,
-    "q.": 1.5,
-    "q": 1,
-    "e.": 0.525,
-    "e": 0.5,
-    "s.": 0.375,
-    "s": 0.25,
-    "t.": 0.1875,
-    "t": 0.125,
-    "S": 0.0625,
-    "H": 0.0625 / 2,
-    "0": 0.0,
-    "n": 0.0,
+# The MIDI file resolution in ticks per beat (quarter note). Every note length below is a whole
+# number of ticks, so times on the tick timeline are exact over any length.
+TICKS_PER_BEAT = 960
+# Note mappings for translating note names to MIDI timings, in ticks
+NOTE_TICK_MAP = {
+    "W": 7680,
+    "w.": 5760,
+    "w": 3840,
+    "h.": 2880,
+    "h": 1920,
+    "q.": 1440,
+    "q": 960,
+    "e.": 720,
+    "e": 480,
+    "s.": 360,
+    "s": 240,
+    "t.": 180,
+    "t": 120,
+    "S": 60,
+    "H": 30,
+    "0": 0,
+    "n": 0,
 }
+# The same in beats. The values are exact binary fractions.
+NOTE_TIME_MAP = {k: v / TICKS_PER_BEAT for k, v in NOTE_TICK_MAP.items()}
 # for calculating note types to duration in duration (e.g. for loop range)
 NOTE_TYPE_GRID_QUANTIZE_MAP = {
     "w": 0.25,
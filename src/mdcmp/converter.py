@@ -1,12 +1,32 @@
 """
 Translate MDC files to MIDI files.
 """
-from typing import Any
-from midiutil import MIDIFile
-from mingus.core.notes import RangeError
+import io
+import itertools
+from typing import TYPE_CHECKING, Any, Iterator
 
+from .events import (
+    Event,
+    NOTE,
+    CONTROL,
+    PITCHWHEEL,
+    order_track_events,
+    merge_tracks,
+)
+from .automation import AutomationPoint, DEFAULT_RESOLUTION, lane_events, parse_lanes
 from .exceptions import PitchNotFoundError
-from .constants import NOTE_TIME_MAP, KNOWN_MDC_FORMAT_VERSIONS, EVENT_MAP, FORMAT_VERSION
+from .tracks import ParsedTrack
+from .constants import (
+    NOTE_TICK_MAP,
+    NOTE_TIME_MAP,
+    TICKS_PER_BEAT,
+    KNOWN_MDC_FORMAT_VERSIONS,
+    EVENT_MAP,
+    FORMAT_VERSION,
+    MDC_PROVENANCE_GRID,
+    AUTOMATION_TRACK_TYPE,
+)
+from .util import mdc_buffer, mdc_checksum, open_mdc
 from .exceptions import (
     MdcInvalidNoteError,
     MdcLineError,
@@ -16,14 +36,45 @@ from .exceptions import (
     MdcAlignmentError,
 )
 
+if TYPE_CHECKING:
+    from midiutil import MIDIFile
+    from .cache import RenderCache
+
+# A version 1 track line: track type, granularity, start offset, patterns
+TrackLine = tuple[str, str, float, list[str]]
+# Automation lanes of a track: controller -> sorted points
+Lanes = dict[str, list[AutomationPoint]]
+# An event of a track line on the tick timeline: tick, kind, data1, data2, duration in ticks
+TickEvent = tuple[int, str, int, int, int]
+
+# The largest note padding, i.e. how far past its beat a note can start
+MAX_NOTE_PADDING: float = max(NOTE_TIME_MAP.values())
+
+
+def new_midifile() -> "MIDIFile":
+    """
+    Create the default MIDIFile, with event times in ticks. midiutil is imported on first use.
+    """
+    from midiutil import MIDIFile
+
+    return MIDIFile(
+        numTracks=128,
+        deinterleave=False,
+        ticks_per_quarternote=TICKS_PER_BEAT,
+        eventtime_is_ticks=True,
+    )
+
 
 class Converter:
     def __init__(
         self,
         tempo: int = 120,
         track: int = 0,
-        midifile_obj: MIDIFile | None = None,
+        midifile_obj: "MIDIFile | None" = None,
         mdc_format_version: int = FORMAT_VERSION,
+        trusted: bool = False,
+        cache: "RenderCache | None" = None,
+        automation_resolution: float = DEFAULT_RESOLUTION,
     ):
         """
         Args:
@@ -32,14 +83,22 @@ class Converter:
                          mutated elsewhere. Otherwise, ignore this value.
             midifile_obj (midiutil.MIDIFile): A class that encapsulates a MIDI file object.
             mdc_format_version (int): The MDC format version of in the input file.
+            trusted (bool): Skip the per beat range checks of files generated by Grid, after
+                            verifying the checksum in their header. Files without a Grid header
+                            or with a checksum mismatch are always fully validated. The
+                            alignment of the beat lists is always checked.
+            cache (RenderCache | None): An optional cache used by render().
+            automation_resolution (float): The sampling interval of automation ramps, in beats.
         """
         self.track: int = track
+        self.trusted: bool = trusted
+        self.cache: "RenderCache | None" = cache
+        self.automation_resolution: float = automation_resolution
+        self.tempo: int = tempo
         self.mdc_format_version: int = mdc_format_version
-        self.midi = (
-            midifile_obj
-            if midifile_obj
-            else MIDIFile(numTracks=128, deinterleave=False)
-        )
+        self.midi = midifile_obj if midifile_obj else new_midifile()
+        # MIDIFile objects created elsewhere may take times in beats
+        self._ticks: bool = getattr(self.midi, "eventtime_is_ticks", False)
         # Internally track the last time offset
         self._max_time_offset: float = 0.0
         self.midi.addTempo(0, 0, tempo)
@@ -54,13 +113,12 @@ class Converter:
         pitches: list[int] | int,
         note_types: list[str] | str,
         note_paddings: list[str] | str,
-        velocities: list[int] | int,
     ):
         # Validate note types
         for note_check in (note_types, note_paddings):
             if isinstance(note_check, list):
                 for note_type in note_check:
-                    if note_type not in NOTE_TIME_MAP.keys():
+                    if note_type not in NOTE_TICK_MAP:
                         raise MdcInvalidNoteError(f"Unknown note type: {note_type}")
         # Validate pitches
         if isinstance(pitches, list):
@@ -71,7 +129,17 @@ class Converter:
             if pitches < 0 or pitches > 127:
                 raise PitchNotFoundError(f"Invalid pitch: {pitches}")
 
-        # Validate list sizes match len(pitches)
+    def _validate_alignment(
+        self,
+        pitches: list[int] | int,
+        note_types: list[str] | str,
+        note_paddings: list[str] | str,
+        velocities: list[int] | int,
+    ):
+        """
+        Validate list sizes match len(pitches). Always checked, also in trusted mode: Grid output
+        is not aligned by construction (e.g. two chords in one cell with different velocities).
+        """
         for i in (note_types, note_paddings, velocities):
             if isinstance(pitches, list):
                 if isinstance(i, list) and len(i) != len(pitches):
@@ -84,27 +152,34 @@ class Converter:
                         "Invalid data alignment to single pitch."
                     )  # TODO
 
-    def _convert_patterns_v1(
+    def _iter_ticks_v1(
         self,
         patterns: list[str],
         granularity: str,
-        track_type: str,
         start_offset: float,
-    ):
+        validate: bool = True,
+    ) -> Iterator[TickEvent]:
         """
-        Convert a single line of the composer format data to midi.
+        Parse a single line of the composer format data into events on the tick timeline.
+
+        The beat position is an integer tick count and note lengths are looked up in ticks, so
+        there is no rounding drift however long the line is. Events are yielded in beat order.
+        Note paddings can place a note after the events of following beats, see
+        events.order_track_events().
 
         Args:
             patterns (list[str]): The data section of the MDC format in list format.
             granularity (str): The grid granularity to quantize to.
-            track_type (str): Describes the type of track. Either "drum" or "instrument".
-            start_offset (float): The time offset in which the track starts.
+            start_offset (float): The time offset (in beats) in which the track starts.
+            validate (bool): Validate the values of each beat. Only disabled for verified Grid
+                             output. The alignment of the beat lists is always validated.
         """
-        timer: float = 0.0 + start_offset
-        increment: float = NOTE_TIME_MAP.get(granularity, 0.0)
-        channel: int = 9 if track_type == "drum" else 0
-        if increment == 0.0:
+        tick: int = round(start_offset * TICKS_PER_BEAT)
+        increment: int = NOTE_TICK_MAP.get(granularity, 0)
+        if increment == 0:
             raise MdcInvalidGranularityError(f"Unknown granularity: {granularity}")
+        # The last value sent per controller. Unchanged values are not sent again.
+        last_values: dict[str, int] = {}
         for pattern in patterns:
             # Forgive extra spacing
             if not pattern.strip():
@@ -135,7 +210,6 @@ class Converter:
             except Exception as err:
                 raise Exception(f"Unknown error parsing mdc data: {err}")
 
-            self._validate(pitches, note_types, note_paddings, velocities)
             event_items = {
                 "volume": volume,
                 "pitchwheel": pitchwheel,
@@ -144,13 +218,18 @@ class Converter:
                 "sustain": sustain,
                 "pan": pan,
             }
-            # validate track automations
-            for item in event_items.values():
-                if item == "n":
-                    continue
-                item = int(item)
-                if item < 0 or item > 127:
-                    raise RangeError(f"Value is out of range (0-127): {item}")
+            self._validate_alignment(pitches, note_types, note_paddings, velocities)
+            if validate:
+                self._validate(pitches, note_types, note_paddings)
+                # validate track automations
+                for item in event_items.values():
+                    if item == "n":
+                        continue
+                    item = int(item)
+                    if item < 0 or item > 127:
+                        from mingus.core.notes import RangeError
+
+                        raise RangeError(f"Value is out of range (0-127): {item}")
 
             # Handle events first
             for event_name, value in event_items.items():
@@ -160,83 +239,292 @@ class Converter:
                 if value in ("n",):
                     continue
                 value = int(value)
+                if last_values.get(event_name) == value:
+                    continue
+                last_values[event_name] = value
                 if event_name == "pitchwheel":
-                    self.midi.addPitchWheelEvent(self.track, channel, timer, value)
+                    yield tick, PITCHWHEEL, 0, value, 0
                 else:
-                    self.midi.addControllerEvent(
-                        self.track, channel, timer, event_int, value
-                    )
+                    yield tick, CONTROL, event_int, value, 0
 
             # Layer the pitches and settings onto a single MIDI track
             if isinstance(pitches, list):
                 for n, pitch in enumerate(pitches):
                     if isinstance(note_types, list):
-                        note_type = NOTE_TIME_MAP.get(note_types[n], 0.0)
+                        note_type = NOTE_TICK_MAP.get(note_types[n], 0)
                     else:
-                        note_type = NOTE_TIME_MAP.get(note_types, 0.0)
+                        note_type = NOTE_TICK_MAP.get(note_types, 0)
                     if isinstance(note_paddings, list):
-                        note_padding = NOTE_TIME_MAP.get(note_paddings[n], 0.0)
+                        note_padding = NOTE_TICK_MAP.get(note_paddings[n], 0)
                     else:
-                        note_padding = NOTE_TIME_MAP.get(note_paddings, 0.0)
+                        note_padding = NOTE_TICK_MAP.get(note_paddings, 0)
                     if isinstance(velocities, list):
                         velocity = velocities[n]
                     else:
                         velocity = velocities
-                    """
-                    print((
-                        f'self.midi.addNote({self.track}, {channel}, {pitch},'
-                        f'{timer + note_padding}, {note_type}, {velocity})'
-                    ))
-                    """
-                    self.midi.addNote(
-                        self.track,
-                        channel,
-                        pitch,
-                        timer + note_padding,
-                        note_type,
-                        velocity,
-                    )
+                    yield tick + note_padding, NOTE, pitch, velocity, note_type
 
             else:
                 # All items are a single value and not a list
-                note_type = NOTE_TIME_MAP.get(note_types, 0.0)
-                note_paddings = NOTE_TIME_MAP.get(note_paddings, 0.0)
-                """
-                print((
-                    f'self.midi.addNote({self.track}, {channel}, {pitches},'
-                    f'{timer + note_paddings}, {note_type}, {velocities})'
-                ))
-                """
-                self.midi.addNote(
-                    self.track,
-                    channel,
-                    pitches,
-                    timer + note_paddings,
-                    note_type,
-                    velocities,
-                )
-            # Increment the timer according to the grid granularity
-            timer += increment
-            self._max_time_offset = max(self._max_time_offset, timer)
+                note_type = NOTE_TICK_MAP.get(note_types, 0)
+                note_paddings = NOTE_TICK_MAP.get(note_paddings, 0)
+                yield tick + note_paddings, NOTE, pitches, velocities, note_type
+            # Advance according to the grid granularity
+            tick += increment
+        self._max_time_offset = max(self._max_time_offset, tick / TICKS_PER_BEAT)
 
-    def _convert_v1(self, data: list[str]):
-        """Version 1 format"""
+    def _iter_patterns_v1(
+        self,
+        patterns: list[str],
+        granularity: str,
+        track_type: str,
+        start_offset: float,
+        track: int,
+        validate: bool = True,
+    ) -> Iterator[Event]:
+        """
+        Parse a single line of the composer format data into events, see _iter_ticks_v1().
+
+        Event times are converted from ticks to beats. Tick times of all note values are exact
+        in beats.
+
+        Args:
+            patterns (list[str]): The data section of the MDC format in list format.
+            granularity (str): The grid granularity to quantize to.
+            track_type (str): Describes the type of track. Either "drum" or "instrument".
+            start_offset (float): The time offset in which the track starts.
+            track (int): The MIDI track number to assign to the events.
+            validate (bool): Validate each beat. Only disabled for verified Grid output.
+        """
+        channel: int = 9 if track_type == "drum" else 0
+        for tick, kind, data1, data2, duration in self._iter_ticks_v1(
+            patterns, granularity, start_offset, validate
+        ):
+            yield Event(
+                tick / TICKS_PER_BEAT,
+                track,
+                channel,
+                kind,
+                data1,
+                data2,
+                duration / TICKS_PER_BEAT,
+            )
+
+    def add_event(self, event: Event):
+        """Write a single event to self.midi. Times in beats are rounded to the nearest tick."""
+        if self._ticks:
+            event = event._replace(
+                time=round(event.time * TICKS_PER_BEAT),
+                duration=round(event.duration * TICKS_PER_BEAT),
+            )
+        if event.kind == NOTE:
+            self.midi.addNote(
+                event.track,
+                event.channel,
+                event.data1,
+                event.time,
+                event.duration,
+                event.data2,
+            )
+        elif event.kind == PITCHWHEEL:
+            self.midi.addPitchWheelEvent(event.track, event.channel, event.time, event.data2)
+        else:
+            self.midi.addControllerEvent(
+                event.track, event.channel, event.time, event.data1, event.data2
+            )
+
+    def add_tempo(self, time: float, tempo: int):
+        """Add a tempo change at time (in beats) to self.midi"""
+        self.midi.addTempo(0, round(time * TICKS_PER_BEAT) if self._ticks else time, tempo)
+
+    def _convert_patterns_v1(
+        self,
+        patterns: list[str],
+        granularity: str,
+        track_type: str,
+        start_offset: float,
+        validate: bool = True,
+    ):
+        """
+        Convert a single line of the composer format data to midi.
+
+        Args:
+            patterns (list[str]): The data section of the MDC format in list format.
+            granularity (str): The grid granularity to quantize to.
+            track_type (str): Describes the type of track. Either "drum" or "instrument".
+            start_offset (float): The time offset in which the track starts.
+            validate (bool): Validate each beat.
         """
+        if not self._ticks:
+            for event in self._iter_patterns_v1(
+                patterns, granularity, track_type, start_offset, self.track, validate
+            ):
+                self.add_event(event)
+            return
+        # Write straight from the tick timeline
+        midi = self.midi
+        track: int = self.track
+        channel: int = 9 if track_type == "drum" else 0
+        for tick, kind, data1, data2, duration in self._iter_ticks_v1(
+            patterns, granularity, start_offset, validate
+        ):
+            if kind == NOTE:
+                midi.addNote(track, channel, data1, tick, duration, data2)
+            elif kind == PITCHWHEEL:
+                midi.addPitchWheelEvent(track, channel, tick, data2)
+            else:
+                midi.addControllerEvent(track, channel, tick, data1, data2)
+
+    def _split_line_v1(self, line_num: int, line: str) -> tuple[str, str, float, list[str]]:
+        """Split a version 1 track line into track type, granularity, offset and patterns"""
+        if "|" not in line:
+            raise MdcLineError(f"Invalid line {line_num}: {line}")
+        try:
+            _, track_type, granularity, offset, mdata = line.split("|")
+        except ValueError:
+            raise MdcFormatError(f"Invalid format on line: {line_num}")
+        patterns = mdata.strip().replace("; ", ";").split(";")
+        return track_type, granularity, float(offset), patterns
+
+    def _split_lines_v1(self, data: list[str]) -> tuple[list[TrackLine], dict[int, Lanes]]:
         """
+        Split version 1 lines into track lines and automation lanes.
 
+        Return:
+            tuple: The track lines as (track type, granularity, offset, patterns) and the
+                   automation lanes of each track line index (controller -> sorted points).
+        """
+        lines: list[TrackLine] = []
+        automation: dict[int, Lanes] = {}
         for line_num, i in enumerate(data):
             # Forgive blank lines
             if not i.strip():
                 continue
-            if "|" not in i:
-                raise MdcLineError(f"Invalid line {line_num}: {i}")
-            try:
-                _, track_type, granularity, offset, mdata = i.split("|")
-            except ValueError:
-                raise MdcFormatError(f"Invalid format on line: {line_num}")
-            patterns = mdata.strip().replace("; ", ";").split(";")
-            self._convert_patterns_v1(patterns, granularity, track_type, float(offset))
+            track_type, granularity, offset, patterns = self._split_line_v1(line_num, i)
+            if track_type != AUTOMATION_TRACK_TYPE:
+                lines.append((track_type, granularity, offset, patterns))
+                continue
+            self._add_automation_v1(automation, line_num, i, offset, patterns)
+        for target in automation:
+            if target >= len(lines):
+                raise MdcLineError(f"Automation for unknown track line: {target}")
+        return lines, automation
+
+    def _add_automation_v1(
+        self,
+        automation: dict[int, Lanes],
+        line_num: int,
+        line: str,
+        offset: float,
+        patterns: list[str],
+    ):
+        """Merge the lanes of an automation line into automation (track line index -> lanes)"""
+        # The target track line index is stored in the reserved field
+        try:
+            target = int(line.split("|", 1)[0])
+        except ValueError:
+            target = -1
+        if target < 0:
+            raise MdcLineError(f"Invalid automation target on line {line_num}: {line}")
+        lanes = automation.setdefault(target, {})
+        for controller, points in parse_lanes(patterns).items():
+            lane = lanes.setdefault(controller, [])
+            lane.extend(point._replace(time=point.time + offset) for point in points)
+            lane.sort(key=lambda point: point.time)
+
+    def _convert_v1(self, data: list[str], validate: bool = True):
+        """Version 1 format"""
+        lines, automation = self._split_lines_v1(data)
+        for line_index, (track_type, granularity, offset, patterns) in enumerate(lines):
+            self._convert_patterns_v1(patterns, granularity, track_type, offset, validate)
+            for event in lane_events(
+                automation.get(line_index, {}),
+                self.track,
+                9 if track_type == "drum" else 0,
+                self.automation_resolution,
+            ):
+                self.add_event(event)
+            self.track += 1
+
+    def _iter_events_v1(self, data: list[str], validate: bool = True) -> Iterator[Event]:
+        """Version 1 format, as a single time ordered event stream"""
+        tracks = []
+        lines, automation = self._split_lines_v1(data)
+        for line_index, (track_type, granularity, offset, patterns) in enumerate(lines):
+            tracks.append(
+                order_track_events(
+                    self._iter_patterns_v1(
+                        patterns, granularity, track_type, offset, self.track, validate
+                    ),
+                    MAX_NOTE_PADDING,
+                )
+            )
+            if line_index in automation:
+                tracks.append(
+                    lane_events(
+                        automation[line_index],
+                        self.track,
+                        9 if track_type == "drum" else 0,
+                        self.automation_resolution,
+                    )
+                )
             self.track += 1
+        return merge_tracks(tracks)
+
+    def _parse_tracks_v1(self, data: list[str], validate: bool = True) -> list[ParsedTrack]:
+        """Version 1 format, parsed into one ParsedTrack per line"""
+        tracks: list[ParsedTrack] = []
+        lines, automation = self._split_lines_v1(data)
+        for line_index, (track_type, granularity, offset, patterns) in enumerate(lines):
+            beats = len([pattern for pattern in patterns if pattern.strip()])
+            channel = 9 if track_type == "drum" else 0
+            tracks.append(
+                ParsedTrack.from_events(
+                    itertools.chain(
+                        self._iter_patterns_v1(
+                            patterns, granularity, track_type, offset, len(tracks), validate
+                        ),
+                        lane_events(
+                            automation.get(line_index, {}),
+                            len(tracks),
+                            channel,
+                            self.automation_resolution,
+                        ),
+                    ),
+                    channel=channel,
+                    length=offset + beats * NOTE_TIME_MAP.get(granularity, 0.0),
+                )
+            )
+        return tracks
+
+    def _read_mdc(self, path_to_mdc_file: str) -> tuple[int, list[str], bool]:
+        """Read an mdc file, see _parse_mdc(). Compressed files are decompressed while read."""
+        with open_mdc(path_to_mdc_file) as mdc_fd:
+            return self._parse_mdc(mdc_fd.read())
+
+    def _parse_mdc(self, mdc_data: str) -> tuple[int, list[str], bool]:
+        """
+        Split mdc data and return the format version, the track lines and whether the beats need
+        validation.
+
+        The range checks are skipped only in trusted mode, for data that carries a Grid
+        provenance header whose checksum matches the track lines.
+        """
+        header, _, body = mdc_data.strip().partition("\n")
+        version, _, provenance = header.partition("|")
+        try:
+            mdc_version: int = int(version)
+            if mdc_version not in KNOWN_MDC_FORMAT_VERSIONS:
+                raise MdcUnknownVersionError(
+                    f"Unknown mdc format version: {mdc_version}"
+                )
+        except ValueError:
+            raise MdcFormatError("Invalid header. Is this an mdc file?")
+        validate: bool = True
+        if self.trusted and provenance:
+            source, _, checksum = provenance.partition("|")
+            validate = not (source == MDC_PROVENANCE_GRID and checksum == mdc_checksum(body))
+        return mdc_version, body.split("\n"), validate
 
     def convert(self, path_to_mdc_file: str):
         """
@@ -252,21 +540,222 @@ class Converter:
             version(int)
             reserved|track-type|granularity|start-offset| track-data...
         """
-        with open(path_to_mdc_file) as mdc_fd:
-            data = mdc_fd.read().strip().split("\n")
-        try:
-            mdc_version: int = int(data[0])
-            if mdc_version not in KNOWN_MDC_FORMAT_VERSIONS:
-                raise MdcUnknownVersionError(
-                    f"Unknown mdc format version: {mdc_version}"
-                )
-        except ValueError:
-            raise MdcFormatError("Invalid header. Is this an mdc file?")
+        mdc_version, data, validate = self._read_mdc(path_to_mdc_file)
+        self._convert(mdc_version, data, validate)
+
+    def convert_data(self, mdc_data: str):
+        """
+        Same as convert(), but for in-memory MDC data (e.g. from Grid.to_data()).
+
+        Args:
+            mdc_data (str): MDC format data.
+        """
+        mdc_version, data, validate = self._parse_mdc(mdc_data)
+        self._convert(mdc_version, data, validate)
+
+    def _convert(self, mdc_version: int, data: list[str], validate: bool = True):
         if mdc_version == 1:
-            self._convert_v1(data[1:])
+            self._convert_v1(data, validate)
         else:
             raise MdcUnknownVersionError(f"Unknown mdc format version: {mdc_version}")
 
+    def render(self, path_to_mdc_file: str) -> bytes:
+        """
+        Convert a single composer format file to the bytes of a standalone MIDI file.
+
+        Unlike convert(), this does not touch self.midi. If the converter has a cache, the
+        result is looked up by the file contents and conversion parameters first and stored
+        after rendering.
+
+        Args:
+            path_to_mdc_file (str): The input file in MDC format.
+        Return:
+            bytes: The MIDI file data.
+        """
+        with open_mdc(path_to_mdc_file, "rb") as mdc_fd:
+            mdc_bytes = mdc_fd.read()
+        key: str = ""
+        if self.cache:
+            key = self.cache.make_key(
+                mdc_bytes, self.tempo, self.mdc_format_version, self.automation_resolution
+            )
+            midi_bytes = self.cache.get(key)
+            if midi_bytes is not None:
+                return midi_bytes
+        converter = Converter(
+            tempo=self.tempo,
+            mdc_format_version=self.mdc_format_version,
+            trusted=self.trusted,
+            automation_resolution=self.automation_resolution,
+        )
+        converter.convert_data(mdc_bytes.decode())
+        midi_bytes = converter.midi_bytes()
+        if self.cache:
+            self.cache.put(key, midi_bytes)
+        return midi_bytes
+
+    def iter_events(self, path_to_mdc_file: str) -> Iterator[Event]:
+        """
+        Parse a composer format file into a time ordered stream of events.
+
+        Beats are parsed as the stream is consumed, so the first events are available before the
+        rest of the file is processed. Track numbers are assigned the same way convert() does.
+
+        Args:
+            path_to_mdc_file (str): The input file in MDC format.
+        """
+        mdc_version, data, validate = self._read_mdc(path_to_mdc_file)
+        return self._iter_events(mdc_version, data, validate)
+
+    def iter_data_events(self, mdc_data: str) -> Iterator[Event]:
+        """
+        Same as iter_events(), but for in-memory MDC data (e.g. from Grid.to_data()).
+
+        Args:
+            mdc_data (str): MDC format data.
+        """
+        mdc_version, data, validate = self._parse_mdc(mdc_data)
+        return self._iter_events(mdc_version, data, validate)
+
+    def parse_tracks(self, path_to_mdc_file: str) -> list[ParsedTrack]:
+        """
+        Parse a composer format file into one ParsedTrack per line, without writing them.
+
+        The tracks can be transformed and placed on any MIDI track later, see add_track().
+
+        Args:
+            path_to_mdc_file (str): The input file in MDC format.
+        """
+        mdc_version, data, validate = self._read_mdc(path_to_mdc_file)
+        return self._parse_tracks(mdc_version, data, validate)
+
+    def parse_data_tracks(self, mdc_data: str) -> list[ParsedTrack]:
+        """
+        Same as parse_tracks(), but for in-memory MDC data (e.g. from Grid.to_data()).
+
+        Args:
+            mdc_data (str): MDC format data.
+        """
+        mdc_version, data, validate = self._parse_mdc(mdc_data)
+        return self._parse_tracks(mdc_version, data, validate)
+
+    def _parse_tracks(
+        self, mdc_version: int, data: list[str], validate: bool = True
+    ) -> list[ParsedTrack]:
+        if mdc_version == 1:
+            return self._parse_tracks_v1(data, validate)
+        raise MdcUnknownVersionError(f"Unknown mdc format version: {mdc_version}")
+
+    def parse_slice(
+        self,
+        path_to_mdc_file: str,
+        tracks: list[int] | None = None,
+        bars: tuple[int, int] | None = None,
+        keep_time: bool = False,
+        save_index: bool = False,
+    ) -> list[ParsedTrack]:
+        """
+        Parse only some tracks and bars of a composer format file.
+
+        The file is indexed once per process (see index.MdcIndex) and memory mapped, so only the
+        bytes of the requested bars are read and parsed. Compressed files are decompressed in
+        memory instead. Bars past the end of a track are ignored. Automation starts with the
+        values in effect at the start of the slice.
+
+        Args:
+            path_to_mdc_file (str): The input file in MDC format.
+            tracks (list[int] | None): The track line numbers, in file order. None for all.
+            bars (tuple[int, int] | None): The range of bars [start, end). None for all.
+            keep_time (bool): Keep the events at their time in the file. By default the slice
+                              starts at the start offset of its track line.
+            save_index (bool): Keep the index in a sidecar file next to the MDC file, so later
+                               slices of the file do not index it again.
+        """
+        from .index import MdcIndex
+
+        index = MdcIndex.for_file(path_to_mdc_file, save=save_index, verify=self.trusted)
+        if index.mdc_version != 1:
+            raise MdcUnknownVersionError(f"Unknown mdc format version: {index.mdc_version}")
+        validate: bool = not (self.trusted and index.verified)
+        if tracks is None:
+            tracks = list(range(len(index.tracks)))
+        parsed: list[ParsedTrack] = []
+        with mdc_buffer(path_to_mdc_file) as mdc_map:
+            automation: dict[int, Lanes] = {}
+            for line_num, (start, end) in enumerate(index.automation):
+                line = mdc_map[start:end].decode()
+                _, _, offset, patterns = self._split_line_v1(line_num, line)
+                self._add_automation_v1(automation, line_num, line, offset, patterns)
+            for track_num in tracks:
+                line = index.tracks[track_num]
+                start_bar, end_bar = bars if bars is not None else (0, line.bars)
+                start_bar = min(max(start_bar, 0), line.bars)
+                end_bar = min(max(end_bar, start_bar), line.bars)
+                mdata = mdc_map[
+                    line.bar_offsets[start_bar]:line.bar_offsets[end_bar]
+                ].decode()
+                patterns = mdata.strip().replace("; ", ";").split(";")
+                shift = 0.0 if keep_time else -start_bar * line.bar_length
+                offset = line.offset + start_bar * line.bar_length + shift
+                beats = len([pattern for pattern in patterns if pattern.strip()])
+                channel = 9 if line.track_type == "drum" else 0
+                parsed.append(
+                    ParsedTrack.from_events(
+                        itertools.chain(
+                            self._iter_patterns_v1(
+                                patterns, line.granularity, line.track_type, offset,
+                                len(parsed), validate,
+                            ),
+                            lane_events(
+                                automation.get(track_num, {}),
+                                len(parsed),
+                                channel,
+                                self.automation_resolution,
+                                start=line.offset + start_bar * line.bar_length,
+                                # Like convert(), keep the points past the last bar
+                                end=line.offset + end_bar * line.bar_length
+                                if end_bar < line.bars else None,
+                                shift=shift,
+                            ),
+                        ),
+                        channel=channel,
+                        length=offset + beats * NOTE_TIME_MAP[line.granularity],
+                    )
+                )
+        return parsed
+
+    def convert_slice(
+        self,
+        path_to_mdc_file: str,
+        tracks: list[int] | None = None,
+        bars: tuple[int, int] | None = None,
+        keep_time: bool = False,
+        save_index: bool = False,
+    ):
+        """Convert only some tracks and bars of a composer format file, see parse_slice()"""
+        for track in self.parse_slice(path_to_mdc_file, tracks, bars, keep_time, save_index):
+            self.add_track(track)
+
+    def add_track(self, track: ParsedTrack):
+        """Write a parsed track to the next MIDI track of self.midi"""
+        for event in track.events(self.track):
+            self.add_event(event)
+        self._max_time_offset = max(self._max_time_offset, track.length)
+        self.track += 1
+
+    def _iter_events(
+        self, mdc_version: int, data: list[str], validate: bool = True
+    ) -> Iterator[Event]:
+        if mdc_version == 1:
+            return self._iter_events_v1(data, validate)
+        raise MdcUnknownVersionError(f"Unknown mdc format version: {mdc_version}")
+
+    def midi_bytes(self) -> bytes:
+        """Return all tracks stored in self.midi as MIDI file data"""
+        output = io.BytesIO()
+        self.midi.writeFile(output)
+        return output.getvalue()
+
     def save(self, path: str):
         """
         Write all tracks stored in self.midi to a MIDI file.
@@ -276,3 +765,36 @@ class Converter:
         """
         with open(path, "wb") as output_file:
             self.midi.writeFile(output_file)
+
+    def save_segmented(
+        self,
+        path_to_mdc_file: str,
+        path: str,
+        window: float = 64.0,
+        spill_dir: str | None = None,
+    ):
+        """
+        Convert a composer format file straight to a MIDI file with bounded memory.
+
+        Unlike convert() and save(), the events are not collected in self.midi. They are
+        streamed in windows of `window` beats through a SegmentedWriter, which spills the
+        encoded tracks to temporary files. Useful for very long songs. The output is the same as
+        convert() followed by save() on a new Converter.
+
+        Args:
+            path_to_mdc_file (str): The input file in MDC format.
+            path (str): The output file to write the MIDI data to.
+            window (float): The window size in beats.
+            spill_dir (str | None): The directory of the spill files. None for the default
+                                    temporary directory.
+        """
+        from .segmented import SegmentedWriter
+
+        writer = SegmentedWriter(window=window, spill_dir=spill_dir)
+        try:
+            writer.add_tempo(0, self.tempo)
+            writer.add_events(self.iter_events(path_to_mdc_file))
+            with open(path, "wb") as output_file:
+                writer.write(output_file)
+        finally:
+            writer.close()
@@ -0,0 +1,218 @@
+"""
+Velocity dynamics: fades, crescendos, accent maps and auto-dynamics.
+
+Each function maps a column of event times (in beats) to a column of gains in one pass, so a fade
+over a whole track is a single batched operation. The gains are applied to note velocities with
+apply_gains(), see ParsedTrack.fade() and Grid.fade() for the track level API. Notes at a gain
+of 0 or less are silent and dropped by those, since a velocity 0 note on is a note off.
+
+With NumPy installed (pip install 'mdcmp[numpy]'), apply_gains() and the linear envelope of
+envelope_gains() are vectorized. The exponential and logarithmic curves still call math.exp() per
+value, so the gains are the same with or without NumPy. Without NumPy, both loop over the events.
+
+Example, fade a 500 bar track out over its last 16 bars:
+    track = track.fade(start=track.length - 64, end=track.length, start_gain=1.0, end_gain=0.0)
+"""
+import math
+from array import array
+from typing import Any, Callable, Iterable
+
+LINEAR = "linear"
+EXPONENTIAL = "exponential"
+LOGARITHMIC = "logarithmic"
+# Steepness of the exponential and logarithmic curves
+CURVE_STEEPNESS = 3.0
+_EXP_SCALE = math.exp(CURVE_STEEPNESS) - 1
+
+
+def _linear(x: float) -> float:
+    return x
+
+
+def _exponential(x: float) -> float:
+    # Slow start, fast end. Sounds even for fade ins.
+    return (math.exp(CURVE_STEEPNESS * x) - 1) / _EXP_SCALE
+
+
+def _logarithmic(x: float) -> float:
+    # Fast start, slow end. Sounds even for fade outs.
+    return 1 - _exponential(1 - x)
+
+
+# Curve name -> function mapping 0..1 progress to 0..1 amount
+CURVES: dict[str, Callable[[float], float]] = {
+    LINEAR: _linear,
+    EXPONENTIAL: _exponential,
+    LOGARITHMIC: _logarithmic,
+}
+
+
+def _exponential_column(numpy, x: Any) -> Any:
+    # Not vectorized: math.exp() per value, numpy.exp() can differ in the last bit
+    exp = numpy.fromiter(map(math.exp, (CURVE_STEEPNESS * x).tolist()), numpy.float64, len(x))
+    return (exp - 1) / _EXP_SCALE
+
+
+def _logarithmic_column(numpy, x: Any) -> Any:
+    return 1 - _exponential_column(numpy, 1 - x)
+
+
+# The CURVES for NumPy arrays, see envelope_gains(). Curves that are not in here are looped.
+_NUMPY_CURVES: dict[str, Callable[[Any, Any], Any]] = {
+    LINEAR: lambda numpy, x: x,
+    EXPONENTIAL: _exponential_column,
+    LOGARITHMIC: _logarithmic_column,
+}
+# Metric weight of the positions of a 4/4 bar on a sixteenth grid, strongest on the downbeat
+METRIC_WEIGHTS: tuple[float, ...] = (
+    1.0,
+    0.4,
+    0.6,
+    0.4,
+    0.8,
+    0.4,
+    0.6,
+    0.4,
+    0.9,
+    0.4,
+    0.6,
+    0.4,
+    0.8,
+    0.4,
+    0.6,
+    0.4,
+)
+
+
+def _numpy():
+    """NumPy, or None to use the loops"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _column(numpy, values: Iterable[Any], dtype: Any) -> Any:
+    """A NumPy array of values, without copying lists and arrays twice"""
+    if not isinstance(values, (list, tuple, array)):
+        values = list(values)
+    return numpy.asarray(values, dtype=dtype)
+
+
+def envelope_gains(
+    times: Iterable[float],
+    start: float,
+    end: float,
+    start_gain: float = 0.0,
+    end_gain: float = 1.0,
+    curve: str = LINEAR,
+) -> array:
+    """
+    Gains of a fade or crescendo from start_gain at start to end_gain at end.
+
+    Times before start keep start_gain and times after end keep end_gain.
+
+    Args:
+        times (Iterable[float]): Event times in beats.
+        start (float): The start of the fade in beats.
+        end (float): The end of the fade in beats.
+        start_gain (float): The gain at start.
+        end_gain (float): The gain at end.
+        curve (str): A key of CURVES.
+    """
+    if curve not in CURVES:
+        raise KeyError(f"Unknown curve: {curve}")
+    if end < start:
+        raise ValueError("end must be >= start")
+    shape = CURVES[curve]
+    span: float = end - start
+    delta: float = end_gain - start_gain
+    numpy = _numpy()
+    if numpy is not None and curve in _NUMPY_CURVES:
+        column = _column(numpy, times, numpy.float64)
+        inside = (column > start) & (column < end)
+        # The same operations as the loop, on the times inside the fade only
+        shaped = _NUMPY_CURVES[curve](numpy, (column[inside] - start) / span)
+        result = numpy.where(column <= start, start_gain if span else end_gain, end_gain)
+        result[inside] = start_gain + delta * shaped
+        return array("d", result.astype(numpy.float64).tobytes())
+    gains = array("d")
+    for time in times:
+        if time <= start:
+            gains.append(start_gain if span else end_gain)
+        elif time >= end:
+            gains.append(end_gain)
+        else:
+            gains.append(start_gain + delta * shape((time - start) / span))
+    return gains
+
+
+def accent_gains(times: Iterable[float], accents: list[float], step: float) -> array:
+    """
+    Gains of a repeating accent map.
+
+    Args:
+        times (Iterable[float]): Event times in beats.
+        accents (list[float]): The gain of each grid position, repeated for the whole track.
+                               Example for accented quarter notes on an eighth grid: [1.0, 0.7]
+        step (float): The length of one accent position in beats (e.g. 0.5 for eighths).
+    """
+    if not accents:
+        raise ValueError("accents must not be empty")
+    if step <= 0:
+        raise ValueError("step must be > 0")
+    count: int = len(accents)
+    # Notes humanized slightly early still belong to their grid position
+    tolerance: float = step / 4
+    return array("d", [accents[int((time + tolerance) // step) % count] for time in times])
+
+
+def auto_dynamics_gains(times: Iterable[float], amount: float, phrase: float = 16.0) -> array:
+    """
+    Gains of automatic dynamics: metric accents within each bar plus a swell over each phrase.
+
+    Args:
+        times (Iterable[float]): Event times in beats.
+        amount (float): 0 (no change) to 10 (strong dynamics).
+        phrase (float): The length of a phrase in beats (default 4 bars).
+    """
+    if amount < 0 or amount > 10:
+        raise ValueError("amount must be between 0 and 10")
+    if phrase <= 0:
+        raise ValueError("phrase must be > 0")
+    depth: float = amount / 10 * 0.5
+    count: int = len(METRIC_WEIGHTS)
+    gains = array("d")
+    for time in times:
+        weight = METRIC_WEIGHTS[int((time + 0.0625) // 0.25) % count]
+        swell = math.sin(math.pi * ((time % phrase) / phrase))
+        gains.append((1 - depth * (1 - weight)) * (1 - depth / 2 * (1 - swell)))
+    return gains
+
+
+def apply_gains(velocities: Iterable[int], gains: Iterable[float]) -> array:
+    """
+    Multiply velocities by gains, rounded and clamped to 1-127.
+
+    A velocity of 0 stays 0, and so does every velocity at a gain <= 0: those notes are silent
+    and have to be dropped by the caller (see ParsedTrack.apply_gains() and Grid.fade()).
+    """
+    numpy = _numpy()
+    if numpy is not None:
+        velocity_column = _column(numpy, velocities, numpy.int64)
+        gain_column = _column(numpy, gains, numpy.float64)
+        # Like zip(), stop at the shorter column
+        length = min(len(velocity_column), len(gain_column))
+        velocity_column, gain_column = velocity_column[:length], gain_column[:length]
+        # numpy.rint() rounds halves to even, like round()
+        scaled = numpy.clip(numpy.rint(velocity_column * gain_column), 1, 127)
+        result = numpy.where((velocity_column != 0) & (gain_column > 0), scaled, 0)
+        return array("i", result.astype(numpy.intc).tobytes())
+    return array(
+        "i",
+        [
+            min(max(round(velocity * gain), 1), 127) if velocity and gain > 0 else 0
+            for velocity, gain in zip(velocities, gains)
+        ],
+    )
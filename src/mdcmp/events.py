@@ -0,0 +1,59 @@
+"""
+Intermediate MIDI events produced from MDC data.
+
+Converter parses each MDC track line into a stream of Event items. The same stream can be written
+to a MIDIFile or fed to a real-time sink (see: player.py).
+"""
+import heapq
+from typing import Iterable, Iterator, NamedTuple
+
+# Event kinds
+NOTE = "note"
+CONTROL = "control"
+PITCHWHEEL = "pitchwheel"
+
+
+class Event(NamedTuple):
+    """
+    A single MIDI event.
+
+    time and duration are in beats (quarter notes). For NOTE events data1 is the pitch and data2 is
+    the velocity. For CONTROL events data1 is the controller number and data2 is the value. For
+    PITCHWHEEL events data2 is the pitch wheel value.
+    """
+
+    time: float
+    track: int
+    channel: int
+    kind: str
+    data1: int
+    data2: int
+    duration: float = 0.0
+
+
+def order_track_events(events: Iterable[Event], max_lookahead: float) -> Iterator[Event]:
+    """
+    Yield the events of one track in time order.
+
+    Events of a track line arrive in beat order, but note paddings can push a note up to
+    max_lookahead beats past its beat. Events are held back in a small heap until no later beat
+    can produce an earlier event.
+
+    Args:
+        events (Iterable[Event]): Events of one track in beat order.
+        max_lookahead (float): The largest padding an event can have past its beat.
+    """
+    pending: list[tuple[float, int, Event]] = []
+    for seq, event in enumerate(events):
+        heapq.heappush(pending, (event.time, seq, event))
+        # An event at `time` belongs to a beat >= time - max_lookahead
+        horizon = event.time - max_lookahead
+        while pending and pending[0][0] < horizon:
+            yield heapq.heappop(pending)[2]
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def merge_tracks(tracks: Iterable[Iterable[Event]]) -> Iterator[Event]:
+    """Merge time ordered track streams into one time ordered stream"""
+    return heapq.merge(*tracks, key=lambda event: (event.time, event.track))
@@ -36,3 +36,7 @@ class MdcInvalidGranularityError(Exception):
 
 class PitchNotFoundError(Exception):
     """Unknown pitch"""
+
+
+class MdcAutomationError(Exception):
+    """Invalid automation line data"""
@@ -0,0 +1,158 @@
+"""
+Rhythm fingerprints of drum tracks.
+
+A fingerprint packs the onsets of a drum track into the bits of one integer: one lane of
+FINGERPRINT_STEPS bits per drum name of drummap.DRUMS, with a bit set where the drum is hit. All
+tracks are quantized to sixteenth notes over the first FINGERPRINT_BARS bars, so loops of any
+granularity and length compare bit for bit. Shorter loops are repeated to fill the window. The
+distance between two rhythms is the number of differing bits (Hamming distance, a popcount of
+the XOR), see BankIndex.nearest().
+"""
+import heapq
+
+from .constants import NOTE_TIME_MAP
+from .drummap import DRUMS
+from .events import NOTE
+from .index import BEATS_PER_MEASURE
+from .tracks import KIND_CODES, ParsedTrack
+
+# The fingerprint window in bars and its resolution
+FINGERPRINT_BARS = 2
+FINGERPRINT_STEP: float = NOTE_TIME_MAP["s"]
+FINGERPRINT_STEPS = int(FINGERPRINT_BARS * BEATS_PER_MEASURE / FINGERPRINT_STEP)
+# Drum pitch -> lane number
+DRUM_LANES: dict[int, int] = {pitch: lane for lane, pitch in enumerate(sorted(DRUMS))}
+
+
+def track_fingerprint(track: ParsedTrack) -> int:
+    """The fingerprint of a drum track. Notes without a drum name are ignored."""
+    note_code: int = KIND_CODES[NOTE]
+    # The loop length in steps, the pattern repeats after it
+    period: int = round(track.length / FINGERPRINT_STEP) or FINGERPRINT_STEPS
+    fingerprint: int = 0
+    for time, kind, pitch, velocity in zip(track.times, track.kinds, track.data1, track.data2):
+        lane = DRUM_LANES.get(pitch)
+        if kind != note_code or not velocity or lane is None:
+            continue
+        step = round(time / FINGERPRINT_STEP)
+        if step >= FINGERPRINT_STEPS:
+            continue
+        base = lane * FINGERPRINT_STEPS
+        while step < FINGERPRINT_STEPS:
+            fingerprint |= 1 << (base + step)
+            step += period
+    return fingerprint
+
+
+def fingerprint_tracks(tracks: list[ParsedTrack]) -> list[tuple[int, int]]:
+    """The (track number, fingerprint) of each drum track of a bank entry"""
+    return [(number, track_fingerprint(track)) for number, track in enumerate(tracks)
+            if track.is_drum]
+
+
+def distance(first: int, second: int) -> int:
+    """The number of onsets that differ between two fingerprints"""
+    return (first ^ second).bit_count()
+
+
+def _numpy():
+    """NumPy with a vectorized popcount (NumPy >= 2.0), or None to use plain Python ints"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy if hasattr(numpy, "bitwise_count") else None
+
+
+class FingerprintTable:
+    def __init__(self, fingerprints: list[int], refs: list[tuple[str, int]]):
+        """
+        A searchable set of fingerprints.
+
+        With NumPy installed (pip install 'mdcmp[numpy]') the fingerprints are packed into a
+        matrix of 64 bit words and compared with a vectorized XOR and popcount. Otherwise each
+        fingerprint is compared as a Python int. The results are the same.
+
+        Args:
+            fingerprints (list[int]): See track_fingerprint().
+            refs (list[tuple[str, int]]): The (bank key, track number) of each fingerprint.
+        """
+        self.fingerprints: list[int] = fingerprints
+        self.refs: list[tuple[str, int]] = refs
+        self._positions: dict[str, list[int]] = {}
+        for position, (key, _) in enumerate(refs):
+            self._positions.setdefault(key, []).append(position)
+        self._words: int = -(-len(DRUM_LANES) * FINGERPRINT_STEPS // 64)
+        self._numpy = _numpy()
+        self._matrix = None
+        if self._numpy is not None and fingerprints:
+            self._matrix = self._numpy.frombuffer(
+                b"".join(self._pack(fingerprint) for fingerprint in fingerprints), dtype="<u8"
+            ).reshape(len(fingerprints), self._words)
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def _pack(self, fingerprint: int) -> bytes:
+        return fingerprint.to_bytes(self._words * 8, "little")
+
+    def distances(self, fingerprint: int) -> list[int]:
+        """The distance of fingerprint to every fingerprint of the table"""
+        if self._matrix is not None:
+            numpy = self._numpy
+            query = numpy.frombuffer(self._pack(fingerprint), dtype="<u8")
+            return numpy.bitwise_count(self._matrix ^ query).sum(axis=1).tolist()
+        return [(fingerprint ^ value).bit_count() for value in self.fingerprints]
+
+    def nearest(
+        self,
+        fingerprint: int,
+        count: int = 10,
+        max_distance: int | None = None,
+        exclude: str | None = None,
+    ) -> list[tuple[int, str, int]]:
+        """
+        The closest fingerprints, closest first. Ties are in table order.
+
+        Args:
+            fingerprint (int): See track_fingerprint().
+            count (int): The number of results.
+            max_distance (int | None): Leave out fingerprints with more differing onsets.
+            exclude (str | None): Leave out the fingerprints of this bank key.
+        Return:
+            list[tuple[int, str, int]]: (distance, key, track number) of each result.
+        """
+        if count <= 0 or not self.fingerprints:
+            return []
+        excluded = set(self._positions.get(exclude, ())) if exclude is not None else set()
+        if self._matrix is not None:
+            return self._nearest_matrix(fingerprint, count, max_distance, excluded)
+        distances = self.distances(fingerprint)
+        # The count-th smallest distance bounds the results, then only those are sorted
+        threshold = max(heapq.nsmallest(count + len(excluded), distances))
+        if max_distance is not None:
+            threshold = min(threshold, max_distance)
+        candidates = [
+            i for i, value in enumerate(distances) if value <= threshold and i not in excluded
+        ]
+        candidates.sort(key=distances.__getitem__)
+        return [(distances[i], *self.refs[i]) for i in candidates[:count]]
+
+    def _nearest_matrix(
+        self, fingerprint: int, count: int, max_distance: int | None, excluded: set[int]
+    ) -> list[tuple[int, str, int]]:
+        """nearest() with the selection done in NumPy as well"""
+        numpy = self._numpy
+        query = numpy.frombuffer(self._pack(fingerprint), dtype="<u8")
+        distances = numpy.bitwise_count(self._matrix ^ query).sum(axis=1, dtype=numpy.int64)
+        # Excluded rows get a distance no fingerprint can have
+        limit = self._words * 64 + 1
+        if excluded:
+            distances[list(excluded)] = limit
+        if max_distance is not None:
+            distances[distances > max_distance] = limit
+        count = min(count, len(distances))
+        threshold = min(numpy.partition(distances, count - 1)[count - 1], limit - 1)
+        candidates = numpy.flatnonzero(distances <= threshold)
+        candidates = candidates[numpy.argsort(distances[candidates], kind="stable")][:count]
+        return [(int(distances[i]), *self.refs[i]) for i in candidates]
@@ -0,0 +1,225 @@
+"""
+Generate songs from chord progression files.
+
+Progression files are compiled once into a ProgressionBank, then each song is built from a
+template in a random key and rendered to MIDI. Templates only use the integer voicings of the
+bank, so no chord names are parsed per song. Songs are spread over a process pool. Every song
+has its own seed (seed + song index), so any song of a corpus can be reproduced on its own,
+regardless of the number of workers.
+
+Example:
+    result = generate("data/progressions", "out/", count=1000, seed=42, workers=8)
+    print(result.songs_per_second)
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from .constants import ALL
+from .converter import Converter
+from .grid import Grid, Granularity, IsChord
+from .progressions import ProgressionBank
+
+
+def template_basic(bank: ProgressionBank, index: int, transpose: int, repeats: int) -> Grid:
+    """Drums, chords, a bass line and occasional chord spreads. One bar per chord."""
+    grid = Grid(granularity=Granularity.EIGHTH)
+    bars = list(range(bank.length(index)))
+    grid.add(
+        bars=bars, tracks=[0], beats=[ALL], value=random.choice(["hat1", "hat2"]),
+        duration=1, velocity=random.randint(30, 50),
+    )
+    grid.add(
+        bars=bars, tracks=[0], beats=random.choice([[0, 5], [0, 3, 5], [0, 4]]),
+        value="kick1", duration=2,
+    )
+    grid.add(
+        bars=bars, tracks=[0], beats=random.choice([[2, 6], [4], [2, 6, 7]]),
+        value=random.choice(["snare1", "snare2", "handclap"]), duration=2,
+    )
+    bass_beats = random.choice([[0], [0, 3], [0, 2, 4], [0, 4, 6]])
+    chords = bank.voicings(index, transpose, octave=3)
+    bass = bank.voicings(index, transpose, octave=2)
+    spreads = bank.voicings(index, transpose, octave=5)
+    for bar in bars:
+        velocity = random.randint(40, 60)
+        for pitch in chords[bar]:
+            grid.add(
+                bars=[bar], tracks=[1], beats=[0, 4], value=pitch, is_chord=IsChord.YES,
+                duration=4, velocity=velocity, volume=50, pan=-15,
+            )
+        grid.add(
+            bars=[bar], tracks=[2], beats=bass_beats, value=bass[bar][0], is_chord=IsChord.NO,
+            duration=1, velocity=random.randint(35, 50), pan=15,
+        )
+        if random.random() < 0.5:
+            # Spread the chord notes over consecutive beats, within the bar
+            notes = list(spreads[bar])
+            random.shuffle(notes)
+            beat_offset = random.choice([0, 2, 4])
+            for beat, pitch in enumerate(notes[:grid.number_of_beats - beat_offset]):
+                grid.add(
+                    bars=[bar], tracks=[3], beats=[beat + beat_offset], value=pitch,
+                    pan=-20, volume=70,
+                )
+    if repeats > 1:
+        grid.copy_to_end(bars=bars, tracks=[0, 1, 2, 3], count=repeats - 1, strict=False)
+    return grid
+
+
+def template_chords(bank: ProgressionBank, index: int, transpose: int, repeats: int) -> Grid:
+    """Chords only, one bar per chord"""
+    grid = Grid(granularity=Granularity.QUARTER)
+    bars = list(range(bank.length(index)))
+    for bar, chord in enumerate(bank.voicings(index, transpose, octave=3)):
+        velocity = random.randint(40, 60)
+        for pitch in chord:
+            grid.add(
+                bars=[bar], tracks=[0], beats=[0], value=pitch, is_chord=IsChord.YES,
+                duration=4, velocity=velocity,
+            )
+    if repeats > 1:
+        grid.copy_to_end(bars=bars, tracks=[0], count=repeats - 1, strict=False)
+    return grid
+
+
+# Name -> function(bank, progression index, transpose, repeats) -> Grid
+TEMPLATES: dict[str, Callable[[ProgressionBank, int, int, int], Grid]] = {
+    "basic": template_basic,
+    "chords": template_chords,
+}
+
+
+class GenerateResult:
+    def __init__(self, paths: list[str], seconds: float):
+        self.paths: list[str] = paths
+        self.count: int = len(paths)
+        self.seconds: float = seconds
+
+    @property
+    def songs_per_second(self) -> float:
+        return self.count / self.seconds if self.seconds else 0.0
+
+
+# Set once per worker process by _init_worker()
+_worker_bank: ProgressionBank = ProgressionBank()
+
+
+def _init_worker(bank: ProgressionBank):
+    global _worker_bank
+    _worker_bank = bank
+
+
+def render_song(
+    bank: ProgressionBank,
+    seed: int,
+    template: str = "basic",
+    style: str | None = None,
+    tempo: int | None = None,
+    repeats: int = 4,
+) -> tuple[str, bytes]:
+    """
+    Build and render one song. The same arguments always produce the same song.
+
+    Args:
+        bank (ProgressionBank): The compiled progressions.
+        seed (int): The random seed of this song.
+        template (str): A key of TEMPLATES.
+        style (str | None): The progression style to pick from. None picks a random style.
+        tempo (int | None): The tempo in BPM. None picks a random tempo from 70 to 130.
+        repeats (int): How many times the progression is played.
+    Return:
+        tuple[str, bytes]: The MDC data and the MIDI file data.
+    """
+    # The templates and the jitter of to_data() draw from the global random state, which is
+    # restored afterwards so the caller's random state is left alone
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        if style is None:
+            style = random.choice(sorted(bank.by_style.keys()))
+        if style not in bank.by_style:
+            raise KeyError(f"Unknown progression style: {style}")
+        index = random.choice(bank.by_style[style])
+        transpose = random.randint(0, 11)
+        if tempo is None:
+            tempo = random.randint(70, 130)
+        grid = TEMPLATES[template](bank, index, transpose, repeats)
+        mdc_data = grid.to_data(velocity_jitter=5, humanize_jitter=True)
+    finally:
+        random.setstate(state)
+    converter = Converter(tempo=tempo, trusted=True)
+    converter.convert_data(mdc_data)
+    return mdc_data, converter.midi_bytes()
+
+
+def _render_job(job: tuple[int, int, str, str, str | None, int | None, int, bool]) -> str:
+    index, seed, out_dir, template, style, tempo, repeats, save_mdc = job
+    mdc_data, midi_bytes = render_song(
+        _worker_bank, seed, template=template, style=style, tempo=tempo, repeats=repeats
+    )
+    path = os.path.join(out_dir, f"song-{index:06d}-{seed}")
+    if save_mdc:
+        with open(f"{path}.mdc", "w") as mdc_fd:
+            mdc_fd.write(mdc_data)
+    with open(f"{path}.midi", "wb") as midi_fd:
+        midi_fd.write(midi_bytes)
+    return f"{path}.midi"
+
+
+def generate(
+    progressions_dir: str,
+    out_dir: str,
+    count: int,
+    seed: int = 0,
+    template: str = "basic",
+    style: str | None = None,
+    tempo: int | None = None,
+    repeats: int = 4,
+    workers: int | None = None,
+    save_mdc: bool = False,
+) -> GenerateResult:
+    """
+    Generate count songs into out_dir, in parallel.
+
+    Song N uses the seed `seed + N` and is written to out_dir/song-<N>-<seed>.midi.
+
+    Args:
+        progressions_dir (str): The directory of progression files.
+        out_dir (str): The output directory. Created if missing.
+        count (int): The number of songs.
+        seed (int): The base seed.
+        template (str): A key of TEMPLATES.
+        style (str | None): The progression style. None picks one per song.
+        tempo (int | None): The tempo in BPM. None picks one per song.
+        repeats (int): How many times the progression is played.
+        workers (int | None): The number of processes. None uses all cores, 1 runs in-process.
+        save_mdc (bool): Also write the MDC data of each song.
+    """
+    if template not in TEMPLATES:
+        raise KeyError(f"Unknown template: {template}")
+    bank = ProgressionBank.load(progressions_dir)
+    if not len(bank):
+        raise ValueError(f"No progressions found in: {progressions_dir}")
+    if style is not None and style not in bank.by_style:
+        raise KeyError(f"Unknown progression style: {style}")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    jobs = [
+        (index, seed + index, out_dir, template, style, tempo, repeats, save_mdc)
+        for index in range(count)
+    ]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(bank)
+        paths = list(map(_render_job, jobs))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(bank,)
+        ) as pool:
+            chunksize = max(1, count // (workers * 4))
+            paths = list(pool.map(_render_job, jobs, chunksize=chunksize))
+    return GenerateResult(paths, time.perf_counter() - start)
@@ -5,20 +5,42 @@ produce an mdc data file for processing.
 See: docs/GRID.md for notes on how this works.
 """
 from enum import Enum
-from typing import Any
+from typing import Any, Callable, Iterable
+import bisect
+import os
 import random
-from mingus.core import chords
+from array import array
+from .arpeggio import RANDOM, UP, ArpTemplate, compile_template, stack_tones
+from .automation import AutomationPoint, AUTOMATION_RANGES, STEP, LINEAR as RAMP, format_lane
 from .drummap import DRUMS_R
-from .constants import DURATION_GRANULARITY_MAP, NOTE_TYPE_GRID_QUANTIZE_MAP, ALL, FORMAT_VERSION
+from .dynamics import LINEAR, accent_gains, apply_gains, auto_dynamics_gains, envelope_gains
+from .plan import ADD, AUTOMATE, COPY, TRANSFORM, PlanOp, optimize
+from .shorthand import chord_notes as shorthand_chord_notes
+from .constants import (
+    DURATION_GRANULARITY_MAP,
+    NOTE_TIME_MAP,
+    NOTE_TYPE_GRID_QUANTIZE_MAP,
+    AUTOMATION_TRACK_TYPE,
+    ALL,
+    FORMAT_VERSION,
+    MDC_PROVENANCE_GRID,
+)
 from .util import (
     chord_to_midi,
     sustain_toggle,
     event_translate,
     pan_to_midi,
     pitchwheel_to_midi,
+    mdc_checksum,
+    open_mdc,
+    MDC_CODECS,
 )
 
 
+# The note offsets humanize_jitter picks from, see to_data()
+HUMANIZE_OFFSETS = ["n", "n", "n", "n", "n", "H", "H", "H", "S"]
+
+
 class IsChord(Enum):
     NO = 0
     YES = 1
@@ -49,6 +71,10 @@ class GranularityIndexGridError(Exception):
     """The specified beat was greater than the granularity of the grid."""
 
 
+class SnapshotGridError(Exception):
+    """Invalid or unsupported grid snapshot."""
+
+
 def _compress_mdc_part(items: list, entire_track_event: bool = False) -> str:
     tmp = list(map(str, items))
     if len(set(tmp)) < 2:
@@ -61,18 +87,69 @@ def _compress_mdc_part(items: list, entire_track_event: bool = False) -> str:
 
 class Grid:
     def __init__(
-        self, granularity: Granularity = Granularity.EIGHTH, beats_per_measure: int = 4
+        self,
+        granularity: Granularity = Granularity.EIGHTH,
+        beats_per_measure: int = 4,
+        lazy: bool = False,
     ):
+        """
+        Args:
+            granularity (Granularity): The beat size of the grid.
+            beats_per_measure (int): Only 4/4 time is supported.
+            lazy (bool): Record add(), transform(), copy_to_end() and automate() calls and apply
+                         them only when the grid is needed, see plan.py and materialize().
+                         Errors of recorded calls are raised when the plan is applied.
+        """
         self.granularity: str = granularity.value
         self.number_of_beats: int = int(
             NOTE_TYPE_GRID_QUANTIZE_MAP[self.granularity] * beats_per_measure
         )
         self.grid: dict[int, dict[int, list[list[dict[str, Any]]]]] = {}
+        # track -> controller -> points, timed in grid beats (bar * number_of_beats + beat)
+        self.automation: dict[int, dict[str, list[AutomationPoint]]] = {}
+        self.lazy: bool = lazy
+        # The recorded operations of a lazy grid, not applied yet
+        self.plan: list[PlanOp] = []
         if beats_per_measure != 4:
             raise ValueError(
                 "Not implemented. This program currently only support 4/4 time."
             )
 
+    def _record(self, name: str, args: dict[str, Any]) -> bool:
+        """
+        Record a call in the plan of a lazy grid. Returns False if the call should run now.
+
+        List arguments are copied, callers may reuse them.
+        """
+        if not self.lazy:
+            return False
+        self.plan.append(
+            PlanOp(
+                name,
+                {k: list(v) if isinstance(v, list) else v for k, v in args.items() if k != "self"},
+            )
+        )
+        return True
+
+    def materialize(self):
+        """Optimize and apply the recorded plan of a lazy grid, see plan.optimize()"""
+        if not self.plan:
+            return
+        plan = optimize(self.plan, check=self._check_op)
+        self.plan = []
+        self.lazy = False
+        try:
+            for op in plan:
+                getattr(self, op.name)(**op.args)
+        finally:
+            self.lazy = True
+
+    def _check_op(self, op: PlanOp):
+        """Raise the argument errors of a recorded automate() call that the optimizer drops"""
+        args = dict(op.args)
+        del args["tracks"]
+        self._automation_point(**args)
+
     def copy_to_end(
         self,
         bars: list[int] | None = None,
@@ -83,6 +160,8 @@ class Grid:
         """
         Copy bars and append to the end, in order, count times, for the tracks specified.
         """
+        if self._record(COPY, locals()):
+            return
         if not bars or not tracks:
             raise RequiredArgsGridError(
                 "Both bars and tracks parameters must be specified."
@@ -105,26 +184,108 @@ class Grid:
                             "You can specify strict=False to skip these errors, but alignment "
                             "may get off in some cases."
                         ))
+                    self._copy_automation(bar, next_bar_index, track)
+                    if not any(track_tmp):
+                        continue
+                    # Clone the items straight into the new bar, same as add() would create them
+                    new_bar = self.grid.setdefault(next_bar_index, {})
+                    if track not in new_bar:
+                        new_bar[track] = [[] for _ in range(self.number_of_beats)]
                     for beat, data in enumerate(track_tmp):
-                        for d in data:
-                            self.add(
-                                bars=[next_bar_index],
-                                tracks=[track],
-                                beats=[beat],
-                                value=d["value"],
-                                duration=d["duration"],
-                                expression=d["expression"],
-                                is_chord=d["is_chord"],
-                                modwheel=d["modwheel"],
-                                octave=d["octave"],
-                                pan=d["pan"],
-                                pitchwheel=d["pitchwheel"],
-                                sustain=d["sustain"],
-                                velocity=d["velocity"],
-                                volume=d["volume"],
-                            )
+                        new_bar[track][beat].extend(dict(d) for d in data)
                 next_bar_index += 1
 
+    def _copy_automation(self, bar: int, new_bar: int, track: int):
+        """Copy the automation points of a bar to new_bar"""
+        start = bar * self.number_of_beats
+        shift = (new_bar - bar) * self.number_of_beats
+        for controller, points in list(self.automation.get(track, {}).items()):
+            for point in [i for i in points if start <= i.time < start + self.number_of_beats]:
+                self._set_point(track, controller, point._replace(time=point.time + shift))
+
+    def _set_point(self, track: int, controller: str, point: AutomationPoint):
+        """Insert a point in time order, replacing a point at the same time"""
+        points = self.automation.setdefault(track, {}).setdefault(controller, [])
+        times = [i.time for i in points]
+        index = bisect.bisect_left(times, point.time)
+        if index < len(points) and points[index].time == point.time:
+            points[index] = point
+        else:
+            points.insert(index, point)
+
+    def automate(
+        self,
+        tracks: list[int],
+        controller: str,
+        bar: int,
+        beat: int,
+        value: int | bool,
+        ramp: bool = False,
+    ):
+        """
+        Set a track automation point. Automation applies to the entire track, independent of
+        the notes, and only produces MIDI events when the value changes.
+
+        Args:
+            tracks (list[int]): ...
+            controller (str): volume, pitchwheel, modwheel, expression, sustain or pan.
+            bar (int): ...
+            beat (int): ...
+            value (int | bool): Same units as add(): pan and pitchwheel are -64 to 64, sustain is
+                                a bool, others are 0 to 127.
+            ramp (bool): Ramp linearly from the previous point to this one, instead of a step.
+        """
+        if self._record(AUTOMATE, locals()):
+            return
+        point = self._automation_point(controller, bar, beat, value, ramp)
+        for track in tracks:
+            self._set_point(track, controller, point)
+
+    def _automation_point(
+        self, controller: str, bar: int, beat: int, value: int | bool, ramp: bool
+    ) -> AutomationPoint:
+        """Validate the arguments of automate() and convert them to a point"""
+        if controller not in AUTOMATION_RANGES:
+            raise ValueError(f"Unknown automation controller: {controller}")
+        if beat < 0 or beat >= self.number_of_beats:
+            raise GranularityIndexGridError(
+                f"Position is greater than the grids granularity size: {beat}"
+            )
+        if controller == "sustain":
+            if ramp:
+                raise ValueError("sustain is a toggle and can not be ramped")
+            midi_value = int(sustain_toggle(bool(value)))
+        elif controller == "pan":
+            midi_value = pan_to_midi(int(value))
+        elif controller == "pitchwheel":
+            midi_value = pitchwheel_to_midi(int(value))
+        else:
+            midi_value = int(value)
+            if midi_value < 0 or midi_value > 127:
+                raise ValueError(f"{controller} value must be between 0 and 127: {midi_value}")
+        return AutomationPoint(
+            float(bar * self.number_of_beats + beat), midi_value, RAMP if ramp else STEP
+        )
+
+    def ramp(
+        self,
+        tracks: list[int],
+        controller: str,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        start_value: int,
+        end_value: int,
+    ):
+        """
+        Ramp a track automation from (bar, beat) start to (bar, beat) end.
+
+        Example, fade in the volume of track 1 over 2 bars:
+            grid.ramp(tracks=[1], controller="volume", start=(0, 0), end=(2, 0),
+                      start_value=0, end_value=100)
+        """
+        self.automate(tracks, controller, start[0], start[1], start_value)
+        self.automate(tracks, controller, end[0], end[1], end_value, ramp=True)
+
     def add_chord_spread(
             self,
             bar: int,
@@ -144,7 +305,7 @@ class Grid:
             stop_on_bar_overflow: bool = False,
     ):
         """Spread a chord out over a few beats"""
-        chord_notes: list[str] = chords.from_shorthand(chord)
+        chord_notes: list[str] = shorthand_chord_notes(chord)
         if random_order:
             random.shuffle(chord_notes)
         elif reverse:
@@ -165,12 +326,150 @@ class Grid:
             )
             beat += 1
 
+    def arpeggiate(
+            self,
+            bar: int,
+            tracks: list[int],
+            chords: list[str | list[int]],
+            pattern: str | list[int] = UP,
+            rate: Granularity | None = None,
+            octaves: int = 1,
+            octave: int = 3,
+            beats_per_chord: int | None = None,
+            beat_offset: int = 0,
+            duration: int | None = None,
+            velocity: int = 50,
+            volume: int | None = None,
+            pitchwheel: int | None = None,
+            modwheel: int | None = None,
+            expression: int | None = None,
+            pan: int | None = None,
+            sustain: bool | None = None,
+            stop_on_bar_overflow: bool = False,
+    ):
+        """
+        Arpeggiate a chord progression, one chord after the other, see arpeggio.py.
+
+        Each chord is resolved once and a compiled template of the pattern is stamped over it.
+        The notes are added in one pass, the same as add() with is_chord=IsChord.NO would add
+        them, with MIDI pitch values. A lazy grid applies its plan first (like fade()).
+
+        Example, a sixteenth note up-down arpeggio over two octaves, a bar per chord:
+            grid = Grid(Granularity.SIXTEENTH)
+            grid.arpeggiate(bar=0, tracks=[3], chords=["Am", "F", "C", "G"], pattern=UP_DOWN,
+                            rate=Granularity.SIXTEENTH, octaves=2)
+
+        Args:
+            bar (int): The bar of the first chord.
+            tracks (list[int]): ...
+            chords (list[str | list[int]]): Chord shorthand (e.g. "Am7", stacked upwards from
+                                             its root) or MIDI pitches (e.g. from
+                                             ProgressionBank.voicings()).
+            pattern (str | list[int]): up, down, up-down, random or a step list, see
+                                       arpeggio.pattern_sequence().
+            rate (Granularity | None): The note length of a step. None for the grid granularity.
+            octaves (int): The number of octaves the pattern spans.
+            octave (int): The octave of the root of chord shorthand, the same default as add().
+            beats_per_chord (int | None): The grid beats of a chord. None for a bar. The chords
+                                          follow each other from beat_offset, across bars.
+            beat_offset (int): The beat of the first chord in its bar.
+            duration (int | None): The duration of the notes, in grid beats. None for a step.
+            velocity (int): ...
+            stop_on_bar_overflow (bool): Drop the steps of a chord that would run into the next
+                                         bar, instead of continuing at the next beat there.
+        """
+        self.materialize()
+        if not tracks or not chords:
+            raise RequiredArgsGridError("tracks and chords arguments must be set.")
+        if beat_offset < 0 or beat_offset >= self.number_of_beats:
+            raise GranularityIndexGridError(
+                f"Position is greater than the grids granularity size: {beat_offset}"
+            )
+        if beats_per_chord is not None and beats_per_chord <= 0:
+            raise GranularityIndexGridError(
+                f"beats_per_chord must be greater than 0: {beats_per_chord}"
+            )
+        step: float = 1.0
+        if rate is not None:
+            step = (
+                NOTE_TYPE_GRID_QUANTIZE_MAP[self.granularity]
+                / NOTE_TYPE_GRID_QUANTIZE_MAP[rate.value]
+            )
+            if step < 1 or not step.is_integer():
+                raise GranularityIndexGridError(
+                    f"The rate {rate.value} is not a multiple of the grid granularity"
+                )
+        length: int = self.number_of_beats if beats_per_chord is None else beats_per_chord
+        templates: dict[int, ArpTemplate] = {}
+        voicings: dict[str, list[int]] = {}
+        # (grid beat from bar 0, MIDI pitch) of every note
+        notes: list[tuple[int, int]] = []
+        for number, chord in enumerate(chords):
+            if isinstance(chord, str):
+                if chord not in voicings:
+                    voicings[chord] = stack_tones(chord_to_midi(chord, octave))
+                tones = voicings[chord]
+            else:
+                tones = sorted(chord)
+            template = templates.get(len(tones))
+            if template is None:
+                template = templates[len(tones)] = compile_template(
+                    pattern, len(tones), octaves, int(step), length
+                )
+            start = bar * self.number_of_beats + beat_offset + number * length
+            end = start + length
+            if stop_on_bar_overflow:
+                end = min(end, (start // self.number_of_beats + 1) * self.number_of_beats)
+            if pattern == RANDOM:
+                ladder = random.choices(range(len(tones) * octaves), k=len(template.beats))
+                steps = zip(
+                    template.beats,
+                    [i % len(tones) for i in ladder],
+                    [12 * (i // len(tones)) for i in ladder],
+                )
+            else:
+                steps = zip(template.beats, template.tones, template.offsets)
+            for beat, tone, offset in steps:
+                if start + beat >= end:
+                    break
+                pitch = tones[tone] + offset
+                if pitch < 0 or pitch > 127:
+                    raise ValueError(f"Arpeggio pitch out of the MIDI range: {pitch}")
+                notes.append((start + beat, pitch))
+        item: dict[str, Any] = {
+            "duration": duration or int(step),
+            "expression": expression,
+            "is_chord": IsChord.NO,
+            "modwheel": modwheel,
+            "octave": octave,
+            "pan": pan,
+            "pitchwheel": pitchwheel,
+            "sustain": sustain,
+            "value": 0,
+            "velocity": velocity,
+            "volume": volume,
+        }
+        for position, pitch in notes:
+            bar_number, beat = divmod(position, self.number_of_beats)
+            bar_tracks = self.grid.setdefault(bar_number, {})
+            for track in tracks:
+                beats = bar_tracks.get(track)
+                if beats is None:
+                    beats = bar_tracks[track] = [[] for _ in range(self.number_of_beats)]
+                elif beat >= len(beats):
+                    raise GranularityIndexGridError(
+                        f"Position is greater than the grids granularity size: {beat}"
+                    )
+                new_item = dict(item)
+                new_item["value"] = pitch
+                beats[beat].append(new_item)
+
     def add(
         self,
         bars: list[int] | None = None,
         tracks: list[int] | None = None,
         beats: list[int] | None = None,
-        value: str = "",
+        value: str | int = "",
         # duration lists set each beat duration.
         duration: int | list[int] = 1,
         velocity: int = 50,
@@ -190,7 +489,7 @@ class Grid:
             bars (list[int] | None): ...
             tracks (list[int] | None): ...
             beats (list[int] | None): ...
-            value (str): ...
+            value (str | int): A drum name, note, chord, or a MIDI pitch (int, octave is ignored).
             duration (list[int] | None,  default 1): ...
             velocity (int, default 50): ...
             octave (int, default 3)
@@ -204,6 +503,8 @@ class Grid:
 
         TODO: Validation, see constants *_RANGE values.
         """
+        if self._record(ADD, locals()):
+            return
         if not bars or not tracks or not beats:
             raise RequiredArgsGridError(
                 "bars, tracks, and beats arguments must be set."
@@ -290,6 +591,8 @@ class Grid:
         """
         Adjust the velocity, duration, is_chord of the specified items
         """
+        if self._record(TRANSFORM, locals()):
+            return
         # grid.silence(beats=[7], bars=[2], duration=2, tracks=[2,3]) # maybe?
         if not bars or not tracks or not beats:
             raise RequiredArgsGridError("All args must have a value.")
@@ -323,15 +626,121 @@ class Grid:
                         self.grid[bar][track][beat][i]["pan"] = pan
                         self.grid[bar][track][beat][i]["sustain"] = sustain
 
+    def _apply_gains(
+        self,
+        tracks: list[int],
+        bars: list[int] | None,
+        gains_for: Callable[[list[float]], Iterable[float]],
+    ):
+        """
+        Collect the notes of tracks in one pass, compute the gains of their times (in beats) at
+        once and scale their velocities.
+        """
+        self.materialize()
+        beat_length: float = NOTE_TIME_MAP[self.granularity]
+        if bars is None or ALL in bars:
+            bars = list(self.grid.keys())
+        notes: list[dict[str, Any]] = []
+        times: list[float] = []
+        # The cells of the notes
+        cells: list[list[dict[str, Any]]] = []
+        for bar in bars:
+            tracks_list = list(self.grid.get(bar, {}).keys()) if ALL in tracks else tracks
+            for track in tracks_list:
+                for beat, data in enumerate(self.grid.get(bar, {}).get(track, [])):
+                    time = (bar * self.number_of_beats + beat) * beat_length
+                    for note in data:
+                        notes.append(note)
+                        times.append(time)
+                        cells.append(data)
+        gains = array("d", gains_for(times))
+        velocities = apply_gains([note["velocity"] for note in notes], gains)
+        # Notes at a gain <= 0 are silent, a velocity 0 note on would be a note off
+        silent: dict[int, list[dict[str, Any]]] = {}
+        for note, cell, gain, velocity in zip(notes, cells, gains, velocities):
+            if gain <= 0:
+                silent[id(note)] = cell
+            note["velocity"] = velocity
+        for cell in {id(cell): cell for cell in silent.values()}.values():
+            cell[:] = [note for note in cell if id(note) not in silent]
+
+    def fade(
+        self,
+        tracks: list[int],
+        start: tuple[int, int],
+        end: tuple[int, int],
+        start_gain: float = 0.0,
+        end_gain: float = 1.0,
+        curve: str = LINEAR,
+    ):
+        """
+        Fade or crescendo note velocities from (bar, beat) start to (bar, beat) end.
+
+        Notes before start are scaled by start_gain and notes after end by end_gain. Notes at a
+        gain of 0 (e.g. at the start of a fade in from 0) are removed, the velocities of the other
+        notes are at least 1.
+
+        Example, fade track 0 and 1 out over bars 496 to 499:
+            grid.fade(tracks=[0, 1], start=(496, 0), end=(500, 0), start_gain=1.0, end_gain=0.0)
+
+        Args:
+            tracks (list[int]): ...
+            start (tuple[int, int]): ...
+            end (tuple[int, int]): ...
+            start_gain (float): The velocity multiplier at start.
+            end_gain (float): The velocity multiplier at end.
+            curve (str): linear, exponential or logarithmic, see dynamics.CURVES.
+        """
+        beat_length: float = NOTE_TIME_MAP[self.granularity]
+        start_time = (start[0] * self.number_of_beats + start[1]) * beat_length
+        end_time = (end[0] * self.number_of_beats + end[1]) * beat_length
+        self._apply_gains(
+            tracks,
+            None,
+            lambda times: envelope_gains(times, start_time, end_time, start_gain, end_gain, curve),
+        )
+
+    def accent(self, tracks: list[int], accents: list[float], bars: list[int] | None = None):
+        """
+        Scale note velocities by a repeating accent map, one gain per beat of the grid.
+
+        Example, accent the quarter notes of an eighth note grid:
+            grid.accent(tracks=[0], accents=[1.0, 0.7])
+        """
+        step: float = NOTE_TIME_MAP[self.granularity]
+        self._apply_gains(tracks, bars, lambda times: accent_gains(times, accents, step))
+
+    def auto_dynamics(
+        self,
+        tracks: list[int],
+        amount: float,
+        phrase_bars: int = 4,
+        bars: list[int] | None = None,
+    ):
+        """
+        Shape note velocities with metric accents and a swell over every phrase_bars bars.
+
+        Args:
+            tracks (list[int]): ...
+            amount (float): 0 (no change) to 10 (strong dynamics).
+            phrase_bars (int): The length of a phrase in bars.
+            bars (list[int] | None): Limit to these bars. None for all.
+        """
+        phrase: float = phrase_bars * self.number_of_beats * NOTE_TIME_MAP[self.granularity]
+        self._apply_gains(tracks, bars, lambda times: auto_dynamics_gains(times, amount, phrase))
+
     def fill_gaps(self):
         """Insert empty bars where gaps exist"""
+        self.materialize()
         bars_list = sorted(list(self.grid.keys()))
         for n, i in enumerate(bars_list):
             if n < i:
                 # Missing bar n or more, insert them
                 for x in range(n, i):
                     if x not in self.grid:
-                        self.add(bars=[x], tracks=[ALL], beats=[ALL])
+                        # Same as add(bars=[x], tracks=[ALL], beats=[ALL]), which a lazy grid
+                        # would only record
+                        self.grid[x] = {}
         bars_list = sorted(list(self.grid.keys()))
         tracks_list = set()
         for bar in bars_list:
@@ -413,7 +822,10 @@ class Grid:
                                 result[track][
                                     "meta"
                                 ] = f"_|instrument|{self.granularity}|0.0|"
-                                pitch = chord_to_midi(j["value"], j["octave"])
+                                if isinstance(j["value"], int):
+                                    pitch = [j["value"]]
+                                else:
+                                    pitch = chord_to_midi(j["value"], j["octave"])
                                 if j["is_chord"] == IsChord.NO:
                                     pitches.append(pitch[0])
                                 else:
@@ -424,11 +836,7 @@ class Grid:
                             ]
                             notes.append(duration_tmp)
                             if humanize_jitter:
-                                offsets.append(
-                                    random.choice(
-                                        ["n", "n", "n", "n", "n", "H", "H", "H", "S"]
-                                    )
-                                )
+                                offsets.append(random.choice(HUMANIZE_OFFSETS))
                             else:
                                 offsets.append("n")
                             jitter = random.randint(-velocity_jitter, velocity_jitter)
@@ -449,6 +857,16 @@ class Grid:
                             expressions = [event_translate(j["expression"])]
                             sustains = [sustain_toggle(j["sustain"])]
                             pans = [event_translate(pan_to_midi(j["pan"]))]
+                        # Automation lanes replace the per note values of their controller
+                        for controller in self.automation.get(track, {}):
+                            {
+                                "volume": volumes,
+                                "pitchwheel": pitchwheels,
+                                "modwheel": modwheels,
+                                "expression": expressions,
+                                "sustain": sustains,
+                                "pan": pans,
+                            }[controller][:] = ["n"]
                         # Now join all of these lists into MDC format lists
                         # Maybe set these in a wrapper to compress if all are the same.?
                         result[track]["data"] += (
@@ -463,24 +881,110 @@ class Grid:
                             f"{_compress_mdc_part(sustains, entire_track_event=True)},"
                             f"{_compress_mdc_part(pans, entire_track_event=True)};"
                         )
-        output: str = f"{FORMAT_VERSION}\n"
-        for i in result.values():
-            output += f"{i['meta']}{i['data']}\n"
+        lines: list[str] = [f"{i['meta']}{i['data']}" for i in result.values()]
+        lines.extend(self._automation_lines(list(result.keys())))
+        body: str = "\n".join(lines)
+        # The provenance header lets Converter(trusted=True) skip validating this output
+        output: str = f"{FORMAT_VERSION}|{MDC_PROVENANCE_GRID}|{mdc_checksum(body)}\n{body}\n"
         # import pprint
         # pprint.pprint(result)
         return output
 
-    def save(self, path: str, velocity_jitter: int = 5, humanize_jitter: bool = False):
-        """Generate MDC format data and save to path"""
-        with open(path, "w") as outfd:
+    def _automation_lines(self, tracks: list[int]) -> list[str]:
+        """MDC automation lines, targeting the track line index of each automated track"""
+        lines: list[str] = []
+        beat_length: float = NOTE_TIME_MAP[self.granularity]
+        for track, lanes in sorted(self.automation.items()):
+            if track not in tracks:
+                raise TrackIndexGridError(f"Automation for a track without notes: {track}")
+            patterns = [
+                format_lane(
+                    controller,
+                    [point._replace(time=point.time * beat_length) for point in points],
+                )
+                for controller, points in sorted(lanes.items())
+                if points
+            ]
+            lines.append(
+                f"{tracks.index(track)}|{AUTOMATION_TRACK_TYPE}|{self.granularity}|0.0| "
+                f"{'; '.join(patterns)};"
+            )
+        return lines
+
+    def save(
+        self,
+        path: str,
+        velocity_jitter: int = 5,
+        humanize_jitter: bool = False,
+        compression: str | None = None,
+    ) -> str:
+        """
+        Generate MDC format data and save to path.
+
+        Paths ending in .gz or .xz are written compressed, see util.open_mdc().
+
+        Args:
+            path (str): ...
+            velocity_jitter (int): See to_data().
+            humanize_jitter (bool): See to_data().
+            compression (str | None): "gz" or "xz" to write a compressed file. The suffix is
+                                      added to path if it is missing.
+        Return:
+            str: The path written.
+        """
+        if compression is not None:
+            suffix = f".{compression}"
+            if suffix not in MDC_CODECS:
+                raise ValueError(f"Unknown compression: {compression}")
+            if not path.endswith(suffix):
+                path = f"{path}{suffix}"
+        with open_mdc(path, "w") as outfd:
             outfd.write(
                 self.to_data(
                     velocity_jitter=velocity_jitter, humanize_jitter=humanize_jitter
                 )
             )
+        return path
+
+    def dump_state(self, path: str | None = None) -> bytes:
+        """
+        A binary snapshot of the full grid, see snapshot.py. Unlike to_data(), it keeps every
+        item field (octave, is_chord, note names, ...), the automation and the plan of a lazy
+        grid, and load_state() restores an identical grid.
+
+        Args:
+            path (str | None): Also write the snapshot to this file, replacing it atomically.
+        Return:
+            bytes: The snapshot.
+        """
+        from .snapshot import dumps
+
+        data = dumps(self)
+        if path is not None:
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            with open(tmp_path, "wb") as snapshot_fd:
+                snapshot_fd.write(data)
+            os.replace(tmp_path, path)
+        return data
+
+    @classmethod
+    def load_state(cls, source: str | bytes) -> "Grid":
+        """
+        Restore a grid from a snapshot of dump_state().
+
+        Args:
+            source (str | bytes): A snapshot file, read in one read, or the snapshot itself.
+        """
+        from .snapshot import loads
+
+        if isinstance(source, str):
+            with open(source, "rb") as snapshot_fd:
+                source = snapshot_fd.read()
+        return loads(source)
 
     def dump_grid(self):
         """Pretty print the grid data"""
         from pprint import pprint
 
+        self.materialize()
         pprint(self.grid, width=100)
@@ -0,0 +1,319 @@
+"""
+Random access index for MDC files.
+
+An index records the byte offset of every track line, of every bar within a line and of every
+automation line. Recent indexes are kept in memory and an index can also be stored in a sidecar
+file next to the MDC file (<file>.mdcx, JSON). Both are rebuilt when the MDC file changes. With
+the index, Converter.parse_slice() can mmap the file and read only the requested tracks and bars
+instead of parsing the whole file. Offsets of compressed files (.mdc.gz, .mdc.xz) are offsets
+into the decompressed data. The checksum of a Grid provenance header is only computed for
+trusted parses (see MdcIndex.for_file(verify=True)).
+
+Example:
+    index = MdcIndex.for_file("song.mdc", save=True)
+    tracks = Converter().parse_slice("song.mdc", tracks=[0], bars=(100, 108))
+"""
+import json
+import mmap
+import os
+from collections import OrderedDict
+
+from .constants import (
+    AUTOMATION_TRACK_TYPE,
+    KNOWN_MDC_FORMAT_VERSIONS,
+    MDC_PROVENANCE_GRID,
+    NOTE_TIME_MAP,
+    NOTE_TYPE_GRID_QUANTIZE_MAP,
+)
+from .exceptions import (
+    MdcFormatError,
+    MdcInvalidGranularityError,
+    MdcLineError,
+    MdcUnknownVersionError,
+)
+from .util import mdc_buffer, mdc_checksum
+
+INDEX_SUFFIX = ".mdcx"
+INDEX_VERSION = 1
+# The number of indexes MdcIndex.for_file() keeps in memory
+MEMORY_INDEXES = 64
+# Only 4/4 time is supported, see Grid
+BEATS_PER_MEASURE = 4
+
+
+class TrackIndex:
+    def __init__(
+        self,
+        track_type: str,
+        granularity: str,
+        offset: float,
+        beats_per_bar: int,
+        bar_offsets: list[int],
+    ):
+        """
+        Args:
+            track_type (str): "drum" or "instrument".
+            granularity (str): The grid granularity of the line.
+            offset (float): The start offset of the line.
+            beats_per_bar (int): Patterns per bar.
+            bar_offsets (list[int]): Byte offset of the first pattern of each bar, followed by the
+                                     byte offset of the end of the line.
+        """
+        self.track_type: str = track_type
+        self.granularity: str = granularity
+        self.offset: float = offset
+        self.beats_per_bar: int = beats_per_bar
+        self.bar_offsets: list[int] = bar_offsets
+
+    @property
+    def bars(self) -> int:
+        return len(self.bar_offsets) - 1
+
+    @property
+    def bar_length(self) -> float:
+        """The length of a bar in beats"""
+        return self.beats_per_bar * NOTE_TIME_MAP[self.granularity]
+
+    def to_dict(self) -> dict:
+        return {
+            "track_type": self.track_type,
+            "granularity": self.granularity,
+            "offset": self.offset,
+            "beats_per_bar": self.beats_per_bar,
+            "bar_offsets": self.bar_offsets,
+        }
+
+
+class MdcIndex:
+    def __init__(
+        self,
+        mdc_version: int,
+        size: int,
+        mtime_ns: int,
+        verified: bool | None,
+        tracks: list[TrackIndex],
+        automation: list[list[int]] | None = None,
+    ):
+        """
+        Args:
+            mdc_version (int): The MDC format version of the file.
+            size (int): The size of the indexed file, to detect changes.
+            mtime_ns (int): The modification time of the indexed file, to detect changes.
+            verified (bool | None): The file has a Grid provenance header with a matching
+                                    checksum. None when the checksum was not computed yet.
+            tracks (list[TrackIndex]): One entry per track line.
+            automation (list[list[int]] | None): The [start, end) byte offsets of each
+                                                 automation line.
+        """
+        self.mdc_version: int = mdc_version
+        self.size: int = size
+        self.mtime_ns: int = mtime_ns
+        self.verified: bool | None = verified
+        self.tracks: list[TrackIndex] = tracks
+        self.automation: list[list[int]] = automation if automation is not None else []
+
+    @staticmethod
+    def index_path(path_to_mdc_file: str) -> str:
+        return f"{path_to_mdc_file}{INDEX_SUFFIX}"
+
+    @staticmethod
+    def _header(data: "mmap.mmap | bytes") -> tuple[int, int, bool | None]:
+        """
+        Parse the header of MDC data. Returns (end of the header, MDC version, verified), where
+        verified is None for Grid provenance headers (the checksum is not computed here).
+        """
+        header_end = data.find(b"\n")
+        if header_end == -1:
+            header_end = len(data)
+        version, _, provenance = data[:header_end].decode().strip().partition("|")
+        try:
+            mdc_version = int(version)
+        except ValueError:
+            raise MdcFormatError("Invalid header. Is this an mdc file?")
+        if mdc_version not in KNOWN_MDC_FORMAT_VERSIONS:
+            raise MdcUnknownVersionError(f"Unknown mdc format version: {mdc_version}")
+        source = provenance.partition("|")[0]
+        return header_end, mdc_version, None if source == MDC_PROVENANCE_GRID else False
+
+    @staticmethod
+    def _checksum_matches(data: "mmap.mmap | bytes", header_end: int) -> bool:
+        """Check the Grid provenance checksum of the header against the body"""
+        checksum = data[:header_end].decode().strip().split("|")[2:3]
+        body = data[header_end + 1:].decode().rstrip()
+        return checksum == [mdc_checksum(body)]
+
+    @classmethod
+    def build(cls, path_to_mdc_file: str, verify: bool = False) -> "MdcIndex":
+        """
+        Scan an MDC file once and index its lines and bars.
+
+        Args:
+            path_to_mdc_file (str): The MDC file.
+            verify (bool): Compute the checksum of a Grid provenance header. Otherwise verified
+                           is left None for such files, see verify_checksum().
+        """
+        stat = os.stat(path_to_mdc_file)
+        if not stat.st_size:
+            raise MdcFormatError("Invalid header. Is this an mdc file?")
+        with mdc_buffer(path_to_mdc_file) as data:
+            header_end, mdc_version, verified = cls._header(data)
+            if verified is None and verify:
+                verified = cls._checksum_matches(data, header_end)
+            tracks = []
+            automation = []
+            position = header_end + 1
+            line_num = 0
+            automation_type = AUTOMATION_TRACK_TYPE.encode()
+            while position < len(data):
+                end = data.find(b"\n", position)
+                if end == -1:
+                    end = len(data)
+                first = data.find(b"|", position, end)
+                second = data.find(b"|", first + 1, end) if first != -1 else -1
+                if second != -1 and data[first + 1:second] == automation_type:
+                    automation.append([position, end])
+                elif data[position:end].strip():
+                    tracks.append(cls._index_line(data, position, end, line_num))
+                position = end + 1
+                line_num += 1
+        return cls(mdc_version, stat.st_size, stat.st_mtime_ns, verified, tracks, automation)
+
+    @staticmethod
+    def _index_line(data: "mmap.mmap | bytes", start: int, end: int, line_num: int) -> TrackIndex:
+        """Index the bars of one version 1 track line"""
+        fields = []
+        position = start
+        for _ in range(4):
+            separator = data.find(b"|", position, end)
+            if separator == -1:
+                raise MdcLineError(f"Invalid line {line_num}")
+            fields.append(data[position:separator].decode())
+            position = separator + 1
+        _, track_type, granularity, offset = fields
+        if granularity not in NOTE_TYPE_GRID_QUANTIZE_MAP or not NOTE_TIME_MAP.get(granularity):
+            raise MdcInvalidGranularityError(f"Unknown granularity: {granularity}")
+        beats_per_bar = int(NOTE_TYPE_GRID_QUANTIZE_MAP[granularity] * BEATS_PER_MEASURE)
+        bar_offsets = [position]
+        beats = 0
+        while position < end:
+            separator = data.find(b";", position, end)
+            if separator == -1:
+                separator = end
+            # Forgive extra spacing, like the converter does
+            if data[position:separator].strip():
+                beats += 1
+                if beats % beats_per_bar == 0:
+                    bar_offsets.append(separator + 1)
+            position = separator + 1
+        if beats % beats_per_bar:
+            bar_offsets.append(end)
+        else:
+            # Also a line without beats, it has no bars
+            bar_offsets[-1] = end
+        return TrackIndex(track_type, granularity, float(offset), beats_per_bar, bar_offsets)
+
+    def to_dict(self) -> dict:
+        return {
+            "index_version": INDEX_VERSION,
+            "mdc_version": self.mdc_version,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "verified": self.verified,
+            "tracks": [track.to_dict() for track in self.tracks],
+            "automation": self.automation,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MdcIndex":
+        return cls(
+            data["mdc_version"],
+            data["size"],
+            data["mtime_ns"],
+            data["verified"],
+            [TrackIndex(**track) for track in data["tracks"]],
+            data["automation"],
+        )
+
+    def save(self, path: str):
+        """Write the index to path atomically"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            with open(tmp_path, "w") as index_fd:
+                json.dump(self.to_dict(), index_fd, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "MdcIndex":
+        with open(path) as index_fd:
+            data = json.load(index_fd)
+        if data.get("index_version") != INDEX_VERSION:
+            raise ValueError(f"Unknown index version: {data.get('index_version')}")
+        return cls.from_dict(data)
+
+    def verify_checksum(self, path_to_mdc_file: str) -> bool:
+        """Compute verified if it was not computed yet, see build(). Returns verified."""
+        if self.verified is None:
+            with mdc_buffer(path_to_mdc_file) as data:
+                self.verified = self._checksum_matches(data, self._header(data)[0])
+        return self.verified
+
+    def is_fresh(self, path_to_mdc_file: str) -> bool:
+        """Check that the indexed file did not change"""
+        stat = os.stat(path_to_mdc_file)
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    @classmethod
+    def for_file(
+        cls, path_to_mdc_file: str, save: bool = False, verify: bool = False
+    ) -> "MdcIndex":
+        """
+        Get the index of an MDC file: from memory, from the sidecar file, or built if both are
+        missing or stale. The last MEMORY_INDEXES indexes are kept in memory, keyed on the path,
+        size and modification time of the file, so repeated slices of a file index it once.
+
+        Args:
+            path_to_mdc_file (str): The MDC file.
+            save (bool): Write a new, rebuilt or newly verified index to the sidecar file. If it
+                         can not be written (e.g. a read-only bank), the index is still returned.
+            verify (bool): Compute verified (the checksum of a Grid provenance header), e.g. for
+                           a trusted parse. Otherwise it may be None.
+        """
+        stat = os.stat(path_to_mdc_file)
+        key = (os.path.abspath(path_to_mdc_file), stat.st_size, stat.st_mtime_ns)
+        index_path = cls.index_path(path_to_mdc_file)
+        index = _MEMORY.get(key)
+        # The sidecar file is missing or stale
+        changed: bool = index is not None and save and not os.path.exists(index_path)
+        if index is None:
+            try:
+                index = cls.load(index_path)
+                if not index.is_fresh(path_to_mdc_file):
+                    index = None
+            except (OSError, ValueError, KeyError, TypeError):
+                index = None
+            if index is None:
+                index = cls.build(path_to_mdc_file, verify)
+                changed = True
+        if verify and index.verified is None:
+            index.verify_checksum(path_to_mdc_file)
+            changed = True
+        _MEMORY[key] = index
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > MEMORY_INDEXES:
+            _MEMORY.popitem(last=False)
+        if save and changed:
+            try:
+                index.save(index_path)
+            except OSError:
+                pass
+        return index
+
+
+# (absolute path, size, mtime_ns) -> index, least recently used first, see MdcIndex.for_file()
+_MEMORY: "OrderedDict[tuple[str, int, int], MdcIndex]" = OrderedDict()
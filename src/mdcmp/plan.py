@@ -0,0 +1,157 @@
+"""
+Operation plans of lazy Grids.
+
+A lazy Grid (Grid(lazy=True)) records add(), transform(), copy_to_end() and automate() calls as a
+plan instead of changing the grid right away. The plan is optimized and applied in one go when the
+grid is needed (to_data(), save(), fade(), Grid.materialize(), ...):
+- Consecutive transforms of the same cells are fused into one pass.
+- A transform is dropped when the next transform overwrites every field it sets on its cells.
+- A transform is moved before the copies recorded ahead of it when the copies neither read nor
+  write its cells and it can then be fused with the transform before them.
+- Automation points that are replaced by a later point at the same time are dropped.
+
+An operation is only fused or dropped when the remaining operation raises the same errors, or
+after its arguments are checked. Copies are never merged or reordered with each other, their
+destination depends on the bars in the grid when they are applied.
+"""
+from typing import Any, Callable, NamedTuple
+
+from .constants import ALL
+
+ADD = "add"
+TRANSFORM = "transform"
+COPY = "copy_to_end"
+AUTOMATE = "automate"
+
+
+class PlanOp(NamedTuple):
+    # The Grid method to call
+    name: str
+    # Its keyword arguments
+    args: dict[str, Any]
+
+
+def _covers(outer: list[int], inner: list[int]) -> bool:
+    """
+    outer selects at least the bars, tracks or beats that inner selects, and raises for any of
+    them that is missing. ALL only covers ALL, the bars or tracks it selects depend on the grid.
+    """
+    if ALL in inner or ALL in outer:
+        return ALL in inner and ALL in outer
+    return bool(inner) and set(inner) <= set(outer)
+
+
+def _same(first: list[int], second: list[int]) -> bool:
+    return set(first) == set(second)
+
+
+def _fuse_transforms(first: PlanOp, second: PlanOp) -> PlanOp | None:
+    """
+    Fuse two consecutive transforms into one, or None if they can not be fused.
+
+    A transform always sets velocity, is_chord and the controllers of its cells. It only sets the
+    octave when octave >= 0 and the duration when duration is set, so those two decide whether
+    the first transform still has an effect. A duration list of the first transform raises
+    IndexError for cells with more items than the list, so it is never replaced.
+    """
+    a, b = first.args, second.args
+    selection = ("bars", "tracks", "beats")
+    if all(_same(a[i], b[i]) for i in selection):
+        args = dict(b)
+        if b["octave"] < 0:
+            args["octave"] = a["octave"]
+        if not b["duration"]:
+            args["duration"] = a["duration"]
+        elif isinstance(a["duration"], list):
+            return None
+        elif isinstance(b["duration"], list) and a["duration"] and not all(b["duration"]):
+            # Unset items of a duration list keep the first duration, item by item
+            return None
+        return PlanOp(TRANSFORM, args)
+    if (
+        all(_covers(b[i], a[i]) for i in selection)
+        and b["octave"] >= 0
+        and b["duration"]
+        and not isinstance(b["duration"], list)
+        and not isinstance(a["duration"], list)
+    ):
+        return second
+    return None
+
+
+def _defers(copy: PlanOp, transform: PlanOp) -> bool:
+    """
+    transform can be applied before copy: its bars are source bars of the copy, so they exist
+    below the copy destination if the copy succeeds, and the copy does not read its tracks.
+    """
+    bars, tracks = transform.args["bars"], transform.args["tracks"]
+    return (
+        bool(bars)
+        and ALL not in tracks
+        and set(bars) <= set(copy.args["bars"])
+        and not set(tracks) & set(copy.args["tracks"])
+    )
+
+
+def _fuse_past_copies(plan: list[PlanOp], op: PlanOp) -> bool:
+    """Fuse op with the transform before the copies at the end of plan, if they allow it"""
+    index = len(plan)
+    while index and plan[index - 1].name == COPY and _defers(plan[index - 1], op):
+        index -= 1
+    if index == len(plan) or not index or plan[index - 1].name != TRANSFORM:
+        return False
+    fused = _fuse_transforms(plan[index - 1], op)
+    if fused is None:
+        return False
+    plan[index - 1] = fused
+    return True
+
+
+def _drop_replaced_points(
+    plan: list[PlanOp], op: PlanOp, check: Callable[[PlanOp], Any] | None
+):
+    """Remove earlier automate() calls whose points op replaces, back to the last copy"""
+    args = op.args
+    for index in range(len(plan) - 1, -1, -1):
+        previous = plan[index]
+        if previous.name == COPY:
+            # The copy may read the point
+            return
+        if (
+            previous.name == AUTOMATE
+            and previous.args["controller"] == args["controller"]
+            and previous.args["bar"] == args["bar"]
+            and previous.args["beat"] == args["beat"]
+            and set(previous.args["tracks"]) <= set(args["tracks"])
+        ):
+            if check is not None:
+                check(previous)
+            del plan[index]
+
+
+def optimize(
+    plan: list[PlanOp], check: Callable[[PlanOp], Any] | None = None
+) -> list[PlanOp]:
+    """
+    Fuse and drop the operations of a plan that do not change the final grid.
+
+    Args:
+        plan (list[PlanOp]): The recorded operations, in call order.
+        check (Callable[[PlanOp], Any] | None): Raises the argument errors of an automate()
+            call, it is called before the call is dropped.
+    Return:
+        list[PlanOp]: The operations to apply, in order.
+    """
+    optimized: list[PlanOp] = []
+    for op in plan:
+        if op.name == TRANSFORM and optimized and optimized[-1].name == TRANSFORM:
+            fused = _fuse_transforms(optimized[-1], op)
+            if fused is not None:
+                optimized[-1] = fused
+                continue
+        if op.name == TRANSFORM and _fuse_past_copies(optimized, op):
+            continue
+        if op.name == AUTOMATE:
+            _drop_replaced_points(optimized, op, check)
+        optimized.append(op)
+    return optimized
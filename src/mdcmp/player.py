@@ -0,0 +1,215 @@
+"""
+Stream MIDI events to a sink in real time.
+
+The Scheduler pulls time ordered events (see: Converter.iter_events()) lazily, keeps a small
+look-ahead buffer of upcoming messages, and hands each message to a sink callback at its wall
+clock time for the given tempo. The timing error of every dispatch is recorded as jitter.
+
+Example:
+    sink = RecordingSink()
+    scheduler = Scheduler(sink, tempo=120)
+    stats = scheduler.play_grid(grid)
+"""
+import heapq
+import time
+from typing import Callable, Iterable, NamedTuple
+
+from .converter import Converter
+from .events import Event, NOTE, CONTROL, PITCHWHEEL
+from .grid import Grid
+
+# Message kinds passed to a sink
+NOTE_ON = "note_on"
+NOTE_OFF = "note_off"
+
+
+class Message(NamedTuple):
+    """
+    A MIDI message ready to send.
+
+    kind is one of NOTE_ON, NOTE_OFF, events.CONTROL or events.PITCHWHEEL.
+    """
+
+    kind: str
+    track: int
+    channel: int
+    data1: int
+    data2: int
+
+
+# A sink is called with the message and the (scheduler clock) time it was dispatched at
+Sink = Callable[[Message, float], None]
+
+
+class JitterStats:
+    """Timing error of dispatched messages, in seconds (actual - scheduled)"""
+
+    def __init__(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.min: float = 0.0
+
+    def record(self, jitter: float):
+        if not self.count:
+            self.min = self.max = jitter
+        else:
+            self.min = min(self.min, jitter)
+            self.max = max(self.max, jitter)
+        self.count += 1
+        self.total += jitter
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"JitterStats(count={self.count}, mean={self.mean:.6f}, "
+            f"min={self.min:.6f}, max={self.max:.6f})"
+        )
+
+
+class RecordingSink:
+    """A sink that records every message with its dispatch time. Useful for testing."""
+
+    def __init__(self):
+        self.messages: list[tuple[float, Message]] = []
+
+    def __call__(self, message: Message, timestamp: float):
+        self.messages.append((timestamp, message))
+
+
+class FakeClock:
+    """
+    A clock that only advances when sleep() is called.
+
+    Pass clock=fake.now and sleep=fake.sleep to Scheduler to play songs instantly.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time: float = start
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, seconds: float):
+        self.time += max(seconds, 0.0)
+
+
+class Scheduler:
+    def __init__(
+        self,
+        sink: Sink,
+        tempo: int = 120,
+        lookahead: float = 0.1,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            sink (Sink): Called with each message at its scheduled time.
+            tempo (int): The tempo in BPM (beats per minute).
+            lookahead (float): Seconds of upcoming messages to buffer ahead of the clock.
+            clock (Callable): Returns the current time in seconds.
+            sleep (Callable): Blocks for the given number of seconds.
+        """
+        if lookahead < 0:
+            raise ValueError("lookahead must be >= 0")
+        self.sink: Sink = sink
+        self.tempo: int = tempo
+        self.lookahead: float = lookahead
+        self.clock = clock
+        self.sleep = sleep
+        self.seconds_per_beat: float = 60.0 / tempo
+        self.stats: JitterStats = JitterStats()
+
+    def _expand(self, event: Event) -> list[tuple[float, Message]]:
+        """Translate an event to messages with their time in beats"""
+        if event.kind == NOTE:
+            return [
+                (
+                    event.time,
+                    Message(NOTE_ON, event.track, event.channel, event.data1, event.data2),
+                ),
+                (
+                    event.time + event.duration,
+                    Message(NOTE_OFF, event.track, event.channel, event.data1, 0),
+                ),
+            ]
+        if event.kind in (CONTROL, PITCHWHEEL):
+            return [
+                (
+                    event.time,
+                    Message(event.kind, event.track, event.channel, event.data1, event.data2),
+                )
+            ]
+        raise ValueError(f"Unknown event kind: {event.kind}")
+
+    def play(self, events: Iterable[Event]) -> JitterStats:
+        """
+        Dispatch time ordered events to the sink in real time.
+
+        Events are consumed lazily: only events due within the look-ahead window are pulled from
+        the iterable, so playback starts before the rest of the song is rendered.
+
+        Args:
+            events (Iterable[Event]): Time ordered events, e.g. from Converter.iter_events().
+        Return:
+            JitterStats: The timing error of this playback.
+        """
+        stats = JitterStats()
+        # (time in beats, sequence, message), the sequence keeps insertion order stable
+        buffer: list[tuple[float, int, Message]] = []
+        seq: int = 0
+        last_time: float = float("-inf")
+        source = iter(events)
+        exhausted: bool = False
+        start: float = self.clock()
+        while buffer or not exhausted:
+            now_beats = (self.clock() - start) / self.seconds_per_beat
+            horizon = now_beats + self.lookahead / self.seconds_per_beat
+            # Fill the look-ahead buffer. Events are time ordered, so stop after the first event
+            # past the horizon.
+            while not exhausted and last_time <= horizon:
+                try:
+                    event = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                for beat, message in self._expand(event):
+                    heapq.heappush(buffer, (beat, seq, message))
+                    seq += 1
+                last_time = event.time
+            if not buffer:
+                continue
+            beat, _, message = buffer[0]
+            due: float = start + beat * self.seconds_per_beat
+            wait: float = due - self.clock()
+            if wait > 0:
+                self.sleep(min(wait, max(self.lookahead, 0.001)))
+                continue
+            heapq.heappop(buffer)
+            now = self.clock()
+            self.sink(message, now)
+            stats.record(now - due)
+        self.stats = stats
+        return stats
+
+    def play_file(self, path_to_mdc_file: str) -> JitterStats:
+        """Play an MDC file"""
+        return self.play(Converter(tempo=self.tempo).iter_events(path_to_mdc_file))
+
+    def play_grid(
+        self, grid: Grid, velocity_jitter: int = 5, humanize_jitter: bool = False
+    ) -> JitterStats:
+        """
+        Play a Grid.
+
+        Args:
+            grid (Grid): The grid to play.
+            velocity_jitter (int): See Grid.to_data().
+            humanize_jitter (bool): See Grid.to_data().
+        """
+        data = grid.to_data(velocity_jitter=velocity_jitter, humanize_jitter=humanize_jitter)
+        return self.play(Converter(tempo=self.tempo).iter_data_events(data))
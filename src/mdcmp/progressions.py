@@ -0,0 +1,214 @@
+"""
+Load chord progression files.
+
+See: docs/PROGRESSIONS.md for the file format.
+"""
+from array import array
+from pathlib import Path
+from .shorthand import SLASH_QUALITIES, normalize_quality
+from .util import chord_to_midi, note_to_midi_int
+
+
+def parse_progressions(data: str) -> list[list[str]]:
+    """Parse progression file data into a list of progressions (lists of chord names)"""
+    progressions = []
+    for line in data.split("\n"):
+        progression = [chord.strip() for chord in line.split(",") if chord.strip()]
+        if progression:
+            progressions.append(progression)
+    return progressions
+
+
+def is_valid_progression(progression: list[str]) -> bool:
+    """Check that every chord of a progression can be resolved to MIDI pitches"""
+    for chord in progression:
+        try:
+            chord_to_midi(chord, 0)
+        except Exception:
+            return False
+    return True
+
+
+def load_progressions(path_dir: str, skip_invalid: bool = True) -> dict[str, list[list[str]]]:
+    """
+    Load all progression files in a directory.
+
+    The file name without the suffix is used as the style key.
+    Example: data/progressions/lofi.txt loads as
+        {"lofi": [["Amin11", "D7", "Fmaj7", "Cmaj7"], ...]}
+
+    Args:
+        path_dir (str): The directory of *.txt progression files.
+        skip_invalid (bool): Drop progressions with chords that can not be resolved.
+    """
+    styles: dict[str, list[list[str]]] = {}
+    for path in sorted(Path(path_dir).glob("*.txt")):
+        with open(path) as progression_fd:
+            progressions = parse_progressions(progression_fd.read())
+        if skip_invalid:
+            progressions = [i for i in progressions if is_valid_progression(i)]
+        if progressions:
+            styles[path.stem] = progressions
+    return styles
+
+
+def split_chord_name(chord: str) -> tuple[str, str]:
+    """
+    Split a chord shorthand into the root note and the chord quality.
+
+    The bass note of slash chords is dropped from the quality. The quality is returned as written,
+    see shorthand.normalize_quality().
+    Example: "Fm7/Bb" -> ("F", "m7"), "Bb" -> ("Bb", ""), "Cm/M7" -> ("C", "m/M7")
+    """
+    n: int = 1
+    while n < len(chord) and chord[n] in "#b":
+        n += 1
+    quality = chord[n:]
+    if "/" in quality and normalize_quality(quality) not in SLASH_QUALITIES:
+        quality = quality.rpartition("/")[0]
+    return chord[:n], quality
+
+
+class ProgressionBank:
+    """
+    Progressions compiled once into flat integer arrays.
+
+    Each chord is stored as the pitch class of its first note (the bass of slash chords) plus the
+    intervals of all its notes relative to that pitch class, exactly as util.chord_to_midi()
+    resolves them (in one octave, so intervals can be negative). Voicing a
+    progression in any key and octave is then integer math only; mingus is only used while
+    compiling.
+
+    Progressions are referenced by their index and indexed by key (the root pitch class of the
+    first chord), length (number of chords), chord quality and style. Qualities are normalized
+    with the shorthand aliases, so "min7", "mi7", "-7" and "m7" are the same quality.
+
+    Example:
+        bank = ProgressionBank.load("data/progressions")
+        for index in bank.query(key=9, length=4, quality="min11"):
+            pitches = bank.voicings(index, transpose=bank.transpose_to(index, 0), octave=3)
+    """
+
+    def __init__(self):
+        self.styles: list[str] = []
+        # Chord names of each progression, for reference
+        self.names: list[list[str]] = []
+        # Index of the first chord of each progression into the chord arrays (+1 sentinel)
+        self.progression_offsets: array = array("I", [0])
+        # Per chord: the pitch class of the first note
+        self.chord_bass: array = array("b")
+        # Per chord: the root pitch class of the chord name
+        self.chord_roots: array = array("b")
+        # Index of the first interval of each chord into self.intervals (+1 sentinel)
+        self.interval_offsets: array = array("I", [0])
+        # Intervals of all chords relative to the pitch class of their first note
+        self.intervals: array = array("b")
+        self.by_key: dict[int, list[int]] = {}
+        self.by_length: dict[int, list[int]] = {}
+        self.by_quality: dict[str, list[int]] = {}
+        self.by_style: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.styles)
+
+    @classmethod
+    def load(cls, path_dir: str) -> "ProgressionBank":
+        """Compile all progression files of a directory, see load_progressions()"""
+        bank = cls()
+        for style, progressions in load_progressions(path_dir).items():
+            for progression in progressions:
+                bank.add(style, progression)
+        return bank
+
+    def add(self, style: str, progression: list[str]) -> int:
+        """Compile and add a progression. Returns the progression index."""
+        compiled: list[tuple[int, int, list[int]]] = []
+        for chord in progression:
+            pitches = chord_to_midi(chord, 0)
+            bass = pitches[0] % 12
+            root = note_to_midi_int(split_chord_name(chord)[0], 0) % 12
+            compiled.append((bass, root, [pitch - bass for pitch in pitches]))
+        index: int = len(self.styles)
+        for bass, root, intervals in compiled:
+            self.chord_bass.append(bass)
+            self.chord_roots.append(root)
+            self.intervals.extend(intervals)
+            self.interval_offsets.append(len(self.intervals))
+        self.progression_offsets.append(len(self.chord_bass))
+        self.styles.append(style)
+        self.names.append(list(progression))
+        self.by_key.setdefault(compiled[0][1], []).append(index)
+        self.by_length.setdefault(len(progression), []).append(index)
+        for quality in {normalize_quality(split_chord_name(chord)[1]) for chord in progression}:
+            self.by_quality.setdefault(quality, []).append(index)
+        self.by_style.setdefault(style, []).append(index)
+        return index
+
+    def length(self, index: int) -> int:
+        """The number of chords of a progression"""
+        return self.progression_offsets[index + 1] - self.progression_offsets[index]
+
+    def key(self, index: int) -> int:
+        """The root pitch class of the first chord of a progression"""
+        return self.chord_roots[self.progression_offsets[index]]
+
+    def transpose_to(self, index: int, key: int) -> int:
+        """The transposition in semitones that moves a progression to key (a pitch class)"""
+        return (key - self.key(index)) % 12
+
+    def query(
+        self,
+        key: int | None = None,
+        length: int | None = None,
+        quality: str | None = None,
+        style: str | None = None,
+    ) -> list[int]:
+        """
+        Indexes of the progressions matching all given properties, in order.
+
+        The quality can be given with any alias, e.g. "min7" or "m7", see
+        shorthand.normalize_quality().
+        """
+        if quality is not None:
+            quality = normalize_quality(quality)
+        result: set[int] | None = None
+        for index, value in (
+            (self.by_key, key),
+            (self.by_length, length),
+            (self.by_quality, quality),
+            (self.by_style, style),
+        ):
+            if value is None:
+                continue
+            matches = set(index.get(value, []))
+            result = matches if result is None else result & matches
+        if result is None:
+            return list(range(len(self)))
+        return sorted(result)
+
+    def chord(self, chord_index: int, transpose: int = 0, octave: int = 3) -> list[int]:
+        """
+        MIDI pitches of a chord by its global chord index.
+
+        The transposition keeps the bass in the same octave, so the register does not drift.
+        """
+        base: int = (self.chord_bass[chord_index] + transpose) % 12 + 12 * octave
+        start = self.interval_offsets[chord_index]
+        end = self.interval_offsets[chord_index + 1]
+        return [base + interval for interval in self.intervals[start:end]]
+
+    def voicings(self, index: int, transpose: int = 0, octave: int = 3) -> list[list[int]]:
+        """
+        MIDI pitches of every chord of a progression.
+
+        Args:
+            index (int): The progression index.
+            transpose (int): Semitones to transpose by.
+            octave (int): The octave of the first notes of the chords.
+        """
+        return [
+            self.chord(chord_index, transpose, octave)
+            for chord_index in range(
+                self.progression_offsets[index], self.progression_offsets[index + 1]
+            )
+        ]
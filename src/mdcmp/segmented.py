@@ -0,0 +1,219 @@
+"""
+Segmented MIDI file writer with bounded memory.
+
+MIDIFile keeps every event of every track in memory and sorts them all in writeFile(). For very
+long songs the SegmentedWriter instead consumes a time ordered event stream (see:
+Converter.iter_events()) in windows of `window` beats. When a window is complete, the events of
+each track are sorted, encoded and appended to a temporary spill file per track. Note offs that
+fall past the window are held back until their window. At the end the SMF chunks are assembled
+from the spill files with their final lengths. Peak memory depends on the window size, not on the
+length of the song.
+
+The output matches Converter.save() byte for byte for the same events: format 1, a tempo track,
+the same tick resolution and rounding, event order and duplicate note removal.
+
+Example:
+    Converter(tempo=90).save_segmented("ambient.mdc", "ambient.midi", window=64)
+"""
+import heapq
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Iterable
+
+from .constants import TICKS_PER_BEAT
+from .events import Event, NOTE, PITCHWHEEL
+
+# Secondary sort order of events at the same tick, as in midiutil
+_ORDER_CONTROL = 1
+_ORDER_NOTE_OFF = 2
+_ORDER_NOTE_ON = 3
+_END_OF_TRACK = b"\x00\xff\x2f\x00"
+# Copy spill files in blocks of this size
+_COPY_BUFFER = 1024 * 1024
+
+# An encoded event: tick, sort order, sequence, status, data1, data2
+_Encoded = tuple[int, int, int, int, int, int]
+
+
+def _var_length(value: int) -> bytes:
+    """Encode a MIDI variable length quantity"""
+    if value < 0x80:
+        return bytes((value,))
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(encoded))
+
+
+def _encode_events(events: list[_Encoded], last_tick: int = 0) -> tuple[bytes, int]:
+    """
+    Sort and encode the events of a track, continuing from last_tick.
+
+    Return:
+        tuple[bytes, int]: The track data and the tick of its last event.
+    """
+    events.sort()
+    output = bytearray()
+    # Duplicate notes (same kind, tick, pitch and channel) are dropped, like midiutil
+    seen: set[tuple[int, int, int]] = set()
+    seen_tick: int = -1
+    for tick, order, _, status, data1, data2 in events:
+        if order != _ORDER_CONTROL:
+            if tick != seen_tick:
+                seen.clear()
+                seen_tick = tick
+            key = (status, data1, order)
+            if key in seen:
+                continue
+            seen.add(key)
+        output += _var_length(tick - last_tick)
+        output += bytes((status, data1, data2))
+        last_tick = tick
+    return bytes(output), last_tick
+
+
+def _header(num_tracks: int, ticks_per_beat: int) -> bytes:
+    """The header chunk of a format 1 file with a tempo track and num_tracks tracks"""
+    return b"MThd" + struct.pack(">LHHH", 6, 1, num_tracks + 1, ticks_per_beat)
+
+
+def _chunk(data: bytes) -> bytes:
+    """A complete track chunk of the track data"""
+    return b"MTrk" + struct.pack(">L", len(data) + len(_END_OF_TRACK)) + data + _END_OF_TRACK
+
+
+def _tempo_data(tempos: list[tuple[int, int]]) -> bytes:
+    """The tempo track data of (tick, microseconds per beat) changes"""
+    output = bytearray()
+    last_tick: int = 0
+    for tick, tempo in sorted(tempos, key=lambda item: item[0]):
+        output += _var_length(tick - last_tick)
+        output += b"\xff\x51\x03" + struct.pack(">L", tempo)[1:]
+        last_tick = tick
+    return bytes(output)
+
+
+class SegmentedWriter:
+    def __init__(
+        self,
+        num_tracks: int = 128,
+        window: float = 64.0,
+        ticks_per_beat: int = TICKS_PER_BEAT,
+        spill_dir: str | None = None,
+    ):
+        """
+        Args:
+            num_tracks (int): The number of tracks, not counting the tempo track.
+            window (float): The window size in beats.
+            ticks_per_beat (int): The tick resolution of the file.
+            spill_dir (str | None): The directory of the spill files. None for the default
+                                    temporary directory.
+        """
+        if window <= 0:
+            raise ValueError("window must be > 0")
+        self.num_tracks: int = num_tracks
+        self.window: float = window
+        self.ticks_per_beat: int = ticks_per_beat
+        self.spill_dir: str | None = spill_dir
+        self.tempos: list[tuple[int, int]] = []
+        # Per track state, created on the first event of a track
+        self._spills: dict[int, BinaryIO] = {}
+        self._last_tick: dict[int, int] = {}
+        self._buffers: dict[int, list[_Encoded]] = {}
+        self._note_offs: dict[int, list[_Encoded]] = {}
+        self._seq: int = 0
+        self._window_end: int = int(window * ticks_per_beat)
+        # The largest number of events held in memory at once, for monitoring
+        self.peak_events: int = 0
+
+    def add_tempo(self, time: float, tempo: int):
+        """Add a tempo change (in BPM) to the tempo track"""
+        self.tempos.append((round(time * self.ticks_per_beat), int(60000000 / tempo)))
+
+    def add_events(self, events: Iterable[Event]):
+        """
+        Add time ordered events. Can be called several times, each call continuing in time.
+
+        Events of a track at the same tick keep the order they are added in.
+        """
+        ticks_per_beat = self.ticks_per_beat
+        for event in events:
+            tick = round(event.time * ticks_per_beat)
+            while tick >= self._window_end:
+                self._flush(self._window_end)
+                self._window_end += int(self.window * ticks_per_beat)
+            track = event.track
+            if not 0 <= track < self.num_tracks:
+                raise ValueError(f"Invalid track: {track}")
+            buffer = self._buffers.get(track)
+            if buffer is None:
+                buffer = self._buffers[track] = []
+                self._note_offs[track] = []
+                self._last_tick[track] = 0
+            self._seq += 1
+            if event.kind == NOTE:
+                buffer.append(
+                    (tick, _ORDER_NOTE_ON, self._seq, 0x90 | event.channel, event.data1,
+                     event.data2)
+                )
+                heapq.heappush(
+                    self._note_offs[track],
+                    (tick + round(event.duration * ticks_per_beat), _ORDER_NOTE_OFF, self._seq,
+                     0x80 | event.channel, event.data1, event.data2),
+                )
+            elif event.kind == PITCHWHEEL:
+                value = event.data2 + 8192
+                buffer.append(
+                    (tick, _ORDER_CONTROL, self._seq, 0xE0 | event.channel, value & 0x7F,
+                     value >> 7)
+                )
+            else:
+                buffer.append(
+                    (tick, _ORDER_CONTROL, self._seq, 0xB0 | event.channel, event.data1,
+                     event.data2)
+                )
+
+    def _flush(self, end_tick: int | None):
+        """Encode and spill all events before end_tick (None for all events)"""
+        held: int = 0
+        for track, buffer in self._buffers.items():
+            note_offs = self._note_offs[track]
+            held += len(buffer) + len(note_offs)
+            while note_offs and (end_tick is None or note_offs[0][0] < end_tick):
+                buffer.append(heapq.heappop(note_offs))
+            if not buffer:
+                continue
+            output, last_tick = _encode_events(buffer, self._last_tick[track])
+            self._last_tick[track] = last_tick
+            buffer.clear()
+            spill = self._spills.get(track)
+            if spill is None:
+                spill = self._spills[track] = tempfile.TemporaryFile(dir=self.spill_dir)
+            spill.write(output)
+        self.peak_events = max(self.peak_events, held)
+
+    def write(self, output: BinaryIO):
+        """Flush the remaining events and write the MIDI file to output"""
+        self._flush(None)
+        output.write(_header(self.num_tracks, self.ticks_per_beat))
+        output.write(_chunk(_tempo_data(self.tempos)))
+        for track in range(self.num_tracks):
+            spill = self._spills.get(track)
+            if spill is None:
+                output.write(_chunk(b""))
+                continue
+            length = spill.tell()
+            output.write(b"MTrk" + struct.pack(">L", length + len(_END_OF_TRACK)))
+            spill.seek(0)
+            shutil.copyfileobj(spill, output, _COPY_BUFFER)
+            output.write(_END_OF_TRACK)
+        self.close()
+
+    def close(self):
+        """Remove the spill files"""
+        for spill in self._spills.values():
+            spill.close()
+        self._spills.clear()
@@ -0,0 +1,199 @@
+"""
+A parsed Composer bank in shared memory, for multi-process renders.
+
+The parent process parses every bank entry once and packs the event columns of all tracks, plus
+an index, into one multiprocessing.shared_memory segment. Worker processes attach to the segment
+by name and get read-only, zero-copy ParsedTrack views, so memory stays flat as workers are added
+and worker startup is only the attach.
+
+Example:
+    composer = Composer(tempo=90)
+    composer.load_mdc_bank("data/mdc")
+    with SharedBank.create(composer.bank) as shared:
+        with ProcessPoolExecutor(initializer=attach_worker, initargs=(shared.name,)) as pool:
+            ...
+
+    # In the worker:
+    composer = Composer(tempo=90)
+    composer.use_shared_bank(worker_bank())
+"""
+import json
+import struct
+from multiprocessing import shared_memory
+
+from .constants import FORMAT_VERSION
+from .converter import Converter
+from .tracks import ParsedTrack
+
+MAGIC = b"MDCBANK1"
+# Magic and index length
+_HEADER = struct.Struct(">8sQ")
+# Columns in layout order (largest items first, so every column stays aligned):
+# name, array typecode, item size
+COLUMNS: tuple[tuple[str, str, int], ...] = (
+    ("times", "d", 8),
+    ("durations", "d", 8),
+    ("data2", "i", 4),
+    ("data1", "h", 2),
+    ("kinds", "B", 1),
+)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment without registering it for cleanup in this process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        # Python < 3.13 always tracks attached segments. Pool workers share the resource tracker
+        # of the creating process, so the registration is the same one the owner removes with
+        # unlink().
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedBank:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        """
+        Use create() or attach() instead.
+
+        Args:
+            shm (SharedMemory): The segment holding the bank.
+            owner (bool): This process created the segment and unlinks it on close().
+        """
+        self.shm: shared_memory.SharedMemory = shm
+        self.owner: bool = owner
+        magic, index_length = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a shared bank segment: {shm.name}")
+        start = _HEADER.size
+        self.index: dict = json.loads(bytes(shm.buf[start:start + index_length]))
+        buf = shm.buf.toreadonly()
+        self._columns: dict[str, memoryview] = {}
+        count: int = self.index["events"]
+        for name, typecode, size in COLUMNS:
+            offset = self.index["offsets"][name]
+            self._columns[name] = buf[offset:offset + count * size].cast(typecode)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __enter__(self) -> "SharedBank":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index["loops"])
+
+    def keys(self) -> list[str]:
+        return list(self.index["loops"].keys())
+
+    @classmethod
+    def create(
+        cls,
+        bank: dict[str, str],
+        mdc_format_version: int = FORMAT_VERSION,
+        trusted: bool = True,
+    ) -> "SharedBank":
+        """
+        Parse every entry of a bank (key -> MDC file, see Composer.bank) into a new segment.
+
+        Args:
+            bank (dict[str, str]): Bank keys and their MDC files.
+            mdc_format_version (int): The MDC format version of the bank files.
+            trusted (bool): Skip the per beat range checks of files generated by Grid.
+        """
+        converter = Converter(mdc_format_version=mdc_format_version, trusted=trusted)
+        parsed: dict[str, list[ParsedTrack]] = {
+            key: converter.parse_tracks(path) for key, path in sorted(bank.items())
+        }
+        loops: dict[str, list[dict]] = {}
+        count: int = 0
+        for key, tracks in parsed.items():
+            loops[key] = []
+            for track in tracks:
+                loops[key].append(
+                    {"channel": track.channel, "length": track.length, "start": count,
+                     "count": len(track)}
+                )
+                count += len(track)
+        # The offsets depend on the index length, which depends on the offsets. Reserve room for
+        # the offset digits by sizing the index with placeholder offsets first.
+        offsets: dict[str, int] = {name: 10**15 for name, _, _ in COLUMNS}
+        index_length = len(json.dumps({"loops": loops, "events": count, "offsets": offsets}))
+        position = _HEADER.size + index_length
+        for name, _, size in COLUMNS:
+            position += -position % 8
+            offsets[name] = position
+            position += count * size
+        index = json.dumps({"loops": loops, "events": count, "offsets": offsets}).encode()
+        shm = shared_memory.SharedMemory(create=True, size=max(position, 1))
+        try:
+            _HEADER.pack_into(shm.buf, 0, MAGIC, len(index))
+            shm.buf[_HEADER.size:_HEADER.size + len(index)] = index
+            for name, typecode, size in COLUMNS:
+                column = shm.buf[offsets[name]:offsets[name] + count * size].cast(typecode)
+                start = 0
+                for tracks in parsed.values():
+                    for track in tracks:
+                        values = getattr(track, name)
+                        column[start:start + len(values)] = values
+                        start += len(values)
+                column.release()
+            return cls(shm, owner=True)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedBank":
+        """Attach to a segment created by another process, read-only"""
+        return cls(_attach(name))
+
+    def tracks(self, key: str) -> list[ParsedTrack]:
+        """The tracks of a bank entry. The columns are read-only views of the segment."""
+        tracks: list[ParsedTrack] = []
+        for info in self.index["loops"][key]:
+            start, end = info["start"], info["start"] + info["count"]
+            tracks.append(
+                ParsedTrack(
+                    channel=info["channel"],
+                    length=info["length"],
+                    **{name: self._columns[name][start:end] for name, _, _ in COLUMNS},
+                )
+            )
+        return tracks
+
+    def close(self):
+        """Detach. The owner also removes the segment."""
+        for column in self._columns.values():
+            column.release()
+        self._columns.clear()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Tracks returned by tracks() are still referenced. The mapping is released with
+            # them, the segment can still be removed.
+            pass
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+
+# Set once per worker process by attach_worker()
+_worker_bank: SharedBank | None = None
+
+
+def attach_worker(name: str):
+    """Process pool initializer: attach the worker to the shared bank segment"""
+    global _worker_bank
+    _worker_bank = SharedBank.attach(name)
+
+
+def worker_bank() -> SharedBank:
+    """The shared bank attached by attach_worker()"""
+    if _worker_bank is None:
+        raise RuntimeError("No shared bank attached, see attach_worker()")
+    return _worker_bank
@@ -0,0 +1,122 @@
+"""
+Built-in chord shorthand table.
+
+Resolves chord shorthand (e.g. "Amin11", "F/B") to note names without importing mingus. Every
+entry spells its notes the way mingus.core.chords.from_shorthand() does, so the result is the
+same. Polychords ("Dm|G") and unknown shorthand fall back to mingus, which is imported lazily.
+"""
+
+LETTERS = "CDEFGAB"
+NATURALS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# quality: ((letter steps above the root, semitones above the root), ...)
+CHORD_SHORTHAND: dict[str, tuple[tuple[int, int], ...]] = {
+    "": ((0, 0), (2, 4), (4, 7)),
+    "+": ((0, 0), (2, 4), (4, 8)),
+    "5": ((0, 0), (4, 7)),
+    "6": ((0, 0), (2, 4), (4, 7), (5, 9)),
+    "7": ((0, 0), (2, 4), (4, 7), (6, 10)),
+    "9": ((0, 0), (2, 4), (4, 7), (6, 10), (1, 2)),
+    "M": ((0, 0), (2, 4), (4, 7)),
+    "m": ((0, 0), (2, 3), (4, 7)),
+    "11": ((0, 0), (4, 7), (6, 10), (3, 5)),
+    "13": ((0, 0), (2, 4), (4, 7), (6, 10), (1, 2), (5, 9)),
+    "67": ((0, 0), (2, 4), (4, 7), (5, 9), (6, 10)),
+    "69": ((0, 0), (2, 4), (4, 7), (5, 9), (1, 2)),
+    "7+": ((0, 0), (2, 4), (4, 8), (6, 11)),
+    "M6": ((0, 0), (2, 4), (4, 7), (5, 9)),
+    "M7": ((0, 0), (2, 4), (4, 7), (6, 11)),
+    "M9": ((0, 0), (2, 4), (4, 7), (6, 11), (1, 2)),
+    "m6": ((0, 0), (2, 3), (4, 7), (5, 9)),
+    "m7": ((0, 0), (2, 3), (4, 7), (6, 10)),
+    "m9": ((0, 0), (2, 3), (4, 7), (6, 10), (1, 2)),
+    "6/7": ((0, 0), (2, 4), (4, 7), (5, 9), (6, 10)),
+    "6/9": ((0, 0), (2, 4), (4, 7), (5, 9), (1, 2)),
+    "7#5": ((0, 0), (2, 4), (4, 8), (6, 10)),
+    "7#9": ((0, 0), (2, 4), (4, 7), (6, 10), (1, 3)),
+    "7b5": ((0, 0), (2, 4), (4, 6), (6, 10)),
+    "7b9": ((0, 0), (2, 4), (4, 7), (6, 10), (1, 1)),
+    "M13": ((0, 0), (2, 4), (4, 7), (6, 11), (1, 2), (5, 9)),
+    "M7+": ((0, 0), (2, 4), (4, 8), (6, 11)),
+    "aug": ((0, 0), (2, 4), (4, 8)),
+    "dim": ((0, 0), (2, 3), (4, 6)),
+    "m11": ((0, 0), (2, 3), (4, 7), (6, 10), (3, 5)),
+    "m13": ((0, 0), (2, 3), (4, 7), (6, 10), (1, 2), (5, 9)),
+    "m7+": ((0, 0), (2, 4), (4, 8), (6, 10)),
+    "mM7": ((0, 0), (2, 3), (4, 7), (6, 11)),
+    "sus": ((0, 0), (3, 5), (4, 7)),
+    "7#11": ((0, 0), (2, 4), (4, 7), (6, 10), (3, 6)),
+    "7b12": ((0, 0), (2, 4), (4, 7), (6, 10), (2, 3)),
+    "M7+5": ((0, 0), (2, 4), (4, 8), (6, 10)),
+    "dim7": ((0, 0), (2, 3), (4, 6), (6, 9)),
+    "dom7": ((0, 0), (2, 4), (4, 7), (6, 10)),
+    "m/M7": ((0, 0), (2, 3), (4, 7), (6, 11)),
+    "m7b5": ((0, 0), (2, 3), (4, 6), (6, 10)),
+    "sus2": ((0, 0), (1, 2), (4, 7)),
+    "sus4": ((0, 0), (3, 5), (4, 7)),
+    "sus47": ((0, 0), (3, 5), (4, 7), (6, 10)),
+    "susb9": ((0, 0), (3, 5), (4, 7), (1, 1)),
+    "sus4b9": ((0, 0), (3, 5), (4, 7), (1, 1)),
+    "hendrix": ((0, 0), (2, 4), (4, 7), (6, 10), (2, 3)),
+}
+# Same normalization as mingus, in the same order
+SHORTHAND_ALIASES = (("min", "m"), ("mi", "m"), ("-", "m"), ("maj", "M"), ("ma", "M"))
+# Qualities that contain a slash but are not slash chords
+SLASH_QUALITIES = ("m/M7", "6/9", "6/7")
+
+
+def _is_note(note: str) -> bool:
+    return bool(note) and note[0] in NATURALS and all(i in "#b" for i in note[1:])
+
+
+def _pitch_class(note: str) -> int:
+    return (NATURALS[note[0]] + note.count("#") - note.count("b")) % 12
+
+
+def spell(root: str, quality: str) -> list[str]:
+    """Spell the notes of a chord quality from the table on a root note"""
+    letter: int = LETTERS.index(root[0])
+    root_pc: int = _pitch_class(root)
+    result = []
+    for steps, semitones in CHORD_SHORTHAND[quality]:
+        name = LETTERS[(letter + steps) % 7]
+        accidentals = (root_pc + semitones - NATURALS[name] + 6) % 12 - 6
+        result.append(name + ("#" * accidentals if accidentals > 0 else "b" * -accidentals))
+    return result
+
+
+def normalize_quality(quality: str) -> str:
+    """
+    Replace the aliases of a chord quality (SHORTHAND_ALIASES), e.g. "min7" -> "m7".
+
+    Qualities that spell the same chord are then equal, as far as the aliases go.
+    """
+    for alias, replacement in SHORTHAND_ALIASES:
+        quality = quality.replace(alias, replacement)
+    return quality
+
+
+def chord_notes(chord: str) -> list[str]:
+    """
+    Resolve chord shorthand to note names, lowest note first (see mingus from_shorthand()).
+
+    Example: chord_notes("Amin11") -> ["A", "C", "E", "G", "D"]
+    """
+    shorthand = chord
+    for alias, replacement in SHORTHAND_ALIASES:
+        shorthand = shorthand.replace(alias, replacement)
+    if shorthand and shorthand[0] in NATURALS and "|" not in shorthand:
+        n: int = 1
+        while n < len(shorthand) and shorthand[n] in "#b":
+            n += 1
+        root, quality = shorthand[:n], shorthand[n:]
+        bass: str | None = None
+        if "/" in quality and quality not in SLASH_QUALITIES:
+            quality, _, bass = quality.rpartition("/")
+        if quality in CHORD_SHORTHAND and (bass is None or _is_note(bass)):
+            notes = spell(root, quality)
+            return [bass] + notes if bass else notes
+    # Polychords, unknown shorthand and errors are handled by mingus
+    from mingus.core import chords
+
+    return chords.from_shorthand(chord)
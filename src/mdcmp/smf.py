@@ -0,0 +1,299 @@
+"""
+Import Standard MIDI Files (.mid) into Grid and MDC data.
+
+The reader streams through the file one track chunk at a time and decodes each chunk straight into
+compact note tuples (start tick, end tick, channel, pitch, velocity), without building a message
+object per event. Notes are then quantized to the grid granularity. Channel 10 (9 zero based)
+notes become drum names, see drummap.DRUMS. Only notes are imported.
+
+Example:
+    grid = midi_to_grid("loops/beat.mid", Granularity.SIXTEENTH)
+    grid.save("bank/beat.mdc", velocity_jitter=0)
+
+    result = import_files(["loops/"], "bank/", Granularity.SIXTEENTH, workers=8)
+"""
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from .constants import DURATION_GRANULARITY_MAP, NOTE_TIME_MAP
+from .drummap import DRUMS
+from .grid import Grid, Granularity, IsChord
+from .tracks import DRUM_CHANNEL
+from .util import MDC_CODECS, open_mdc
+
+MIDI_SUFFIXES = (".mid", ".midi")
+# A note: start tick, end tick, channel, pitch, velocity
+Note = tuple[int, int, int, int, int]
+
+
+class SmfFormatError(Exception):
+    """Could not parse a Standard MIDI File"""
+
+
+def _read_header(midi_fd: BinaryIO) -> tuple[int, int, int]:
+    """Read the MThd chunk and return the format, the number of tracks and ticks per beat"""
+    chunk = midi_fd.read(8)
+    if len(chunk) < 8 or chunk[:4] != b"MThd":
+        raise SmfFormatError("Invalid header. Is this a MIDI file?")
+    length = struct.unpack(">I", chunk[4:])[0]
+    data = midi_fd.read(length)
+    if length < 6 or len(data) < 6:
+        raise SmfFormatError("Invalid header length")
+    smf_format, tracks, division = struct.unpack(">HHH", data[:6])
+    if division & 0x8000:
+        raise SmfFormatError("SMPTE time division is not supported")
+    if not division:
+        raise SmfFormatError("Invalid time division: 0")
+    return smf_format, tracks, division
+
+
+def _parse_track(data: bytes) -> list[Note]:
+    """Decode the notes of one MTrk chunk"""
+    notes: list[Note] = []
+    # (channel, pitch) -> stack of (start tick, velocity) of the sounding notes
+    sounding: dict[tuple[int, int], list[tuple[int, int]]] = {}
+    tick: int = 0
+    position: int = 0
+    status: int = 0
+    size: int = len(data)
+    while position < size:
+        # Delta time, variable length
+        delta: int = 0
+        while True:
+            byte = data[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                break
+        tick += delta
+        byte = data[position]
+        if byte >= 0x80:
+            position += 1
+            # Running status only applies to channel messages, meta and sysex events clear it
+            status = byte if byte < 0xF0 else 0
+        elif not status:
+            raise SmfFormatError(f"Data byte without status at offset {position}")
+        else:
+            byte = status
+        if byte == 0xFF or byte in (0xF0, 0xF7):
+            if byte == 0xFF:
+                # Meta event type
+                position += 1
+            length: int = 0
+            while True:
+                value = data[position]
+                position += 1
+                length = (length << 7) | (value & 0x7F)
+                if value < 0x80:
+                    break
+            position += length
+            continue
+        kind = byte & 0xF0
+        channel = byte & 0x0F
+        if kind in (0xC0, 0xD0):
+            position += 1
+            continue
+        data1 = data[position]
+        data2 = data[position + 1]
+        position += 2
+        if kind == 0x90 and data2:
+            sounding.setdefault((channel, data1), []).append((tick, data2))
+        elif kind == 0x80 or kind == 0x90:
+            started = sounding.get((channel, data1))
+            if started:
+                start, velocity = started.pop(0)
+                notes.append((start, tick, channel, data1, velocity))
+    # Close notes that were never released at the end of the track
+    for (channel, pitch), started in sounding.items():
+        for start, velocity in started:
+            notes.append((start, tick, channel, pitch, velocity))
+    notes.sort()
+    return notes
+
+
+def read_smf(path: str) -> tuple[int, Iterator[list[Note]]]:
+    """
+    Read a Standard MIDI File lazily.
+
+    Return:
+        tuple[int, Iterator[list[Note]]]: Ticks per beat, and the notes of each track chunk. A
+                                          chunk is only read from the file when its notes are
+                                          requested.
+    """
+    midi_fd = open(path, "rb")
+    try:
+        _, _, division = _read_header(midi_fd)
+    except Exception:
+        midi_fd.close()
+        raise
+    return division, _iter_tracks(midi_fd)
+
+
+def _iter_tracks(midi_fd: BinaryIO) -> Iterator[list[Note]]:
+    with midi_fd:
+        while True:
+            chunk = midi_fd.read(8)
+            if len(chunk) < 8:
+                return
+            length = struct.unpack(">I", chunk[4:])[0]
+            if chunk[:4] != b"MTrk":
+                # Skip unknown chunks
+                midi_fd.seek(length, os.SEEK_CUR)
+                continue
+            data = midi_fd.read(length)
+            try:
+                yield _parse_track(data)
+            except IndexError:
+                raise SmfFormatError("Truncated track chunk")
+
+
+def midi_to_grid(path: str, granularity: Granularity = Granularity.SIXTEENTH) -> Grid:
+    """
+    Import the notes of a MIDI file into a Grid.
+
+    Each channel of each track chunk becomes a grid track. Note starts are quantized to the
+    nearest beat of the granularity, durations to at least one beat. Notes of the same pitch on
+    the same beat are merged into one note with the longest duration and the highest velocity.
+    Drum notes without a name in drummap.DRUMS are skipped.
+
+    Args:
+        path (str): The MIDI file.
+        granularity (Granularity): The grid granularity to quantize to.
+    """
+    grid = Grid(granularity=granularity)
+    step: float = NOTE_TIME_MAP[grid.granularity]
+    max_duration: int = max(DURATION_GRANULARITY_MAP[grid.granularity].keys())
+    division, tracks = read_smf(path)
+    ticks_per_step: float = division * step
+    # (chunk, channel) -> grid track
+    track_map: dict[tuple[int, int], int] = {}
+    # (track, position, value) -> [duration, velocity]. Notes of the same pitch that quantize to
+    # the same beat are merged, a cell can not hold one pitch twice (see Grid.to_data()).
+    cells: dict[tuple[int, int, str | int], list[int]] = {}
+    for chunk, notes in enumerate(tracks):
+        for start, end, channel, pitch, velocity in notes:
+            if channel == DRUM_CHANNEL:
+                if pitch not in DRUMS:
+                    continue
+                value: str | int = DRUMS[pitch]
+            else:
+                value = pitch
+            track = track_map.setdefault((chunk, channel), len(track_map))
+            position = round(start / ticks_per_step)
+            duration = min(max(round((end - start) / ticks_per_step), 1), max_duration)
+            merged = cells.get((track, position, value))
+            if merged is None:
+                cells[(track, position, value)] = [duration, velocity]
+            else:
+                merged[0] = max(merged[0], duration)
+                merged[1] = max(merged[1], velocity)
+    for (track, position, value), (duration, velocity) in cells.items():
+        grid.add(
+            bars=[position // grid.number_of_beats],
+            tracks=[track],
+            beats=[position % grid.number_of_beats],
+            value=value,
+            duration=duration,
+            velocity=velocity,
+            is_chord=IsChord.YES,
+        )
+    return grid
+
+
+def midi_to_mdc(path: str, granularity: Granularity = Granularity.SIXTEENTH) -> str:
+    """Import a MIDI file as MDC data, see midi_to_grid(). Velocities are kept as is."""
+    grid = midi_to_grid(path, granularity)
+    if not grid.grid:
+        raise SmfFormatError(f"No notes found in: {path}")
+    return grid.to_data(velocity_jitter=0)
+
+
+class ImportResult:
+    def __init__(self, paths: list[str], errors: dict[str, str], seconds: float):
+        self.paths: list[str] = paths
+        self.errors: dict[str, str] = errors
+        self.seconds: float = seconds
+
+    @property
+    def files_per_second(self) -> float:
+        return (len(self.paths) + len(self.errors)) / self.seconds if self.seconds else 0.0
+
+
+def find_midi_files(paths: list[str]) -> list[str]:
+    """Expand directories into the MIDI files they contain (recursively), sorted"""
+    found: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(
+                str(i) for i in sorted(Path(path).rglob("*"))
+                if i.suffix.lower() in MIDI_SUFFIXES and i.is_file()
+            )
+        else:
+            found.append(path)
+    return found
+
+
+def _import_job(job: tuple[str, str, str]) -> tuple[str, str, str]:
+    """Convert one file. Returns (source, output path, error)"""
+    source, out_path, granularity = job
+    try:
+        mdc_data = midi_to_mdc(source, Granularity(granularity))
+    except (SmfFormatError, OSError, ValueError, KeyError) as err:
+        return source, "", f"{type(err).__name__}: {err}"
+    with open_mdc(out_path, "w") as mdc_fd:
+        mdc_fd.write(mdc_data)
+    return source, out_path, ""
+
+
+def import_files(
+    paths: list[str],
+    out_dir: str,
+    granularity: Granularity = Granularity.SIXTEENTH,
+    workers: int | None = None,
+    compression: str | None = None,
+) -> ImportResult:
+    """
+    Import MIDI files into out_dir as MDC files, in parallel.
+
+    Each file is written to out_dir/<name>.mdc. Files that fail to import are reported in
+    ImportResult.errors and do not stop the batch.
+
+    Args:
+        paths (list[str]): MIDI files and directories of MIDI files.
+        out_dir (str): The output directory. Created if missing.
+        granularity (Granularity): The grid granularity to quantize to.
+        workers (int | None): The number of processes. None uses all cores, 1 runs in-process.
+        compression (str | None): "gz" or "xz" to write <name>.mdc.gz or <name>.mdc.xz files.
+    """
+    suffix = ".mdc"
+    if compression is not None:
+        if f".{compression}" not in MDC_CODECS:
+            raise ValueError(f"Unknown compression: {compression}")
+        suffix = f".mdc.{compression}"
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    sources = find_midi_files(paths)
+    names: dict[str, int] = {}
+    jobs: list[tuple[str, str, str]] = []
+    for source in sources:
+        name = Path(source).stem
+        # Keep files with the same name from different directories apart
+        count = names.get(name, 0)
+        names[name] = count + 1
+        if count:
+            name = f"{name}-{count}"
+        jobs.append((source, os.path.join(out_dir, f"{name}{suffix}"), granularity.value))
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        results = list(map(_import_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(pool.map(_import_job, jobs, chunksize=chunksize))
+    paths_out = [out_path for _, out_path, error in results if not error]
+    errors = {source: error for source, _, error in results if error}
+    return ImportResult(paths_out, errors, time.perf_counter() - start)
@@ -0,0 +1,229 @@
+"""
+In-memory parsed tracks.
+
+A ParsedTrack stores the events of one MDC track line as parallel arrays (one array per field).
+Converter.parse_tracks() produces them and Converter.add_track() writes them to MIDI, so a parsed
+loop can be varied (shifted, stretched, transposed, ...) with one pass over its arrays instead of
+regenerating, re-serializing and re-parsing the MDC data.
+
+Transforms return a new ParsedTrack and leave the original untouched, so banked loops can be
+shared.
+"""
+from array import array
+from typing import Iterable, Iterator
+
+from .drummap import DRUMS, DRUMS_R
+from .dynamics import LINEAR, accent_gains, apply_gains, auto_dynamics_gains, envelope_gains
+from .events import Event, NOTE, CONTROL, PITCHWHEEL
+
+# Event kinds as stored in ParsedTrack.kinds
+KIND_CODES = {NOTE: 0, CONTROL: 1, PITCHWHEEL: 2}
+KIND_NAMES = {v: k for k, v in KIND_CODES.items()}
+DRUM_CHANNEL = 9
+
+
+class ParsedTrack:
+    def __init__(
+        self,
+        channel: int = 0,
+        length: float = 0.0,
+        times: array | None = None,
+        durations: array | None = None,
+        kinds: array | None = None,
+        data1: array | None = None,
+        data2: array | None = None,
+    ):
+        """
+        Args:
+            channel (int): The MIDI channel (9 for drums).
+            length (float): The length of the track in beats.
+            times (array): Event times in beats.
+            durations (array): Note durations in beats (0 for other events).
+            kinds (array): Event kinds, see KIND_CODES.
+            data1 (array): Note pitches or controller numbers.
+            data2 (array): Note velocities, controller or pitch wheel values.
+        """
+        self.channel: int = channel
+        self.length: float = length
+        self.times: array = times if times is not None else array("d")
+        self.durations: array = durations if durations is not None else array("d")
+        self.kinds: array = kinds if kinds is not None else array("B")
+        self.data1: array = data1 if data1 is not None else array("h")
+        self.data2: array = data2 if data2 is not None else array("i")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def is_drum(self) -> bool:
+        return self.channel == DRUM_CHANNEL
+
+    @classmethod
+    def from_events(
+        cls, events: Iterable[Event], channel: int = 0, length: float = 0.0
+    ) -> "ParsedTrack":
+        """Build a track from events. The event track numbers are dropped."""
+        track = cls(channel=channel, length=length)
+        for event in events:
+            track.times.append(event.time)
+            track.durations.append(event.duration)
+            track.kinds.append(KIND_CODES[event.kind])
+            track.data1.append(event.data1)
+            track.data2.append(event.data2)
+        return track
+
+    def events(self, track: int = 0) -> Iterator[Event]:
+        """Yield the events of this track, assigned to MIDI track number track"""
+        channel = self.channel
+        for time, duration, kind, data1, data2 in zip(
+            self.times, self.durations, self.kinds, self.data1, self.data2
+        ):
+            yield Event(time, track, channel, KIND_NAMES[kind], data1, data2, duration)
+
+    def copy(self, **columns) -> "ParsedTrack":
+        """Return a copy, replacing any of the given columns (times=..., data2=...)"""
+        track = ParsedTrack(
+            channel=columns.pop("channel", self.channel),
+            length=columns.pop("length", self.length),
+            times=columns.pop("times", array("d", self.times)),
+            durations=columns.pop("durations", array("d", self.durations)),
+            kinds=columns.pop("kinds", array("B", self.kinds)),
+            data1=columns.pop("data1", array("h", self.data1)),
+            data2=columns.pop("data2", array("i", self.data2)),
+        )
+        if columns:
+            raise TypeError(f"Unknown columns: {', '.join(columns)}")
+        return track
+
+    def shift(self, offset: float) -> "ParsedTrack":
+        """Move every event by offset beats"""
+        return self.copy(
+            times=array("d", [time + offset for time in self.times]),
+            length=self.length + offset,
+        )
+
+    def stretch(self, factor: float) -> "ParsedTrack":
+        """Scale event times and note durations by factor (e.g. 2.0 for half speed)"""
+        if factor <= 0:
+            raise ValueError("factor must be > 0")
+        return self.copy(
+            times=array("d", [time * factor for time in self.times]),
+            durations=array("d", [duration * factor for duration in self.durations]),
+            length=self.length * factor,
+        )
+
+    def transpose(self, semitones: int) -> "ParsedTrack":
+        """
+        Transpose note pitches, clamped to 0-127.
+
+        Drum tracks are returned unchanged, use remap_drums() instead.
+        """
+        if self.is_drum:
+            return self.copy()
+        note = KIND_CODES[NOTE]
+        return self.copy(
+            data1=array(
+                "h",
+                [
+                    min(max(pitch + semitones, 0), 127) if kind == note else pitch
+                    for kind, pitch in zip(self.kinds, self.data1)
+                ],
+            )
+        )
+
+    def scale_velocity(self, factor: float) -> "ParsedTrack":
+        """Multiply note velocities by factor, clamped to 0-127"""
+        note = KIND_CODES[NOTE]
+        return self.copy(
+            data2=array(
+                "i",
+                [
+                    min(max(int(velocity * factor), 0), 127) if kind == note else velocity
+                    for kind, velocity in zip(self.kinds, self.data2)
+                ],
+            )
+        )
+
+    def apply_gains(self, gains: Iterable[float]) -> "ParsedTrack":
+        """
+        Multiply note velocities by one gain per event, see dynamics.apply_gains(). Notes at a
+        gain <= 0 are dropped.
+        """
+        note = KIND_CODES[NOTE]
+        gains = gains if isinstance(gains, array) else array("d", gains)
+        scaled = apply_gains(self.data2, gains)
+        data2 = array(
+            "i",
+            [
+                new if kind == note else value
+                for kind, value, new in zip(self.kinds, self.data2, scaled)
+            ],
+        )
+        keep = [
+            i for i, (kind, gain) in enumerate(zip(self.kinds, gains)) if kind != note or gain > 0
+        ]
+        if len(keep) == len(self):
+            return self.copy(data2=data2)
+        return self.copy(
+            times=array("d", [self.times[i] for i in keep]),
+            durations=array("d", [self.durations[i] for i in keep]),
+            kinds=array("B", [self.kinds[i] for i in keep]),
+            data1=array("h", [self.data1[i] for i in keep]),
+            data2=array("i", [data2[i] for i in keep]),
+        )
+
+    def fade(
+        self,
+        start: float,
+        end: float,
+        start_gain: float = 0.0,
+        end_gain: float = 1.0,
+        curve: str = LINEAR,
+    ) -> "ParsedTrack":
+        """
+        Fade or crescendo the note velocities from start_gain at start to end_gain at end (in
+        beats). See dynamics.envelope_gains(). Notes at a gain of 0 are dropped.
+        """
+        return self.apply_gains(
+            envelope_gains(self.times, start, end, start_gain, end_gain, curve)
+        )
+
+    def accent(self, accents: list[float], step: float) -> "ParsedTrack":
+        """Apply a repeating accent map, one gain per step beats. See dynamics.accent_gains()"""
+        return self.apply_gains(accent_gains(self.times, accents, step))
+
+    def auto_dynamics(self, amount: float, phrase: float = 16.0) -> "ParsedTrack":
+        """Apply automatic dynamics from 0 to 10. See dynamics.auto_dynamics_gains()"""
+        return self.apply_gains(auto_dynamics_gains(self.times, amount, phrase))
+
+    def remap_drums(self, mapping: dict[str, str]) -> "ParsedTrack":
+        """
+        Replace drums by name, see drummap.DRUMS. Example: {"hat1": "ridecymbal1"}
+
+        Notes that are not in the mapping are kept.
+        """
+        pitch_map: dict[int, int] = {}
+        for source, target in mapping.items():
+            if source not in DRUMS_R or target not in DRUMS_R:
+                unknown = source if source not in DRUMS_R else target
+                raise KeyError(f"Unknown drum: {unknown}")
+            pitch_map[DRUMS_R[source]] = DRUMS_R[target]
+        note = KIND_CODES[NOTE]
+        return self.copy(
+            data1=array(
+                "h",
+                [
+                    pitch_map.get(pitch, pitch) if kind == note else pitch
+                    for kind, pitch in zip(self.kinds, self.data1)
+                ],
+            )
+        )
+
+    def drum_names(self) -> set[str]:
+        """The names of the drums played on this track"""
+        note = KIND_CODES[NOTE]
+        return {
+            DRUMS[pitch]
+            for kind, pitch in zip(self.kinds, self.data1)
+            if kind == note and pitch in DRUMS
+        }
@@ -1,5 +1,11 @@
-from mingus.core import chords
+import importlib
+import mmap
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator
+
 from .constants import ACCIDENTALS, NOTES, NOTE_TYPE_GRID_QUANTIZE_MAP
+from .shorthand import chord_notes
 
 
 def swap_accidental(note):
@@ -9,7 +15,11 @@ def swap_accidental(note):
 def note_to_midi_int(note: str, octave: int) -> int:
     """Convert a note to MIDI pitch value"""
     note = swap_accidental(note)
-    note_int: int = NOTES.index(note)
+    if note in NOTES:
+        note_int: int = NOTES.index(note)
+    else:
+        # Double accidentals and the like (e.g. "C##", "Fb") that mingus can produce
+        note_int = NOTES.index(note[0]) + note.count("#") - note.count("b")
     note_int += len(NOTES) * octave
     return note_int
 
@@ -19,7 +29,7 @@ def progression_to_midi(chord_progression: list[str], octave: int) -> list[int]:
     notes = []
     note_numbers = []
     for chord in chord_progression:
-        notes.extend(chords.from_shorthand(chord))
+        notes.extend(chord_notes(chord))
     for note in notes:
         note_numbers.append(note_to_midi_int(note, octave))
     return note_numbers
@@ -27,7 +37,7 @@ def progression_to_midi(chord_progression: list[str], octave: int) -> list[int]:
 
 def chord_to_midi(chord: str, octave: int) -> list[int]:
     """Convert a chord to MIDI pitch values"""
-    notes: list[str] = chords.from_shorthand(chord)
+    notes: list[str] = chord_notes(chord)
     midi_notes: list[int] = []
     for note in notes:
         midi_notes.append(note_to_midi_int(note, octave))
@@ -77,3 +87,63 @@ def event_translate(value: int | None) -> str:
     if value is None:
         return "n"
     return str(value)
+
+
+def mdc_checksum(body: str) -> str:
+    """Checksum of the MDC track lines (everything after the header line)"""
+    import hashlib
+
+    return hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+# Compressed MDC file suffixes -> the stdlib module that reads and writes them
+MDC_CODECS: dict[str, str] = {".gz": "gzip", ".xz": "lzma"}
+# The suffixes of bank files, plain files first
+MDC_SUFFIXES: tuple[str, ...] = (".mdc", ".mdc.gz", ".mdc.xz")
+
+
+def strip_mdc_suffix(name: str) -> str:
+    """The file name without its MDC suffix, e.g. "beat" for "beat.mdc.gz" """
+    for suffix in reversed(MDC_SUFFIXES):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def open_mdc(path: str, mode: str = "r", compresslevel: int | None = None) -> IO:
+    """
+    Open an MDC file. Files ending in .gz or .xz are (de)compressed while they are read or
+    written, the codec is imported on first use.
+
+    Args:
+        path (str): The MDC file.
+        mode (str): "r", "w", "rb" or "wb".
+        compresslevel (int | None): The gzip level (1 to 9) or xz preset (0 to 9) of written
+                                    files. None for the codec default.
+    """
+    codec = MDC_CODECS.get(os.path.splitext(path)[1])
+    if codec is None:
+        return open(path, mode)
+    module = importlib.import_module(codec)
+    if "b" not in mode:
+        mode = f"{mode}t"
+    if compresslevel is None or "w" not in mode:
+        return module.open(path, mode)
+    if codec == "gzip":
+        return module.open(path, mode, compresslevel=compresslevel)
+    return module.open(path, mode, preset=compresslevel)
+
+
+@contextmanager
+def mdc_buffer(path: str) -> Iterator["mmap.mmap | bytes"]:
+    """
+    The bytes of an MDC file for random access: a read-only memory map of a plain file, or the
+    decompressed data of a compressed file.
+    """
+    if MDC_CODECS.get(os.path.splitext(path)[1]) is not None:
+        with open_mdc(path, "rb") as mdc_fd:
+            yield mdc_fd.read()
+        return
+    with open(path, "rb") as mdc_fd:
+        with mmap.mmap(mdc_fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
@@ -0,0 +1,283 @@
+"""
+Render many humanized variants of one Grid.
+
+A variant is what Grid.to_data() and Converter.convert_data() produce after random.seed(seed):
+the same notes with other velocity jitter and humanize offsets. Rendering K variants that way
+resolves the chords, durations, controllers and automation of the grid K times. The
+VariantRenderer resolves them once: it converts the grid without jitter, keeps the resulting
+events and the items of every grid cell, and per seed only redraws the jitter (with the same
+random calls, in the same order, as to_data()) and encodes the tracks directly, like the
+SegmentedWriter, without a MIDIFile. The output is byte for byte the output of the full path.
+
+Example:
+    for seed, midi_bytes in zip(seeds, render_variants(grid, seeds)):
+        ...
+    paths = save_variants(grid, range(100), "out/")
+"""
+import os
+import random
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from .automation import DEFAULT_RESOLUTION, lane_events
+from .constants import NOTE_TICK_MAP, TICKS_PER_BEAT
+from .converter import Converter
+from .events import NOTE, PITCHWHEEL
+from .exceptions import MdcAlignmentError
+from .grid import HUMANIZE_OFFSETS, Grid, IsChord
+from .segmented import (
+    _ORDER_CONTROL,
+    _ORDER_NOTE_OFF,
+    _ORDER_NOTE_ON,
+    _Encoded,
+    _chunk,
+    _encode_events,
+    _header,
+    _tempo_data,
+)
+
+# The number of tracks of the files written by Converter (see: new_midifile())
+_NUM_TRACKS = 128
+
+# A note of a line: sequence, channel, pitch, velocity, tick, duration and the cell whose jitter
+# sets the velocity and offset of the note (-1 for fixed notes) with the note number in the cell
+_LineNote = tuple[int, int, int, int, int, int, int, int]
+
+
+class _Cell(NamedTuple):
+    # The velocity of each item of the cell, in grid order
+    velocities: tuple[int, ...]
+    # Whether each item is a single note (IsChord.NO), which replaces the items before it
+    singles: tuple[bool, ...]
+    # The number of pitches the cell has in the MDC data
+    pitches: int
+
+
+class _Line(NamedTuple):
+    # The encoded controller and automation events, which are the same in every variant
+    fixed: list[_Encoded]
+    notes: list[_LineNote]
+
+
+def _encode_control(
+    seq: int, tick: int, kind: int, channel: int, data1: int, data2: int
+) -> _Encoded:
+    if kind == PITCHWHEEL:
+        value = data2 + 8192
+        return (tick, _ORDER_CONTROL, seq, 0xE0 | channel, value & 0x7F, value >> 7)
+    return (tick, _ORDER_CONTROL, seq, 0xB0 | channel, data1, data2)
+
+
+class VariantRenderer:
+    def __init__(
+        self,
+        grid: Grid,
+        tempo: int = 120,
+        velocity_jitter: int = 5,
+        humanize_jitter: bool = False,
+        automation_resolution: float = DEFAULT_RESOLUTION,
+    ):
+        """
+        Resolve a grid once for render().
+
+        Changes to the grid after this are not seen by the renderer.
+
+        Args:
+            grid (Grid): ...
+            tempo (int): The tempo in BPM.
+            velocity_jitter (int): See Grid.to_data().
+            humanize_jitter (bool): See Grid.to_data().
+            automation_resolution (float): See Converter().
+        """
+        self.tempo: int = tempo
+        self.velocity_jitter: int = velocity_jitter
+        self.humanize_jitter: bool = humanize_jitter
+        self.automation_resolution: float = automation_resolution
+        # Convert without jitter, keeping the random state of the caller
+        state = random.getstate()
+        try:
+            data = grid.to_data(velocity_jitter=0)
+        finally:
+            random.setstate(state)
+        # The cells with items, in the order to_data() draws their jitter
+        self._cells: list[_Cell] = []
+        # (track, pattern number) -> index into self._cells
+        cell_numbers: dict[tuple[int, int], int] = {}
+        # Walk the grid like to_data() does
+        tracks_list = set()
+        for bar in sorted(grid.grid.keys()):
+            for track in grid.grid[bar].keys():
+                tracks_list.add(track)
+        for position, bar in enumerate(grid.grid.keys()):
+            for track in tracks_list:
+                beats = grid.grid[bar].get(track)
+                if not beats:
+                    continue
+                for beat, items in enumerate(beats):
+                    if not items:
+                        continue
+                    cell_numbers[(track, position * grid.number_of_beats + beat)] = len(
+                        self._cells
+                    )
+                    self._cells.append(
+                        _Cell(
+                            tuple(i["velocity"] for i in items),
+                            tuple(i["is_chord"] == IsChord.NO for i in items),
+                            0,
+                        )
+                    )
+        converter = Converter(trusted=True, automation_resolution=automation_resolution)
+        _, body, _ = converter._parse_mdc(data)
+        lines, automation = converter._split_lines_v1(body)
+        self._lines: list[_Line] = []
+        # The insertion order of the events, which orders events of a track at the same tick
+        seq = 0
+        for number, ((track_type, granularity, offset, patterns), track) in enumerate(
+            zip(lines, tracks_list)
+        ):
+            increment = NOTE_TICK_MAP[granularity]
+            start = round(offset * TICKS_PER_BEAT)
+            channel = 9 if track_type == "drum" else 0
+            line = _Line([], [])
+            # Without humanize_jitter every event of a pattern is at the start of its beat
+            notes: dict[int, int] = {}
+            for tick, kind, data1, data2, duration in converter._iter_ticks_v1(
+                patterns, granularity, offset, validate=False
+            ):
+                seq += 1
+                if kind != NOTE:
+                    line.fixed.append(_encode_control(seq, tick, kind, channel, data1, data2))
+                    continue
+                cell = cell_numbers.get((track, (tick - start) // increment), -1)
+                note = 0
+                if cell >= 0:
+                    note = notes.get(cell, 0)
+                    notes[cell] = note + 1
+                line.notes.append((seq, channel, data1, data2, tick, duration, cell, note))
+            for cell, count in notes.items():
+                self._cells[cell] = self._cells[cell]._replace(pitches=count)
+            for event in lane_events(
+                automation.get(number, {}), number, channel, automation_resolution
+            ):
+                seq += 1
+                line.fixed.append(
+                    _encode_control(
+                        seq, round(event.time * TICKS_PER_BEAT), event.kind, channel,
+                        event.data1, event.data2,
+                    )
+                )
+            self._lines.append(line)
+        self._header: bytes = _header(_NUM_TRACKS, TICKS_PER_BEAT) + _chunk(
+            _tempo_data([(0, int(60000000 / tempo))])
+        )
+        self._empty_tracks: bytes = _chunk(b"") * (_NUM_TRACKS - len(self._lines))
+
+    def _jitter(self, seed: int) -> list[tuple[int | list[int], int | list[int]]]:
+        """The velocities and offsets (in ticks) of every cell, as to_data() draws them"""
+        rng = random.Random(seed)
+        jitter = self.velocity_jitter
+        humanize = self.humanize_jitter
+        values: list[tuple[int | list[int], int | list[int]]] = []
+        for cell in self._cells:
+            velocities: list[int] = []
+            offsets: list[str] = []
+            for velocity, single in zip(cell.velocities, cell.singles):
+                offsets.append(rng.choice(HUMANIZE_OFFSETS) if humanize else "n")
+                new_velocity = velocity + rng.randint(-jitter, jitter)
+                if new_velocity < 0:
+                    new_velocity = velocity
+                velocities.append(new_velocity)
+                if single:
+                    velocities = [new_velocity]
+                    offsets = [offsets[-1]]
+            # Equal values are written once and apply to every pitch of the cell
+            if len(set(velocities)) < 2 and len(set(offsets)) < 2:
+                values.append((velocities[0], NOTE_TICK_MAP[offsets[0]]))
+                continue
+            # The same alignment checks as Converter._validate_alignment()
+            for column in (velocities, offsets):
+                if len(set(column)) < 2:
+                    continue
+                if cell.pitches < 2:
+                    raise MdcAlignmentError("Invalid data alignment to single pitch.")
+                if len(column) != cell.pitches:
+                    raise MdcAlignmentError("Invalid data alignment to pitches.")
+            values.append(
+                (
+                    velocities if len(set(velocities)) > 1 else velocities[0],
+                    [NOTE_TICK_MAP[i] for i in offsets] if len(set(offsets)) > 1
+                    else NOTE_TICK_MAP[offsets[0]],
+                )
+            )
+        return values
+
+    def render(self, seed: int) -> bytes:
+        """
+        The MIDI file data of one variant. The same as:
+            random.seed(seed)
+            converter = Converter(tempo=tempo, trusted=True)
+            converter.convert_data(grid.to_data(velocity_jitter, humanize_jitter))
+            converter.midi_bytes()
+        """
+        values = self._jitter(seed)
+        chunks: list[bytes] = [self._header]
+        for line in self._lines:
+            events = line.fixed.copy()
+            for seq, channel, pitch, velocity, tick, duration, cell, note in line.notes:
+                if cell >= 0:
+                    velocities, offsets = values[cell]
+                    velocity = velocities if isinstance(velocities, int) else velocities[note]
+                    tick += offsets if isinstance(offsets, int) else offsets[note]
+                events.append((tick, _ORDER_NOTE_ON, seq, 0x90 | channel, pitch, velocity))
+                events.append(
+                    (tick + duration, _ORDER_NOTE_OFF, seq, 0x80 | channel, pitch, velocity)
+                )
+            chunks.append(_chunk(_encode_events(events)[0]))
+        chunks.append(self._empty_tracks)
+        return b"".join(chunks)
+
+
+def render_variants(
+    grid: Grid,
+    seeds: Iterable[int],
+    tempo: int = 120,
+    velocity_jitter: int = 5,
+    humanize_jitter: bool = False,
+) -> list[bytes]:
+    """
+    The MIDI file data of a variant of grid per seed, see VariantRenderer.
+
+    Args:
+        grid (Grid): ...
+        seeds (Iterable[int]): The random seed of each variant.
+        tempo (int): The tempo in BPM.
+        velocity_jitter (int): See Grid.to_data().
+        humanize_jitter (bool): See Grid.to_data().
+    """
+    renderer = VariantRenderer(grid, tempo, velocity_jitter, humanize_jitter)
+    return [renderer.render(seed) for seed in seeds]
+
+
+def save_variants(
+    grid: Grid,
+    seeds: Iterable[int],
+    out_dir: str,
+    tempo: int = 120,
+    velocity_jitter: int = 5,
+    humanize_jitter: bool = False,
+) -> list[str]:
+    """
+    Write a variant of grid per seed to out_dir/variant-<seed>.midi, see render_variants().
+
+    Return:
+        list[str]: The paths written, in seed order.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    renderer = VariantRenderer(grid, tempo, velocity_jitter, humanize_jitter)
+    paths: list[str] = []
+    for seed in seeds:
+        path = os.path.join(out_dir, f"variant-{seed}.midi")
+        with open(path, "wb") as midi_fd:
+            midi_fd.write(renderer.render(seed))
+        paths.append(path)
+    return paths
@@ -0,0 +1,675 @@
+"""
+Differential checks of the fast rendering paths against the reference path.
+
+Every optimized path has to produce exactly what the reference path produces: Grid.to_data(),
+Converter.convert_data() and MIDIFile.writeFile(). The harness builds random Grids from fixed
+seeds, covering all granularities, drums, notes and chords, per note controller values,
+automation lanes, copies and velocity shaping. Each grid is rendered through the reference path
+and every path of PATHS, and the MIDI bytes are compared. A mismatch names the first MIDI track
+chunk that differs.
+
+The digests of the reference renders can be kept in a golden file (see save_golden()), so a
+change of the reference path itself is caught as well.
+
+The reference path itself is pinned to the converter of BASELINE, the commit before the
+optimized paths: BASELINE_GOLDEN, shipped as package data, holds digests of baseline renders of
+grids without automation lanes (which the baseline can not read). The intended output changes
+since then are listed in BASELINE_DELTAS, applied to the baseline converter when the digests are
+written, and named per seed in the file. Any other change of the output is a mismatch. To rewrite
+the file:
+    git worktree add /tmp/baseline 974b3f8
+    mdcmp verify -n 200 --baseline-src /tmp/baseline/src
+
+Example:
+    result = verify(range(500), workers=8)
+    for mismatch in result.mismatches:
+        print(mismatch)
+
+Or run every check and raise AssertionError on mismatches (e.g. from a test), see check():
+    check(count=100)
+    python -m mdcmp.verify
+
+Or from the command line:
+    mdcmp verify -n 500 --golden golden.json --baseline
+"""
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import ModuleType
+from typing import Callable, NamedTuple
+
+from .automation import AUTOMATION_RANGES
+from .cache import RenderCache
+from .constants import ALL, DURATION_GRANULARITY_MAP, FORMAT_VERSION
+from .converter import Converter
+from .drummap import DRUMS_R
+from .grid import Granularity, Grid, IsChord
+from .util import open_mdc
+from .variants import VariantRenderer
+
+# Values of instrument notes, played as chords or as their root note
+CHORDS = ("C", "Eb", "F#", "Bb", "Am", "Dm7", "G7", "Cmaj7", "F#m7b5", "Bbsus4", "Dbmaj9")
+# How the notes of a cell are layered, in the ways Grid.to_data() supports:
+#   drum, note: Any number of drums or single notes (IsChord.NO).
+#   chord: One chord name (IsChord.YES), its notes share velocity and duration.
+#   voicing: Any number of single pitches (IsChord.YES), each with its own velocity.
+TRACK_MODES = ("drum", "note", "chord", "voicing")
+_IS_CHORD = {
+    "drum": IsChord.NO, "note": IsChord.NO, "chord": IsChord.YES, "voicing": IsChord.YES
+}
+# Granularities in the order seeds cycle through them
+GRANULARITIES = tuple(Granularity)
+# The window of the segmented path in beats, small to cross many window boundaries
+SEGMENT_WINDOW = 3.0
+
+
+class Case(NamedTuple):
+    seed: int
+    # The MDC data of the grid of seed
+    data: str
+    # The same data in a file, for the paths that read files
+    path: str
+    # A scratch directory for the case, removed afterwards
+    tmp_dir: str
+
+
+class Mismatch(NamedTuple):
+    seed: int
+    # The name of the path, see PATHS. "reference" when the reference render failed,
+    # "golden" when it does not match the golden digest and "baseline" when it does not match
+    # the baseline digest.
+    path: str
+    detail: str
+
+
+def _controllers(rng: random.Random) -> dict[str, int | bool]:
+    """
+    Random per note controller values of add() and transform().
+
+    Per note pitchwheel values are left out, the converter only accepts 0 to 127 in track lines.
+    Pitchwheel is covered by automation lanes.
+    """
+    values: dict[str, int | bool] = {}
+    if rng.random() < 0.3:
+        values["volume"] = rng.randint(0, 127)
+    if rng.random() < 0.3:
+        values["pan"] = rng.randint(-64, 64)
+    if rng.random() < 0.2:
+        values["modwheel"] = rng.randint(0, 127)
+    if rng.random() < 0.2:
+        values["expression"] = rng.randint(0, 127)
+    if rng.random() < 0.2:
+        values["sustain"] = rng.random() < 0.5
+    return values
+
+
+def random_grid(seed: int, lazy: bool = False, automation: bool = True) -> Grid:
+    """
+    Build a random grid. The same seed always builds the same grid, eager or lazy.
+
+    The granularity cycles with the seed, so consecutive seeds cover all granularities. Only
+    the random state of seed is used, choices never depend on the grid, so a lazy grid records
+    the same calls.
+
+    Args:
+        seed (int): ...
+        lazy (bool): See Grid().
+        automation (bool): Add automation lanes. Without them, the MDC data can be read by the
+                           baseline converter, see BASELINE.
+    """
+    rng = random.Random(seed)
+    grid = Grid(granularity=GRANULARITIES[seed % len(GRANULARITIES)], lazy=lazy)
+    beats = grid.number_of_beats
+    durations = sorted(DURATION_GRANULARITY_MAP[grid.granularity])[1:]
+    bars = rng.randint(1, 4)
+    # The (bar, track) cells that have notes
+    cells: list[tuple[int, int]] = []
+    # Track -> mode, see TRACK_MODES
+    modes: dict[int, str] = {}
+    for track in range(rng.randint(1, 4)):
+        mode = modes[track] = rng.choice(TRACK_MODES)
+        for bar in range(bars):
+            if rng.random() < 0.2:
+                continue
+            cells.append((bar, track))
+            if mode == "chord":
+                grid.add(
+                    bars=[bar],
+                    tracks=[track],
+                    beats=rng.sample(range(beats), rng.randint(1, beats)),
+                    value=rng.choice(CHORDS),
+                    duration=rng.choice(durations),
+                    velocity=rng.randint(1, 127),
+                    octave=rng.randint(1, 6),
+                    is_chord=IsChord.YES,
+                    **_controllers(rng),
+                )
+                continue
+            # The pitches of a voicing cell must differ, the MDC data keeps repeats only once
+            pitches = rng.sample(range(24, 97), beats)
+            for number in range(rng.randint(1, beats)):
+                if mode == "drum":
+                    value: str | int = rng.choice(sorted(DRUMS_R))
+                elif mode == "note":
+                    value = rng.choice(CHORDS) if rng.random() < 0.8 else rng.randint(24, 96)
+                else:
+                    value = pitches[number]
+                grid.add(
+                    bars=[bar],
+                    tracks=[track],
+                    beats=[rng.randrange(beats)] if rng.random() < 0.9 else [ALL],
+                    value=value,
+                    duration=rng.choice(durations),
+                    velocity=rng.randint(1, 127),
+                    octave=rng.randint(1, 6),
+                    is_chord=_IS_CHORD[mode],
+                    **_controllers(rng),
+                )
+    if not cells:
+        cells.append((0, 0))
+        grid.add(bars=[0], tracks=[0], beats=[0], value="kick1")
+    for _ in range(rng.randint(0, 3)):
+        bar, track = rng.choice(cells)
+        grid.transform(
+            bars=[bar],
+            tracks=[track],
+            beats=rng.sample(range(beats), rng.randint(1, beats)),
+            duration=rng.choice([None, *durations]),
+            velocity=rng.randint(1, 127),
+            octave=rng.choice([-1, 2, 4]),
+            # transform() sets is_chord, keep the layering of the track
+            is_chord=_IS_CHORD[modes[track]],
+            **_controllers(rng),
+        )
+    note_tracks = [track for track, mode in modes.items() if mode == "note"]
+    if note_tracks and rng.random() < 0.3:
+        grid.add_chord_spread(
+            bar=rng.randrange(bars),
+            tracks=[rng.choice(note_tracks)],
+            beat_offset=rng.randrange(beats),
+            chord=rng.choice(CHORDS),
+            octave=rng.randint(2, 5),
+            duration=rng.choice(durations),
+            reverse=rng.random() < 0.5,
+            stop_on_bar_overflow=True,
+        )
+    tracks = sorted({track for _, track in cells})
+    if rng.random() < 0.5:
+        copied = sorted({bar for bar, _ in cells})
+        count = rng.randint(1, 2)
+        grid.copy_to_end(bars=copied, tracks=tracks, count=count)
+        bars = max(bars, copied[-1] + 1) + len(copied) * count
+    for _ in range(rng.randint(0, 3) if automation else 0):
+        controller = rng.choice(sorted(AUTOMATION_RANGES))
+        low, high = (-64, 64) if controller in ("pan", "pitchwheel") else (0, 127)
+        for _ in range(rng.randint(1, 4)):
+            if controller == "sustain":
+                value = rng.random() < 0.5
+            else:
+                value = rng.randint(low, high)
+            grid.automate(
+                tracks=[rng.choice(tracks)],
+                controller=controller,
+                bar=rng.randrange(bars),
+                beat=rng.randrange(beats),
+                value=value,
+                ramp=controller != "sustain" and rng.random() < 0.5,
+            )
+    if rng.random() < 0.2:
+        grid.fade(
+            tracks=[rng.choice(tracks)],
+            start=(0, 0),
+            end=(bars, 0),
+            start_gain=rng.random(),
+            end_gain=rng.random(),
+            curve=rng.choice(["linear", "exponential", "logarithmic"]),
+        )
+    if rng.random() < 0.2:
+        grid.accent(tracks=[rng.choice(tracks)], accents=[1.0, rng.random()])
+    if rng.random() < 0.2:
+        grid.auto_dynamics(tracks=[rng.choice(tracks)], amount=rng.randint(1, 10))
+    return grid
+
+
+def grid_data(grid: Grid, seed: int) -> str:
+    """The MDC data of a grid with velocity and timing jitter seeded by seed"""
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        return grid.to_data(velocity_jitter=5, humanize_jitter=True)
+    finally:
+        random.setstate(state)
+
+
+def render_reference(data: str) -> bytes:
+    """The reference render: Converter.convert_data() and MIDIFile.writeFile()"""
+    converter = Converter()
+    converter.convert_data(data)
+    return converter.midi_bytes()
+
+
+def _render_trusted(case: Case) -> bytes:
+    converter = Converter(trusted=True)
+    converter.convert_data(case.data)
+    return converter.midi_bytes()
+
+
+def _render_tracks(case: Case) -> bytes:
+    converter = Converter()
+    for track in converter.parse_data_tracks(case.data):
+        converter.add_track(track)
+    return converter.midi_bytes()
+
+
+def _render_slice(case: Case) -> bytes:
+    converter = Converter()
+    converter.convert_slice(case.path)
+    return converter.midi_bytes()
+
+
+def _render_segmented(case: Case) -> bytes:
+    path = os.path.join(case.tmp_dir, "segmented.mid")
+    Converter().save_segmented(case.path, path, window=SEGMENT_WINDOW, spill_dir=case.tmp_dir)
+    with open(path, "rb") as midi_fd:
+        return midi_fd.read()
+
+
+def _render_cached(case: Case) -> bytes:
+    converter = Converter(cache=RenderCache(os.path.join(case.tmp_dir, "cache")))
+    converter.render(case.path)
+    # The second render is served from the cache
+    return converter.render(case.path)
+
+
+def _render_compressed(case: Case) -> bytes:
+    path = f"{case.path}.xz"
+    with open_mdc(path, "w") as mdc_fd:
+        mdc_fd.write(case.data)
+    converter = Converter()
+    converter.convert(path)
+    return converter.midi_bytes()
+
+
+def _render_lazy(case: Case) -> bytes:
+    return render_reference(grid_data(random_grid(case.seed, lazy=True), case.seed))
+
+
+def _render_variants(case: Case) -> bytes:
+    renderer = VariantRenderer(random_grid(case.seed), velocity_jitter=5, humanize_jitter=True)
+    return renderer.render(case.seed)
+
+
+# Name -> function(case) -> MIDI file data, each has to match render_reference()
+PATHS: dict[str, Callable[[Case], bytes]] = {
+    "trusted": _render_trusted,
+    "tracks": _render_tracks,
+    "slice": _render_slice,
+    "segmented": _render_segmented,
+    "cached": _render_cached,
+    "compressed": _render_compressed,
+    "lazy": _render_lazy,
+    "variants": _render_variants,
+}
+
+
+def _chunks(midi_bytes: bytes) -> list[bytes]:
+    """The chunks of MIDI file data, header first"""
+    chunks: list[bytes] = []
+    position = 0
+    while position + 8 <= len(midi_bytes):
+        (length,) = struct.unpack(">I", midi_bytes[position + 4:position + 8])
+        chunks.append(midi_bytes[position:position + 8 + length])
+        position += 8 + length
+    return chunks
+
+
+def difference(expected: bytes, actual: bytes) -> str:
+    """Describe where two MIDI files first differ, or "" when they are the same"""
+    if expected == actual:
+        return ""
+    expected_chunks, actual_chunks = _chunks(expected), _chunks(actual)
+    for number, (first, second) in enumerate(zip(expected_chunks, actual_chunks)):
+        if first != second:
+            offset = next(
+                (i for i, (a, b) in enumerate(zip(first, second)) if a != b),
+                min(len(first), len(second)),
+            )
+            name = "header" if number == 0 else f"track chunk {number - 1}"
+            return (
+                f"{name} differs at byte {offset} "
+                f"(lengths {len(first)} and {len(second)})"
+            )
+    return f"{len(expected_chunks)} chunks expected, {len(actual_chunks)} rendered"
+
+
+def _verify_job(job: tuple[int, tuple[str, ...]]) -> tuple[int, str, list[Mismatch]]:
+    """Render one seed through the reference and the paths. Returns (seed, digest, mismatches)"""
+    import hashlib
+
+    seed, paths = job
+    try:
+        data = grid_data(random_grid(seed), seed)
+        expected = render_reference(data)
+    except Exception as err:
+        return seed, "", [Mismatch(seed, "reference", f"{type(err).__name__}: {err}")]
+    mismatches: list[Mismatch] = []
+    tmp_dir = tempfile.mkdtemp(prefix="mdcmp-verify-")
+    try:
+        case = Case(seed, data, os.path.join(tmp_dir, f"{seed}.mdc"), tmp_dir)
+        with open(case.path, "w") as mdc_fd:
+            mdc_fd.write(data)
+        for name in paths:
+            try:
+                detail = difference(expected, PATHS[name](case))
+            except Exception as err:
+                detail = f"{type(err).__name__}: {err}"
+            if detail:
+                mismatches.append(Mismatch(seed, name, detail))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return seed, hashlib.sha256(expected).hexdigest(), mismatches
+
+
+class VerifyResult:
+    def __init__(self, digests: dict[int, str], mismatches: list[Mismatch], seconds: float):
+        # Seed -> sha256 of the reference render
+        self.digests: dict[int, str] = digests
+        self.mismatches: list[Mismatch] = mismatches
+        self.seconds: float = seconds
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+
+def verify(
+    seeds: "range | list[int]",
+    paths: list[str] | None = None,
+    golden: dict[int, str] | None = None,
+    workers: int | None = None,
+) -> VerifyResult:
+    """
+    Render the random grid of every seed through the reference and the fast paths, in parallel.
+
+    Args:
+        seeds (range | list[int]): The seeds of the grids, see random_grid().
+        paths (list[str] | None): Keys of PATHS to check. None for all.
+        golden (dict[int, str] | None): Seed -> expected reference digest, see load_golden().
+                                        Seeds that are not in it are not checked.
+        workers (int | None): The number of processes. None uses all cores, 1 runs in-process.
+    """
+    paths = list(PATHS) if paths is None else paths
+    for name in paths:
+        if name not in PATHS:
+            raise KeyError(f"Unknown render path: {name}")
+    jobs = [(seed, tuple(paths)) for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        results = list(map(_verify_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(pool.map(_verify_job, jobs, chunksize=chunksize))
+    digests: dict[int, str] = {}
+    mismatches: list[Mismatch] = []
+    for seed, digest, job_mismatches in results:
+        mismatches.extend(job_mismatches)
+        if not digest:
+            continue
+        digests[seed] = digest
+        if golden is not None and seed in golden and golden[seed] != digest:
+            mismatches.append(
+                Mismatch(seed, "golden", f"reference digest {digest} != golden {golden[seed]}")
+            )
+    return VerifyResult(digests, mismatches, time.perf_counter() - start)
+
+
+def load_golden(path: str) -> dict[int, str]:
+    """Read a golden file written by save_golden()"""
+    with open(path) as golden_fd:
+        return {int(seed): digest for seed, digest in json.load(golden_fd).items()}
+
+
+def save_golden(path: str, digests: dict[int, str]):
+    """Write the reference digests of VerifyResult.digests as a golden file (JSON)"""
+    with open(path, "w") as golden_fd:
+        json.dump({str(seed): digests[seed] for seed in sorted(digests)}, golden_fd, indent=1)
+
+
+# The last commit before the optimized render paths. Its converter is the baseline path.
+BASELINE = "974b3f8"
+# The intended output changes since BASELINE: name -> description. The golden digests of
+# BASELINE_GOLDEN are baseline renders with these changes applied to the baseline converter. A new
+# change also bumps constants.RENDER_FORMAT_VERSION.
+BASELINE_DELTAS: dict[str, str] = {
+    "dotted-eighth": "A dotted eighth note (e.) lasts 0.75 beats, the baseline used 0.525.",
+    "change-only-controllers": (
+        "A per note controller value is only sent when it differs from the last value sent on "
+        "the track, the baseline sent it on every beat."
+    ),
+}
+# The committed golden digests of the baseline path, see save_baseline_golden(). A resource of the
+# mdcmp package, read with importlib.resources so it is found in installed wheels as well.
+BASELINE_GOLDEN = "data/baseline.json"
+
+
+def baseline_data(seed: int) -> str:
+    """
+    The MDC data of the random grid of seed in the form the baseline converter reads: without
+    automation lanes and with a plain version header.
+    """
+    _, lines = grid_data(random_grid(seed, automation=False), seed).split("\n", 1)
+    return f"{FORMAT_VERSION}\n{lines}"
+
+
+def load_baseline(baseline_src: str) -> ModuleType:
+    """
+    Import the converter of a checkout of BASELINE, e.g. of:
+        git worktree add /tmp/baseline 974b3f8
+
+    The package is imported as mdcmp_baseline, next to the current mdcmp.
+
+    Args:
+        baseline_src (str): The src directory of the checkout.
+    """
+    import importlib
+    import importlib.util
+    import sys
+
+    package = os.path.join(baseline_src, "mdcmp")
+    spec = importlib.util.spec_from_file_location(
+        "mdcmp_baseline",
+        os.path.join(package, "__init__.py"),
+        submodule_search_locations=[package],
+    )
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No mdcmp package in {baseline_src}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["mdcmp_baseline"] = module
+    spec.loader.exec_module(module)
+    return importlib.import_module("mdcmp_baseline.converter")
+
+
+def render_baseline(baseline: ModuleType, data: str, deltas: "tuple[str, ...]" = ()) -> bytes:
+    """
+    Render MDC data with the baseline converter, with the given BASELINE_DELTAS applied.
+
+    Args:
+        baseline (ModuleType): The baseline converter module, see load_baseline().
+        data (str): MDC data, see baseline_data().
+        deltas (tuple[str, ...]): Keys of BASELINE_DELTAS.
+    """
+    import io
+
+    for name in deltas:
+        if name not in BASELINE_DELTAS:
+            raise KeyError(f"Unknown baseline delta: {name}")
+    converter = baseline.Converter()
+    if "change-only-controllers" in deltas:
+        midi = converter.midi
+        add_controller, add_pitchwheel = midi.addControllerEvent, midi.addPitchWheelEvent
+        # (track, controller) -> the last value sent, -1 is the pitchwheel
+        last_values: dict[tuple[int, int], int] = {}
+
+        def changed(track: int, controller: int, value: int) -> bool:
+            if last_values.get((track, controller)) == value:
+                return False
+            last_values[(track, controller)] = value
+            return True
+
+        def controller_event(track: int, channel: int, time: float, controller: int, value: int):
+            if changed(track, controller, value):
+                add_controller(track, channel, time, controller, value)
+
+        def pitchwheel_event(track: int, channel: int, time: float, value: int):
+            if changed(track, -1, value):
+                add_pitchwheel(track, channel, time, value)
+
+        midi.addControllerEvent = controller_event
+        midi.addPitchWheelEvent = pitchwheel_event
+    note_times = baseline.NOTE_TIME_MAP
+    dotted_eighth = note_times["e."]
+    if "dotted-eighth" in deltas:
+        note_times["e."] = 0.75
+    try:
+        converter._convert_v1(data.strip().split("\n")[1:])
+    finally:
+        note_times["e."] = dotted_eighth
+    output = io.BytesIO()
+    converter.midi.writeFile(output)
+    return output.getvalue()
+
+
+def save_baseline_golden(path: str, baseline_src: str, seeds: "range | list[int]"):
+    """
+    Render baseline_data() of every seed through the baseline converter and write the digests,
+    with all BASELINE_DELTAS applied, as a golden file (JSON). Each seed also lists the deltas
+    that change its output and the digest of the plain baseline render.
+
+    Args:
+        path (str): The golden file to write.
+        baseline_src (str): See load_baseline().
+        seeds (range | list[int]): ...
+    """
+    import hashlib
+
+    baseline = load_baseline(baseline_src)
+    entries: dict[str, dict[str, object]] = {}
+    for seed in seeds:
+        data = baseline_data(seed)
+        plain = render_baseline(baseline, data)
+        entries[str(seed)] = {
+            "digest": hashlib.sha256(
+                render_baseline(baseline, data, tuple(BASELINE_DELTAS))
+            ).hexdigest(),
+            "baseline": hashlib.sha256(plain).hexdigest(),
+            "deltas": [
+                name for name in BASELINE_DELTAS
+                if render_baseline(baseline, data, (name,)) != plain
+            ],
+        }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as golden_fd:
+        json.dump(
+            {"baseline": BASELINE, "deltas": BASELINE_DELTAS, "seeds": entries},
+            golden_fd,
+            indent=1,
+        )
+        golden_fd.write("\n")
+    os.replace(tmp_path, path)
+
+
+def load_baseline_golden(path: str | None = None) -> dict[int, str]:
+    """
+    Read the expected digests of a golden file written by save_baseline_golden().
+
+    Args:
+        path (str | None): The golden file. None for BASELINE_GOLDEN of the installed package.
+    """
+    if path is None:
+        from importlib.resources import files
+
+        golden = json.loads(files("mdcmp").joinpath(BASELINE_GOLDEN).read_text())
+        path = BASELINE_GOLDEN
+    else:
+        with open(path) as golden_fd:
+            golden = json.load(golden_fd)
+    unknown = {i for entry in golden["seeds"].values() for i in entry["deltas"]}
+    unknown -= set(BASELINE_DELTAS)
+    if unknown:
+        raise KeyError(f"Unknown baseline deltas in {path}: {sorted(unknown)}")
+    return {int(seed): entry["digest"] for seed, entry in golden["seeds"].items()}
+
+
+def _baseline_job(job: tuple[int, str]) -> Mismatch | None:
+    import hashlib
+
+    seed, expected = job
+    try:
+        digest = hashlib.sha256(render_reference(baseline_data(seed))).hexdigest()
+    except Exception as err:
+        return Mismatch(seed, "baseline", f"{type(err).__name__}: {err}")
+    if digest != expected:
+        return Mismatch(seed, "baseline", f"reference digest {digest} != baseline {expected}")
+    return None
+
+
+def verify_baseline(golden: dict[int, str], workers: int | None = None) -> list[Mismatch]:
+    """
+    Check the reference path against the golden digests of the baseline path.
+
+    Args:
+        golden (dict[int, str]): Seed -> expected digest, see load_baseline_golden().
+        workers (int | None): See verify().
+    """
+    jobs = sorted(golden.items())
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(_baseline_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(pool.map(_baseline_job, jobs, chunksize=chunksize))
+    return [i for i in results if i is not None]
+
+
+def check(
+    count: int = 100,
+    golden_path: str | None = None,
+    workers: int | None = None,
+) -> VerifyResult:
+    """
+    Run all checks, for test runners: every render path against the reference path and the
+    reference path against the committed baseline digests. Raises AssertionError listing the
+    mismatches.
+
+    Example (pytest):
+        def test_render_paths():
+            check(count=50)
+
+    Args:
+        count (int): The number of random grids checked against the reference path.
+        golden_path (str | None): See load_baseline_golden().
+        workers (int | None): See verify().
+    """
+    result = verify(range(count), workers=workers)
+    start = time.perf_counter()
+    result.mismatches.extend(verify_baseline(load_baseline_golden(golden_path), workers))
+    result.seconds += time.perf_counter() - start
+    if not result.ok:
+        raise AssertionError(
+            "\n".join(f"seed {i.seed} {i.path}: {i.detail}" for i in result.mismatches)
+        )
+    return result
+
+
+if __name__ == "__main__":
+    _result = check()
+    print(f"Verified in {_result.seconds:.2f}s")
@@ -0,0 +1,9 @@
+from mdcmp.verify import check, load_baseline_golden
+
+
+def test_baseline_golden_is_package_data():
+    assert load_baseline_golden()
+
+
+def test_render_paths():
+    check(count=20, workers=1)